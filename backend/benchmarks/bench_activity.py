@@ -0,0 +1,70 @@
+"""
+Compare the request-path cost of recording activity with a buffered log and with insert_one.
+
+Run from the backend directory against a local MongoDB:
+
+    python -m benchmarks.bench_activity --events 20000
+
+record() only appends to a queue, so its cost should stay in the
+microseconds while a synchronous insert_one costs a full round trip.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime
+
+from config.database import client
+from utils.activity import ActivityLog
+
+def _summary(samples) -> dict:
+    samples = sorted(samples)
+    return {
+        "median_us": round(statistics.median(samples), 1),
+        "p99_us": round(samples[int(len(samples) * 0.99) - 1], 1),
+    }
+
+async def run(events: int):
+    collection = client.learnify_bench.activity
+    await collection.drop()
+
+    synchronous = []
+    for number in range(events):
+        started = time.perf_counter()
+        await collection.insert_one({
+            "user_id": "bench", "type": "post_created", "target_id": str(number), "created_at": datetime.utcnow()
+        })
+        synchronous.append((time.perf_counter() - started) * 1_000_000)
+
+    await collection.drop()
+    log = ActivityLog(collection, queue_size=events)
+    log.start()
+    buffered = []
+    started_all = time.perf_counter()
+    for number in range(events):
+        started = time.perf_counter()
+        log.record("bench", "post_created", str(number))
+        buffered.append((time.perf_counter() - started) * 1_000_000)
+        if number % 100 == 0:
+            # Let the writer run, as it would between requests
+            await asyncio.sleep(0)
+    await log.stop()
+    drain_seconds = time.perf_counter() - started_all
+
+    print(json.dumps({
+        "events": events,
+        "insert_one": _summary(synchronous),
+        "record": _summary(buffered),
+        "buffered_total_seconds": round(drain_seconds, 3),
+        "written": await collection.count_documents({}),
+    }, indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(run(args.events))
+
+if __name__ == "__main__":
+    main()
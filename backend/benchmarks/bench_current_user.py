@@ -0,0 +1,61 @@
+"""
+Measure the per-request cost of get_current_user with and without the user cache.
+
+Run from the backend directory against a local MongoDB:
+
+    python -m benchmarks.bench_current_user --requests 5000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from config.database import db
+from utils.auth import create_access_token, get_current_user, user_cache
+
+BENCH_USERNAME = "bench-current-user"
+
+async def measure(token: str, requests: int) -> dict:
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        await get_current_user(token)
+        samples.append((time.perf_counter() - started) * 1_000_000)
+    samples.sort()
+    return {
+        "median_us": round(statistics.median(samples), 1),
+        "p99_us": round(samples[int(len(samples) * 0.99) - 1], 1),
+    }
+
+async def run(requests: int):
+    await db.users.update_one(
+        {"username": BENCH_USERNAME},
+        {"$setOnInsert": {"hashed_password": ""}},
+        upsert=True
+    )
+    token = create_access_token({"sub": BENCH_USERNAME}, timedelta(minutes=5))
+
+    maxsize = user_cache.maxsize
+    user_cache.maxsize = 0
+    uncached = await measure(token, requests)
+    user_cache.maxsize = maxsize
+
+    user_cache.clear()
+    cached = await measure(token, requests)
+    print(json.dumps({
+        "requests": requests,
+        "uncached": uncached,
+        "cached": cached,
+        "cache": {"hits": user_cache.hits, "misses": user_cache.misses},
+    }, indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Compare skip/limit and keyset (cursor) pagination on a seeded posts collection.
+
+Run from the backend directory against a local MongoDB:
+
+    python -m benchmarks.bench_pagination --posts 200000
+
+Skip latency grows with the page number, keyset latency should stay flat.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from config.database import client
+from utils.pagination import FEED_SORT, keyset_filter
+
+PAGE_SIZE = 20
+PAGES = [1, 10, 100, 1000, 10000]
+
+async def seed(collection, total: int):
+    await collection.drop()
+    await collection.create_index([("parent_post_id", 1), ("created_at", -1), ("_id", -1)])
+    start = datetime.utcnow() - timedelta(seconds=total)
+    batch = []
+    for i in range(total):
+        batch.append({
+            "content": f"note {i}",
+            "author_id": str(i % 500),
+            # Some posts share a timestamp so the _id tie-breaker is exercised
+            "created_at": start + timedelta(seconds=i - i % 3),
+            "likes_count": 0,
+            "dislikes_count": 0,
+        })
+        if len(batch) == 10000:
+            await collection.insert_many(batch)
+            batch = []
+    if batch:
+        await collection.insert_many(batch)
+
+async def timed(coro_factory, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await coro_factory()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+    }
+
+async def run(total: int, repeat: int, reseed: bool):
+    collection = client.learnify_bench.posts
+    if reseed or await collection.estimated_document_count() != total:
+        await seed(collection, total)
+
+    query = {"parent_post_id": None}
+    results = []
+    for page in PAGES:
+        skip = (page - 1) * PAGE_SIZE
+        if skip + PAGE_SIZE > total:
+            break
+
+        def skip_page():
+            return collection.find(query).sort(FEED_SORT).skip(skip).limit(PAGE_SIZE).to_list(length=None)
+
+        after = {}
+        if skip:
+            previous = await collection.find(query).sort(FEED_SORT).skip(skip - 1).limit(1).to_list(length=None)
+            after = keyset_filter(previous[0]["created_at"], previous[0]["_id"])
+
+        def keyset_page():
+            return collection.find({**query, **after}).sort(FEED_SORT).limit(PAGE_SIZE).to_list(length=None)
+
+        results.append({
+            "page": page,
+            "skip": await timed(skip_page, repeat),
+            "keyset": await timed(keyset_page, repeat),
+        })
+
+    print(json.dumps({"posts": total, "page_size": PAGE_SIZE, "results": results}, indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--posts", type=int, default=PAGE_SIZE * PAGES[-1])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--reseed", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args.posts, args.repeat, args.reseed))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Compare payload size and latency of post responses across views, fieldsets and encodings.
+
+Seeds a MongoDB database, then requests the feed, an author's posts and a
+hot thread through the ASGI app in full view, summary view and with a
+sparse fieldset, each uncompressed, gzipped and brotli-compressed.
+Requires httpx and asgi-lifespan (and brotli-asgi for the br rows). Run from the backend directory:
+
+    python -m benchmarks.bench_post_views --requests 200
+
+Sizes are the bytes on the wire; summary and fields= should shrink them
+before compression does, and cut latency by skipping comment and reaction lookups.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+MODES = {
+    "full": {},
+    "summary": {"view": "summary"},
+    "fields": {"fields": "id,content,likes_count,author_username"},
+}
+ENCODINGS = ("identity", "gzip", "br")
+
+async def _measure(client, path: str, params: dict, headers: dict, requests: int) -> dict:
+    latencies, sizes = [], []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = await client.get(path, params=params, headers=headers)
+        latencies.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+        sizes.append(response.num_bytes_downloaded)
+    latencies.sort()
+    return {
+        "bytes": int(statistics.median(sizes)),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+    }
+
+async def run(args) -> dict:
+    try:
+        import httpx
+        from asgi_lifespan import LifespanManager
+    except ImportError:
+        raise SystemExit("This benchmark requires the httpx and asgi-lifespan packages")
+
+    from benchmarks.load_test import _select_database
+    database = _select_database("mongo", args.database)
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    from benchmarks.seed import seed
+    from main import app
+    from utils.auth import create_access_token
+
+    results = {}
+    # The lifespan creates the indexes and starts the background workers
+    async with LifespanManager(app) as manager:
+        data = await seed(database, args.users, args.posts, random_seed=args.seed)
+        token = create_access_token({"sub": data.usernames[0]})
+        endpoints = {
+            "feed": ("/posts", {"limit": args.limit}),
+            "user_posts": (f"/posts/user/{data.user_ids[0]}", {"limit": args.limit}),
+            "thread": (f"/posts/{data.hot_post_ids[0]}", {"max_depth": 3}),
+        }
+
+        transport = httpx.ASGITransport(app=manager.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for endpoint, (path, params) in endpoints.items():
+                for mode, mode_params in MODES.items():
+                    for encoding in ENCODINGS:
+                        headers = {"Authorization": f"Bearer {token}", "Accept-Encoding": encoding}
+                        results.setdefault(endpoint, {}).setdefault(mode, {})[encoding] = await _measure(
+                            client, path, {**params, **mode_params}, headers, args.requests
+                        )
+    return {"users": args.users, "posts": args.posts, "limit": args.limit, "results": results}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database", default="learnify_bench")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint, mode and encoding")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
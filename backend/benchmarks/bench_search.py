@@ -0,0 +1,90 @@
+"""
+Build the search index over a synthetic corpus and time queries against it.
+
+Run from the backend directory against a local MongoDB:
+
+    python -m benchmarks.bench_search --posts 200000
+
+Each term is read only up to its top postings, at most SEARCH_MAX_CANDIDATES
+per query, so latency should stay flat as --posts grows, even for terms
+such as "resumen" that appear in nearly every post.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from bson import ObjectId
+
+from config.database import client
+from config.indexes import INDEXES
+from utils.search import SearchIndex
+
+SUBJECTS = [
+    "algebra", "calculo", "fisica", "quimica", "programacion", "estadistica",
+    "economia", "derecho", "anatomia", "historia", "contabilidad", "sistemas",
+]
+WORDS = [
+    "resumen", "parcial", "final", "ejercicios", "teoria", "practica", "apunte",
+    "unidad", "integrales", "derivadas", "matrices", "vectores", "funciones",
+    "algoritmos", "estructuras", "datos", "probabilidad", "termodinamica",
+    "cinematica", "organica", "balance", "mercado", "constitucion", "celulas",
+]
+UNIVERSITIES = ["UBA", "UTN", "UNLP", "UADE", "ITBA"]
+QUERIES = ["integrales", "resumen parcial", "algo", "matrices vectores", "termo", "final calculo"]
+
+def synthetic_post(rng: random.Random) -> dict:
+    subject = rng.choice(SUBJECTS)
+    words = rng.choices(WORDS, k=rng.randint(20, 120))
+    return {
+        "_id": ObjectId(),
+        "author_id": str(rng.randint(1, 5000)),
+        "content": f"{subject} " + " ".join(words),
+        "attached_files": [{"filename": f"{subject}_{rng.choice(WORDS)}.pdf"}],
+    }
+
+async def seed(index: SearchIndex, total: int, rng: random.Random):
+    await asyncio.gather(index.postings.drop(), index.terms.drop(), index.stats.drop())
+    await index.postings.create_indexes(INDEXES["search_postings"])
+    semaphore = asyncio.Semaphore(64)
+
+    async def add(post):
+        async with semaphore:
+            await index.index_post(post, {"university": rng.choice(UNIVERSITIES), "major": None})
+
+    await asyncio.gather(*(add(synthetic_post(rng)) for _ in range(total)))
+
+async def run(total: int, repeat: int, reseed: bool):
+    index = SearchIndex(client.learnify_bench)
+    stats = await index.stats.find_one({"_id": "corpus"})
+    if reseed or not stats or stats["documents"] != total:
+        await seed(index, total, random.Random(42))
+
+    results = []
+    for query in QUERIES:
+        for university in (None, "UTN"):
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                await index.search(query, university=university, limit=20)
+                samples.append((time.perf_counter() - started) * 1000)
+            results.append({
+                "query": query,
+                "university": university,
+                "median_ms": round(statistics.median(samples), 2),
+                "max_ms": round(max(samples), 2),
+            })
+    print(json.dumps({"posts": total, "results": results}, indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--reseed", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args.posts, args.repeat, args.reseed))
+
+if __name__ == "__main__":
+    main()
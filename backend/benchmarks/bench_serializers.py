@@ -0,0 +1,75 @@
+"""
+Compare the legacy serialization path with the compiled encoders on large
+nested comment trees. Needs no database.
+
+    python -m benchmarks.bench_serializers --breadth 8 --depth 4
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from pydantic import TypeAdapter
+
+from models.Post import PostResponse
+from utils.serializers import MongoJSONResponse, get_encoder, serialize_mongo_doc
+
+def make_tree(breadth: int, depth: int) -> dict:
+    node = {
+        "_id": ObjectId(),
+        "content": "Resumen de la unidad 3 " * 10,
+        "attached_files": [{"url": "/files/abc", "file_type": "pdf", "filename": "unidad3.pdf"}],
+        "external_links": [],
+        "author_id": str(ObjectId()),
+        "author_username": "student",
+        "author_profile": {"first_name": "Ana", "last_name": "Perez", "profile_picture_url": None},
+        "created_at": datetime.utcnow(),
+        "likes_count": 3,
+        "dislikes_count": 0,
+        "liked_by_me": False,
+        "disliked_by_me": False,
+        "parent_post_id": None,
+    }
+    node["comments"] = [make_tree(breadth, depth - 1) for _ in range(breadth)] if depth else []
+    return node
+
+def count_nodes(node: dict) -> int:
+    return 1 + sum(count_nodes(child) for child in node["comments"])
+
+def legacy(tree: dict, adapter: TypeAdapter) -> bytes:
+    # serialize_mongo_doc, response_model validation, then JSONResponse rendering
+    validated = adapter.validate_python(serialize_mongo_doc(tree))
+    return json.dumps(adapter.dump_python(validated, mode="json")).encode()
+
+def compiled(tree: dict, response: MongoJSONResponse) -> bytes:
+    return response.render(get_encoder(PostResponse)(tree))
+
+def bench(function, *args, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function(*args)
+    return (time.perf_counter() - started) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--breadth", type=int, default=8)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    tree = make_tree(args.breadth, args.depth)
+    adapter = TypeAdapter(PostResponse)
+    response = MongoJSONResponse(None)
+
+    legacy_ms = bench(legacy, tree, adapter, repeat=args.repeat)
+    compiled_ms = bench(compiled, tree, response, repeat=args.repeat)
+    print(json.dumps({
+        "nodes": count_nodes(tree),
+        "legacy_ms": round(legacy_ms, 3),
+        "compiled_ms": round(compiled_ms, 3),
+        "speedup": round(legacy_ms / compiled_ms, 2),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
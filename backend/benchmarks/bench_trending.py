@@ -0,0 +1,88 @@
+"""
+Time top-N trending reads against the hot_score index as the posts collection grows.
+
+Run from the backend directory against a local MongoDB:
+
+    python -m benchmarks.bench_trending --sizes 10000 100000 --limit 20
+
+Scores are maintained on write, so a read is an index walk of the first
+limit entries and its latency should stay flat as the collection grows.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from config.database import client
+from utils.trending import COMMENT_WEIGHT, LIKE_WEIGHT, POST_WEIGHT, TRENDING_SORT, event_score
+
+UNIVERSITIES = [f"University {number}" for number in range(20)]
+
+def _post(rng: random.Random, now: datetime) -> dict:
+    created_at = now - timedelta(seconds=rng.randrange(30 * 24 * 3600))
+    likes = int(rng.paretovariate(1.2)) - 1
+    comments = int(rng.paretovariate(1.5)) - 1
+    return {
+        "content": "bench",
+        "parent_post_id": None,
+        "author_university": rng.choice(UNIVERSITIES),
+        "created_at": created_at,
+        "likes_count": likes,
+        "hot_score": event_score(POST_WEIGHT + LIKE_WEIGHT * likes + COMMENT_WEIGHT * comments, created_at),
+    }
+
+async def _time_reads(collection, query: dict, limit: int, reads: int) -> dict:
+    samples = []
+    for _ in range(reads):
+        started = time.perf_counter()
+        await collection.find(query).sort(TRENDING_SORT).limit(limit).to_list(length=None)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "p99_ms": round(samples[int(len(samples) * 0.99) - 1], 3),
+    }
+
+async def run(sizes, limit: int, reads: int, seed: int):
+    collection = client.learnify_bench.trending_posts
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    results = []
+    await collection.drop()
+    await collection.create_indexes([
+        IndexModel([("parent_post_id", ASCENDING), ("hot_score", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("author_university", ASCENDING), ("hot_score", DESCENDING), ("_id", DESCENDING)]),
+    ])
+
+    inserted = 0
+    for size in sorted(sizes):
+        while inserted < size:
+            batch = [_post(rng, now) for _ in range(min(5000, size - inserted))]
+            await collection.insert_many(batch, ordered=False)
+            inserted += len(batch)
+        results.append({
+            "posts": size,
+            "global": await _time_reads(collection, {"parent_post_id": None}, limit, reads),
+            "university": await _time_reads(
+                collection, {"parent_post_id": None, "author_university": UNIVERSITIES[0]}, limit, reads
+            ),
+        })
+
+    print(json.dumps({"limit": limit, "reads": reads, "results": results}, indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.limit, args.reads, args.seed))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Hold many idle WebSocket connections and measure chat message latency.
+
+Run from the backend directory against a running server (requires the
+websockets package; raise the server's open file limit first):
+
+    RATE_LIMIT_ENABLED=false uvicorn main:app &
+    python -m benchmarks.bench_websockets --idle 10000 --listeners 50 --messages 500
+"""
+import argparse
+import asyncio
+import json
+import resource
+import statistics
+import time
+from datetime import timedelta
+
+from bson import ObjectId
+
+from config.database import db
+from utils.auth import create_access_token
+
+BENCH_USERNAME = "bench-websockets"
+
+def _raise_file_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+def _percentile(samples, fraction: float) -> float:
+    return round(samples[max(int(len(samples) * fraction) - 1, 0)], 2)
+
+async def open_idle(websockets, url: str, count: int, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def connect():
+        async with semaphore:
+            connection = await websockets.connect(url, max_queue=None)
+            await connection.send(json.dumps({"action": "subscribe", "channel": "posts"}))
+            await connection.recv()
+            return connection
+
+    return await asyncio.gather(*(connect() for _ in range(count)))
+
+async def listen(connection, expected: int, latencies: list, timeout: float):
+    received = 0
+    try:
+        while received < expected:
+            event = json.loads(await asyncio.wait_for(connection.recv(), timeout))
+            if event.get("type") != "message":
+                continue
+            sent_at = float(event["message"]["content"].split()[-1])
+            latencies.append((time.perf_counter() - sent_at) * 1000)
+            received += 1
+    except asyncio.TimeoutError:
+        pass
+
+async def run(url: str, idle: int, listeners: int, messages: int, rate: float, concurrency: int):
+    try:
+        import websockets
+    except ImportError:
+        raise SystemExit("This benchmark requires the websockets package")
+    _raise_file_limit()
+
+    await db.users.update_one(
+        {"username": BENCH_USERNAME},
+        {"$setOnInsert": {"hashed_password": ""}},
+        upsert=True
+    )
+    token = create_access_token({"sub": BENCH_USERNAME}, timedelta(minutes=30))
+    group_id = str(ObjectId())
+
+    started = time.perf_counter()
+    idle_connections = await open_idle(websockets, f"{url}/ws?token={token}", idle, concurrency)
+    connect_seconds = time.perf_counter() - started
+
+    room_url = f"{url}/study-groups/ws/{group_id}?token={token}"
+    room = [await websockets.connect(room_url, max_queue=None) for _ in range(listeners)]
+    latencies = []
+    listening = [
+        asyncio.create_task(listen(connection, messages, latencies, timeout=10))
+        for connection in room
+    ]
+
+    for number in range(messages):
+        await room[0].send(json.dumps({"content": f"bench {number} {time.perf_counter()}"}))
+        await asyncio.sleep(1 / rate)
+    await asyncio.gather(*listening)
+
+    for connection in room + idle_connections:
+        await connection.close()
+    await db.group_messages.delete_many({"group_id": group_id})
+
+    latencies.sort()
+    print(json.dumps({
+        "idle_connections": len(idle_connections),
+        "connect_seconds": round(connect_seconds, 2),
+        "listeners": listeners,
+        "messages": messages,
+        "delivered": len(latencies),
+        "expected": messages * listeners,
+        "latency_ms": {
+            "median": round(statistics.median(latencies), 2) if latencies else None,
+            "p95": _percentile(latencies, 0.95) if latencies else None,
+            "p99": _percentile(latencies, 0.99) if latencies else None,
+            "max": round(latencies[-1], 2) if latencies else None,
+        },
+    }, indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="ws://localhost:8000")
+    parser.add_argument("--idle", type=int, default=10000)
+    parser.add_argument("--listeners", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=50, help="Messages sent per second")
+    parser.add_argument("--concurrency", type=int, default=200, help="Connections opened at once")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.idle, args.listeners, args.messages, args.rate, args.concurrency))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Drive the main routes through the ASGI app at a controlled concurrency.
+
+Seeds a MongoDB database (or an in-process mongomock-motor stand-in with
+--backend mock), then runs each scenario and prints throughput and latency
+percentiles as JSON. The app runs with its lifespan, as it does under
+uvicorn. Requires httpx and asgi-lifespan, plus mongomock-motor for
+--backend mock. Run from the backend directory:
+
+    python -m benchmarks.load_test --backend mock --concurrency 16 --output results.json
+    python -m benchmarks.load_test --baseline results.json --threshold 0.15
+
+Each mix then runs its scenarios at the same time, "all" being every
+scenario at once. The run fails (exit status 1) when the like and dislike
+counters of the stormed posts differ from their reactions, when the feed
+p95 next to logins exceeds --max-login-slowdown times the feed p95 alone,
+and with --baseline when a scenario's median or p95 latency grew, or its
+throughput dropped, by more than the threshold.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+SCENARIOS = ("login", "feed", "post", "reactions", "profile")
+# Scenarios also run at the same time, after every scenario ran alone
+MIXES = {
+    "login_feed": ("login", "feed"),
+    "all": SCENARIOS,
+}
+# The reactions scenario storms the hottest posts
+STORMED_POSTS = 10
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    return round(samples[max(int(len(samples) * fraction) - 1, 0)], 2)
+
+def _select_database(backend: str, name: str):
+    """
+    Point config.database at the benchmark database. Must run before the app
+    is imported, since every module binds db at import time.
+    """
+    import config.database as database
+
+    if backend == "mock":
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("--backend mock requires the mongomock-motor package")
+        database.client = AsyncMongoMockClient()
+        database.db = database.feed_db = database.client[name]
+    else:
+        database.db = database.client[name]
+        database.feed_db = database.client.get_database(name, read_preference=database.feed_db.read_preference)
+    return database.db
+
+def _scenarios(data, tokens: Dict[str, str], rng: random.Random) -> Dict[str, Callable]:
+    from benchmarks.seed import BENCH_PASSWORD
+
+    def headers():
+        return {"Authorization": f"Bearer {tokens[rng.choice(data.usernames)]}"}
+
+    def hot_post() -> str:
+        # Zipf-like access: popular threads are read far more often
+        return data.hot_post_ids[min(int(rng.paretovariate(1.0)) - 1, len(data.hot_post_ids) - 1)]
+
+    async def login(client):
+        return await client.post(
+            "/auth/login", data={"username": rng.choice(data.usernames), "password": BENCH_PASSWORD}
+        )
+
+    async def feed(client):
+        return await client.get("/posts", params={"limit": 20}, headers=headers())
+
+    async def post(client):
+        return await client.get(f"/posts/{hot_post()}", params={"max_depth": 3}, headers=headers())
+
+    async def reactions(client):
+        # Storm on the ten hottest posts, users flipping between like and dislike
+        post_id = data.hot_post_ids[rng.randrange(STORMED_POSTS)]
+        reaction_type = rng.choice(["like", "dislike", "none"])
+        return await client.post(
+            f"/posts/{post_id}/reaction", json={"reaction_type": reaction_type}, headers=headers()
+        )
+
+    async def profile(client):
+        return await client.get(f"/profile/{rng.choice(data.usernames)}", headers=headers())
+
+    return {"login": login, "feed": feed, "post": post, "reactions": reactions, "profile": profile}
+
+async def _drive(client, scenario: Callable, requests: int, concurrency: int):
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await scenario(client)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+def _summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": _percentile(latencies, 0.50),
+        "p95_ms": _percentile(latencies, 0.95),
+        "p99_ms": _percentile(latencies, 0.99),
+        "max_ms": round(latencies[-1], 2),
+    }
+
+async def run_scenario(client, scenario: Callable, requests: int, concurrency: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        await scenario(client)
+    return _summarize(*await _drive(client, scenario, requests, concurrency))
+
+async def run_mix(client, scenarios: Dict[str, Callable], requests: Dict[str, int], concurrency: int) -> dict:
+    """
+    Run several scenarios at the same time, each with its own concurrency
+    workers, and summarize each of them separately.
+    """
+    runs = await asyncio.gather(*(
+        _drive(client, scenario, requests[name], concurrency) for name, scenario in scenarios.items()
+    ))
+    return {name: _summarize(*run) for name, run in zip(scenarios, runs)}
+
+async def find_counter_drift(database, post_ids: List[str]) -> List[str]:
+    """
+    Compare the like and dislike counters of the given posts with their
+    reactions; concurrent reactions must leave them exact.
+    """
+    from bson import ObjectId
+
+    drift = []
+    async for post in database.posts.find(
+        {"_id": {"$in": [ObjectId(post_id) for post_id in post_ids]}}, {"likes_count": 1, "dislikes_count": 1}
+    ):
+        post_id = str(post["_id"])
+        for reaction_type in ("like", "dislike"):
+            counter = post.get(f"{reaction_type}s_count", 0)
+            reactions = await database.post_reactions.count_documents(
+                {"post_id": post_id, "reaction_type": reaction_type}
+            )
+            if counter != reactions:
+                drift.append(f"{post_id}: {reaction_type}s_count {counter} but {reactions} reactions")
+    return drift
+
+def find_login_interference(results: dict, max_slowdown: float) -> List[str]:
+    """
+    Logins hash off the event loop, so they must not slow down the feed
+    served next to them. Compares the feed p95 during the login_feed mix with
+    the feed p95 of the feed scenario run alone.
+    """
+    alone = results["scenarios"].get("feed")
+    mixed = results.get("mixes", {}).get("login_feed", {}).get("feed")
+    if not alone or not mixed or mixed["p95_ms"] <= alone["p95_ms"] * max_slowdown:
+        return []
+    return [f"login_feed: feed p95_ms {alone['p95_ms']} alone -> {mixed['p95_ms']} next to logins"]
+
+def find_regressions(results: dict, baseline: dict, threshold: float) -> List[str]:
+    regressions = []
+    for name, result in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if result[metric] > previous[metric] * (1 + threshold):
+                regressions.append(f"{name}: {metric} {previous[metric]} -> {result[metric]}")
+        if result["throughput_rps"] < previous["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput_rps {previous['throughput_rps']} -> {result['throughput_rps']}"
+            )
+    return regressions
+
+async def run(args) -> dict:
+    try:
+        import httpx
+        from asgi_lifespan import LifespanManager
+    except ImportError:
+        raise SystemExit("This benchmark requires the httpx and asgi-lifespan packages")
+
+    database = _select_database(args.backend, args.database)
+    # Every scenario runs from one client address, which the rate limits would throttle
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    # Reconciliation would hide counter drift from the check after the run
+    os.environ.setdefault("REACTION_RECONCILE_INTERVAL_SECONDS", "0")
+    from benchmarks.seed import seed
+    from main import app
+    from utils.auth import create_access_token
+
+    results = {
+        "backend": args.backend,
+        "concurrency": args.concurrency,
+        "users": args.users,
+        "posts": args.posts,
+        "scenarios": {},
+    }
+    # The lifespan creates the indexes and starts the background workers
+    async with LifespanManager(app) as manager:
+        started = time.perf_counter()
+        data = await seed(database, args.users, args.posts, random_seed=args.seed)
+        results["seed_seconds"] = round(time.perf_counter() - started, 2)
+
+        tokens = {username: create_access_token({"sub": username}) for username in data.usernames}
+        scenarios = _scenarios(data, tokens, random.Random(args.seed))
+        transport = httpx.ASGITransport(app=manager.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in args.scenarios:
+                requests = args.login_requests if name == "login" else args.requests
+                results["scenarios"][name] = await run_scenario(
+                    client, scenarios[name], requests, args.concurrency, args.warmup
+                )
+            for name in args.mixes:
+                results.setdefault("mixes", {})[name] = await run_mix(
+                    client,
+                    {scenario: scenarios[scenario] for scenario in MIXES[name]},
+                    {scenario: args.login_requests if scenario == "login" else args.requests for scenario in MIXES[name]},
+                    args.concurrency
+                )
+        results["counter_drift"] = await find_counter_drift(database, data.hot_post_ids[:STORMED_POSTS])
+
+    results["regressions"] = results["counter_drift"] + find_login_interference(results, args.max_login_slowdown)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", choices=["mongo", "mock"], default="mongo")
+    parser.add_argument("--database", default="learnify_bench")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=200, help="bcrypt makes logins expensive")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--mixes", nargs="*", choices=list(MIXES), default=list(MIXES))
+    parser.add_argument(
+        "--max-login-slowdown", type=float, default=2.0,
+        help="Tolerated feed p95 during login_feed, relative to the feed scenario alone"
+    )
+    parser.add_argument("--output", help="Also write the results to this file")
+    parser.add_argument("--baseline", help="Results of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Tolerated relative regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            results["regressions"] += find_regressions(results, json.load(baseline_file), args.threshold)
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+    if results.get("regressions"):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Seed a database with realistic Learnify data for the load tests.
+
+Users with profiles spread over a few universities and majors, top-level
+posts whose activity follows a heavy-tailed distribution, deep comment
+trees on the busiest threads and skewed reactions with matching counters.
+Generation is deterministic for a given random seed.
+"""
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List
+from bson import ObjectId
+
+BENCH_PASSWORD = "bench-password"
+UNIVERSITIES = ["UBA", "UTN", "UNLP", "UNC", "UNR"]
+MAJORS = ["Informatica", "Medicina", "Derecho", "Economia", "Fisica", "Arquitectura", "Quimica", "Letras"]
+WORDS = (
+    "apuntes parcial final resumen ejercicio teorema integral derivada algoritmo grafo "
+    "examen clase consulta guia practica laboratorio informe bibliografia capitulo tema "
+    "notes exam lecture homework proof matrix vector probability database network"
+).split()
+
+BATCH_SIZE = 1000
+
+@dataclass
+class SeededData:
+    usernames: List[str] = field(default_factory=list)
+    user_ids: List[str] = field(default_factory=list)
+    post_ids: List[str] = field(default_factory=list)
+    # Posts ordered from most to least active, for skewed access patterns
+    hot_post_ids: List[str] = field(default_factory=list)
+
+def _sentence(rng: random.Random, length: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+def _activity(rng: random.Random, cap: int) -> int:
+    """Heavy-tailed activity level: most posts get little, a few get a lot."""
+    return min(int(rng.paretovariate(1.2)) - 1, cap)
+
+async def _insert(collection, documents: List[dict]):
+    for start in range(0, len(documents), BATCH_SIZE):
+        await collection.insert_many(documents[start:start + BATCH_SIZE], ordered=False)
+
+def _comment_tree(rng, root: dict, size: int, max_depth: int, user_ids: List[str]) -> List[dict]:
+    nodes = [root]
+    by_id = {str(root["_id"]): root}
+    comments = []
+    for _ in range(size):
+        parent = rng.choice([node for node in nodes if node["depth"] < max_depth] or [root])
+        ancestor_ids = parent["ancestor_ids"] + [str(parent["_id"])]
+        comment = {
+            "_id": ObjectId(),
+            "content": _sentence(rng, rng.randint(3, 20)),
+            "attached_files": [],
+            "external_links": [],
+            "author_id": rng.choice(user_ids),
+            "created_at": parent["created_at"] + timedelta(seconds=rng.randint(1, 3600)),
+            "parent_post_id": str(parent["_id"]),
+            "ancestor_ids": ancestor_ids,
+            "depth": len(ancestor_ids),
+            "likes_count": 0,
+            "dislikes_count": 0,
+            "comment_count": 0,
+        }
+        for ancestor_id in ancestor_ids:
+            by_id[ancestor_id]["comment_count"] += 1
+        by_id[str(comment["_id"])] = comment
+        nodes.append(comment)
+        comments.append(comment)
+    return comments
+
+def _reactions(rng, post: dict, count: int, user_ids: List[str]) -> List[dict]:
+    reactions = []
+    for user_id in rng.sample(user_ids, min(count, len(user_ids))):
+        reaction_type = "like" if rng.random() < 0.8 else "dislike"
+        post["likes_count" if reaction_type == "like" else "dislikes_count"] += 1
+        reactions.append({
+            "post_id": str(post["_id"]),
+            "user_id": user_id,
+            "reaction_type": reaction_type,
+            "scored": reaction_type == "like",
+            "updated_at": post["created_at"],
+        })
+    return reactions
+
+async def seed(
+    database,
+    users: int = 500,
+    posts: int = 5000,
+    max_comments: int = 200,
+    max_depth: int = 8,
+    random_seed: int = 42
+) -> SeededData:
+    """Empty the benchmark collections of database and fill them again."""
+    from utils.auth import get_password_hash
+
+    rng = random.Random(random_seed)
+    for collection in ("users", "user_profiles", "posts", "post_reactions"):
+        await database[collection].delete_many({})
+
+    # Every user shares one password, so bcrypt runs once while seeding
+    hashed_password = get_password_hash(BENCH_PASSWORD)
+    data = SeededData()
+    user_documents, profiles = [], []
+    for number in range(users):
+        user_id = ObjectId()
+        username = f"bench-user-{number}"
+        data.usernames.append(username)
+        data.user_ids.append(str(user_id))
+        user_documents.append({"_id": user_id, "username": username, "hashed_password": hashed_password})
+        profiles.append({
+            "user_id": str(user_id),
+            "first_name": f"Bench{number}",
+            "last_name": "User",
+            "university": rng.choice(UNIVERSITIES),
+            "major": rng.choice(MAJORS),
+            "birthday": datetime(2000, 1, 1) + timedelta(days=rng.randint(0, 3000)),
+            "biography": _sentence(rng, 12),
+            "semester": rng.randint(1, 12),
+        })
+    await _insert(database.users, user_documents)
+    await _insert(database.user_profiles, profiles)
+    profile_by_user = {profile["user_id"]: profile for profile in profiles}
+
+    now = datetime.utcnow()
+    # A few prolific authors write most of the posts
+    author_weights = [1 / (rank + 1) for rank in range(users)]
+    post_documents, comments, reactions, activity = [], [], [], {}
+    for _ in range(posts):
+        author_id = rng.choices(data.user_ids, author_weights)[0]
+        post = {
+            "_id": ObjectId(),
+            "content": _sentence(rng, rng.randint(5, 60)),
+            "attached_files": [],
+            "external_links": [],
+            "author_id": author_id,
+            "created_at": now - timedelta(seconds=rng.randint(0, 30 * 24 * 3600)),
+            "parent_post_id": None,
+            "ancestor_ids": [],
+            "depth": 0,
+            "likes_count": 0,
+            "dislikes_count": 0,
+            "comment_count": 0,
+            "author_university": profile_by_user[author_id]["university"],
+            "author_major": profile_by_user[author_id]["major"],
+        }
+        level = _activity(rng, max_comments)
+        thread = _comment_tree(rng, post, level, max_depth, data.user_ids)
+        for document in [post] + thread:
+            reactions += _reactions(rng, document, _activity(rng, users), data.user_ids)
+        post_documents.append(post)
+        comments += thread
+        activity[str(post["_id"])] = level
+        data.post_ids.append(str(post["_id"]))
+
+    await _insert(database.posts, post_documents + comments)
+    await _insert(database.post_reactions, reactions)
+    data.hot_post_ids = sorted(data.post_ids, key=activity.get, reverse=True)
+    return data
@@ -1,9 +1,72 @@
+import os
+import time
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
 from pymongo.server_api import ServerApi
 
-MONGO_URL = "mongodb://localhost:27017"
-client = AsyncIOMotorClient(MONGO_URL, server_api=ServerApi('1'))
-db = client.learnify_db
+from .monitoring import event_listeners
+
+# MongoDB client configuration
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "learnify_db")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "0")) or None
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "20000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "30000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "0")) or None
+# Longest a request may wait for a pooled connection (0: no limit)
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0")) or None
+# Comma-separated wire compressors, e.g. "zstd,snappy,zlib"
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+# Feed reads tolerate slightly stale data and may be served by secondaries
+MONGO_FEED_READ_PREFERENCE = os.getenv("MONGO_FEED_READ_PREFERENCE", "secondaryPreferred")
+MONGO_FEED_MAX_STALENESS_SECONDS = int(os.getenv("MONGO_FEED_MAX_STALENESS_SECONDS", "-1"))
+MONGO_MONITORING = os.getenv("MONGO_MONITORING", "true").lower() in ("1", "true", "yes")
+
+def _read_preference(name: str, max_staleness: int = -1):
+    mode = read_pref_mode_from_name(name)
+    return make_read_preference(mode, None, max_staleness)
+
+def _client_options() -> dict:
+    options = {
+        "server_api": ServerApi('1'),
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "readPreference": MONGO_READ_PREFERENCE,
+    }
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    if MONGO_MONITORING:
+        options["event_listeners"] = event_listeners()
+    return options
+
+client = AsyncIOMotorClient(MONGO_URL, **_client_options())
+db = client[MONGO_DB_NAME]
+# Same database, read from secondaries when the deployment has them
+feed_db = client.get_database(
+    MONGO_DB_NAME,
+    read_preference=_read_preference(MONGO_FEED_READ_PREFERENCE, MONGO_FEED_MAX_STALENESS_SECONDS)
+)
 
 # Collections
-users_collection = db.users 
\ No newline at end of file
+users_collection = db.users
+
+async def ping() -> float:
+    """Round-trip a ping to the primary; returns its latency in seconds."""
+    started = time.perf_counter()
+    await db.command("ping")
+    return time.perf_counter() - started
+
+async def connect():
+    """Fail fast on startup when MongoDB is unreachable."""
+    await ping()
+
+def close():
+    client.close()
@@ -0,0 +1,264 @@
+import asyncio
+import os
+import sys
+from datetime import datetime
+from typing import Dict, List
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from .database import db
+from utils.activity import ACTIVITY_TTL_DAYS
+
+# Run verify_query_plans on startup and refuse to start on a collection scan
+VERIFY_QUERY_PLANS = os.getenv("VERIFY_QUERY_PLANS", "").lower() in ("1", "true", "yes")
+
+# Indexes every collection must have, applied idempotently on startup
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("username", ASCENDING)], unique=True, name="username_unique"),
+    ],
+    "user_profiles": [
+        IndexModel([("user_id", ASCENDING)], unique=True, name="user_id_unique"),
+    ],
+    "post_reactions": [
+        IndexModel(
+            [("post_id", ASCENDING), ("user_id", ASCENDING)],
+            unique=True,
+            name="post_user_unique"
+        ),
+    ],
+    "posts": [
+        IndexModel(
+            [("parent_post_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="feed"
+        ),
+        IndexModel(
+            [("author_id", ASCENDING), ("parent_post_id", ASCENDING),
+             ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="author_feed"
+        ),
+        IndexModel(
+            [("ancestor_ids", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)],
+            name="thread"
+        ),
+        IndexModel(
+            [("author_university", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="university_feed"
+        ),
+        IndexModel(
+            [("author_major", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="major_feed"
+        ),
+        IndexModel(
+            [("parent_post_id", ASCENDING), ("hot_score", DESCENDING), ("_id", DESCENDING)],
+            name="trending"
+        ),
+        IndexModel(
+            [("author_university", ASCENDING), ("hot_score", DESCENDING), ("_id", DESCENDING)],
+            name="university_trending"
+        ),
+        IndexModel(
+            [("author_major", ASCENDING), ("hot_score", DESCENDING), ("_id", DESCENDING)],
+            name="major_trending"
+        ),
+        # Posts waiting for the previews of an attachment
+        IndexModel([("attached_files.sha256", ASCENDING)], name="attachment_sha256", sparse=True),
+    ],
+    "search_postings": [
+        # Bounded top-k reads per term, highest frequency then shortest post first
+        IndexModel([("term", ASCENDING), ("tf", DESCENDING), ("length", ASCENDING)], name="term_top"),
+        IndexModel(
+            [("term", ASCENDING), ("university", ASCENDING), ("tf", DESCENDING), ("length", ASCENDING)],
+            name="term_university_top"
+        ),
+        IndexModel(
+            [("term", ASCENDING), ("major", ASCENDING), ("tf", DESCENDING), ("length", ASCENDING)],
+            name="term_major_top"
+        ),
+        IndexModel([("post_id", ASCENDING)], name="post"),
+        IndexModel([("author_id", ASCENDING)], name="author"),
+    ],
+    "group_messages": [
+        IndexModel(
+            [("group_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="group_feed"
+        ),
+    ],
+    "activity": [
+        # Changing ACTIVITY_TTL_DAYS requires dropping this index first
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=ACTIVITY_TTL_DAYS * 86400, name="ttl"),
+        IndexModel(
+            [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="user_feed"
+        ),
+    ],
+    "deletion_jobs": [
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="queue"),
+    ],
+    "preview_jobs": [
+        IndexModel([("status", ASCENDING), ("available_at", ASCENDING)], name="queue"),
+    ],
+    "attachments": [
+        IndexModel([("sha256", ASCENDING)], name="sha256"),
+    ],
+    # GridFS bucket used by the gridfs storage backend
+    "blobs.files": [
+        IndexModel([("metadata.sha256", ASCENDING)], name="sha256"),
+    ],
+}
+
+# Query shapes issued by the routers, checked by verify_query_plans.
+# Values are placeholders: only the shape matters to the planner.
+_SAMPLE_ID = ObjectId()
+QUERY_SHAPES = [
+    {"collection": "users", "filter": {"username": "sample"}},
+    {"collection": "users", "filter": {"_id": {"$in": [_SAMPLE_ID]}}},
+    {"collection": "user_profiles", "filter": {"user_id": "sample"}},
+    {"collection": "user_profiles", "filter": {"user_id": {"$in": ["sample"]}}},
+    {"collection": "post_reactions", "filter": {"post_id": "sample", "user_id": "sample"}},
+    {"collection": "post_reactions", "filter": {"user_id": "sample", "post_id": {"$in": ["sample"]}}},
+    {"collection": "post_reactions", "filter": {"post_id": "sample"}},
+    {"collection": "posts", "filter": {"_id": _SAMPLE_ID}},
+    {
+        "collection": "posts",
+        "filter": {"parent_post_id": None, "deleted": {"$ne": True}},
+        "sort": [("created_at", DESCENDING), ("_id", DESCENDING)],
+    },
+    {
+        "collection": "posts",
+        "filter": {"parent_post_id": None, "deleted": {"$ne": True}, "$or": [
+            {"created_at": {"$lt": _SAMPLE_ID.generation_time}},
+            {"created_at": _SAMPLE_ID.generation_time, "_id": {"$lt": _SAMPLE_ID}},
+        ]},
+        "sort": [("created_at", DESCENDING), ("_id", DESCENDING)],
+    },
+    {
+        "collection": "posts",
+        "filter": {"author_id": "sample", "parent_post_id": None, "deleted": {"$ne": True}},
+        "sort": [("created_at", DESCENDING), ("_id", DESCENDING)],
+    },
+    {"collection": "posts", "filter": {"author_id": "sample", "parent_post_id": None}},
+    {
+        "collection": "posts",
+        "filter": {"ancestor_ids": {"$in": ["sample"]}, "deleted": {"$ne": True}},
+        "sort": [("created_at", ASCENDING), ("_id", ASCENDING)],
+    },
+    {"collection": "posts", "filter": {"ancestor_ids": "sample"}},
+    {"collection": "posts", "filter": {"parent_post_id": {"$in": ["sample"]}}},
+    {
+        "collection": "posts",
+        "filter": {"parent_post_id": None, "deleted": {"$ne": True}, "author_university": "sample"},
+        "sort": [("created_at", DESCENDING), ("_id", DESCENDING)],
+    },
+    {
+        "collection": "posts",
+        "filter": {"parent_post_id": None, "deleted": {"$ne": True}, "author_major": "sample"},
+        "sort": [("created_at", DESCENDING), ("_id", DESCENDING)],
+    },
+    {
+        "collection": "posts",
+        "filter": {"parent_post_id": None, "deleted": {"$ne": True}},
+        "sort": [("hot_score", DESCENDING), ("_id", DESCENDING)],
+    },
+    {
+        "collection": "posts",
+        "filter": {"parent_post_id": None, "deleted": {"$ne": True}, "author_university": "sample"},
+        "sort": [("hot_score", DESCENDING), ("_id", DESCENDING)],
+    },
+    {
+        "collection": "posts",
+        "filter": {"parent_post_id": None, "deleted": {"$ne": True}, "author_major": "sample"},
+        "sort": [("hot_score", DESCENDING), ("_id", DESCENDING)],
+    },
+    {"collection": "post_reactions", "filter": {"post_id": {"$in": ["sample"]}}},
+    {"collection": "deletion_jobs", "filter": {"_id": {"$in": ["sample"]}, "status": {"$in": ["pending", "running"]}}},
+    {
+        "collection": "deletion_jobs",
+        "filter": {"status": {"$in": ["pending", "running"]}},
+        "sort": [("created_at", ASCENDING)],
+    },
+    {
+        "collection": "preview_jobs",
+        "filter": {"status": {"$in": ["pending", "running"]}, "available_at": {"$lte": datetime.utcnow()}},
+        "sort": [("available_at", ASCENDING)],
+    },
+    {
+        "collection": "posts",
+        "filter": {"attached_files": {"$elemMatch": {"sha256": "sample", "preview_status": "pending"}}},
+    },
+    {
+        "collection": "group_messages",
+        "filter": {"group_id": "sample"},
+        "sort": [("created_at", DESCENDING), ("_id", DESCENDING)],
+    },
+    {
+        "collection": "activity",
+        "filter": {"user_id": "sample"},
+        "sort": [("created_at", DESCENDING), ("_id", DESCENDING)],
+    },
+    {"collection": "attachments", "filter": {"sha256": "sample"}},
+    {"collection": "blobs.files", "filter": {"metadata.sha256": "sample"}},
+    {
+        "collection": "search_postings",
+        "filter": {"term": "sample"},
+        "sort": [("tf", DESCENDING), ("length", ASCENDING)],
+    },
+    {
+        "collection": "search_postings",
+        "filter": {"term": "sample", "university": "sample"},
+        "sort": [("tf", DESCENDING), ("length", ASCENDING)],
+    },
+    {
+        "collection": "search_postings",
+        "filter": {"term": "sample", "major": "sample"},
+        "sort": [("tf", DESCENDING), ("length", ASCENDING)],
+    },
+    {"collection": "search_postings", "filter": {"post_id": "sample"}},
+    {"collection": "search_postings", "filter": {"author_id": "sample"}},
+    {"collection": "search_terms", "filter": {"_id": {"$regex": "^sample"}, "df": {"$gt": 0}}},
+]
+
+async def ensure_indexes():
+    """
+    Create every index declared in INDEXES. Existing identical indexes are left
+    untouched, so this is safe to run on every startup.
+    """
+    for collection, indexes in INDEXES.items():
+        await db[collection].create_indexes(indexes)
+
+def _has_collscan(plan) -> bool:
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(_has_collscan(value) for value in plan.values())
+    if isinstance(plan, list):
+        return any(_has_collscan(item) for item in plan)
+    return False
+
+async def verify_query_plans():
+    """
+    Explain every query shape in QUERY_SHAPES and raise a RuntimeError
+    listing the ones whose winning plan is a collection scan.
+    """
+    failures = []
+    for shape in QUERY_SHAPES:
+        cursor = db[shape["collection"]].find(shape["filter"])
+        if shape.get("sort"):
+            cursor = cursor.sort(shape["sort"])
+        explain = await cursor.explain()
+        if _has_collscan(explain.get("queryPlanner", {}).get("winningPlan")):
+            failures.append(f"{shape['collection']}: {shape['filter']}")
+
+    if failures:
+        raise RuntimeError("Queries falling back to COLLSCAN:\n" + "\n".join(failures))
+
+async def _main():
+    await ensure_indexes()
+    await verify_query_plans()
+    print(f"{len(QUERY_SHAPES)} query shapes use an index")
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(_main())
+    except RuntimeError as error:
+        sys.exit(str(error))
@@ -0,0 +1,99 @@
+from typing import Dict, Tuple
+from pymongo import monitoring
+
+from utils.metrics import Counter, Gauge, Histogram
+from utils.profiling import record_query
+
+mongo_commands = Counter(
+    "mongo_commands_total", "MongoDB commands by name, collection and outcome",
+    labels=("command", "collection", "status")
+)
+mongo_command_duration = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command round-trip time",
+    labels=("command", "collection")
+)
+mongo_pool_checkout_wait = Histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+)
+mongo_pool_checkout_failures = Counter(
+    "mongo_pool_checkout_failures_total", "Connection checkouts that failed, by reason", labels=("reason",)
+)
+mongo_pool_connections = Gauge("mongo_pool_connections", "Open pooled connections")
+mongo_pool_checked_out = Gauge("mongo_pool_checked_out", "Pooled connections currently in use")
+
+# Commands that carry no collection name (or are issued by the driver itself)
+_NO_COLLECTION = ""
+
+def _collection(event: monitoring.CommandStartedEvent) -> str:
+    if event.command_name == "getMore":
+        return str(event.command.get("collection", _NO_COLLECTION))
+    target = event.command.get(event.command_name)
+    return target if isinstance(target, str) else _NO_COLLECTION
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """
+    Records the count and duration of every command, by name and collection,
+    and reports it to the active request profiles.
+    """
+
+    def __init__(self):
+        # Collection of in-flight commands; the completion events do not carry it
+        self._collections: Dict[Tuple[int, object], str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        self._collections[(event.request_id, event.connection_id)] = _collection(event)
+
+    def _finished(self, event, status: str):
+        collection = self._collections.pop((event.request_id, event.connection_id), _NO_COLLECTION)
+        duration = event.duration_micros / 1_000_000
+        mongo_commands.inc(command=event.command_name, collection=collection, status=status)
+        mongo_command_duration.observe(duration, command=event.command_name, collection=collection)
+        record_query(duration)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finished(event, "ok")
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finished(event, "error")
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Tracks pool size, connections in use and how long checkouts wait."""
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        mongo_pool_connections.inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        mongo_pool_connections.dec()
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        mongo_pool_checkout_failures.inc(reason=event.reason)
+        mongo_pool_checkout_wait.observe(event.duration)
+
+    def connection_checked_out(self, event):
+        mongo_pool_checked_out.inc()
+        mongo_pool_checkout_wait.observe(event.duration)
+
+    def connection_checked_in(self, event):
+        mongo_pool_checked_out.dec()
+
+def event_listeners() -> list:
+    return [CommandMetricsListener(), PoolMetricsListener()]
@@ -1,11 +1,58 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends
 import uvicorn
 from routes.auth import router as auth_router
 from routes.profile import router as profile_router
 from routes.post import router as post_router
-from utils.auth import get_current_user
+from routes.metrics import router as metrics_router
+from routes.files import router as files_router
+from routes.realtime import router as realtime_router
+from routes.study_groups import router as study_groups_router
+from routes.activity import router as activity_router
+from utils.auth import get_current_user, password_hasher
+from config.database import connect as connect_database, close as close_database
+from config.indexes import ensure_indexes, verify_query_plans, VERIFY_QUERY_PLANS
+from utils.reactions import run_reconciliation_periodically, RECONCILE_INTERVAL_SECONDS
+from utils.deletions import run_deletion_worker
+from utils.previews import run_preview_workers
+from utils.realtime import hub
+from utils.profiling import install_profiling
+from utils.ratelimit import bucket_store, install_admission_control
+from utils.compression import install_compression
+from utils.activity import activity_log
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await connect_database()
+    await ensure_indexes()
+    if VERIFY_QUERY_PLANS:
+        await verify_query_plans()
+    await hub.start()
+    activity_log.start()
+
+    background_tasks = [
+        asyncio.create_task(run_deletion_worker()),
+        asyncio.create_task(run_preview_workers()),
+    ]
+    if RECONCILE_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(run_reconciliation_periodically()))
+
+    yield
+
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await hub.close()
+    await activity_log.stop()
+    await bucket_store.close()
+    password_hasher.shutdown()
+    close_database()
+
+app = FastAPI(lifespan=lifespan)
+install_profiling(app)
+install_admission_control(app)
+install_compression(app)
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -30,6 +77,11 @@ app.add_middleware(
 app.include_router(auth_router)
 app.include_router(profile_router)
 app.include_router(post_router)
+app.include_router(files_router)
+app.include_router(metrics_router)
+app.include_router(realtime_router)
+app.include_router(study_groups_router)
+app.include_router(activity_router)
 
 @app.get("/")
 async def root():
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class ActivityResponse(BaseModel):
+    id: str
+    user_id: str
+    type: str
+    target_id: Optional[str] = None
+    created_at: datetime
+    data: Optional[dict] = None
@@ -9,10 +9,23 @@ class FileType(str, Enum):
     PDF = "pdf"
     OTHER = "other"
 
+class PreviewStatus(str, Enum):
+    PENDING = "pending"
+    READY = "ready"
+    FAILED = "failed"
+
 class AttachedFile(BaseModel):
     url: str
     file_type: FileType
     filename: str
+    file_id: Optional[str] = None  # Set for files uploaded through /files
+    size: Optional[int] = None
+    sha256: Optional[str] = Field(None, pattern=r"^[0-9a-f]{64}$")
+    # Generated in the background for uploaded files, see utils/previews.py
+    preview_status: Optional[PreviewStatus] = None
+    thumbnail_url: Optional[str] = None
+    preview_url: Optional[str] = None  # First page of a PDF
+    text_snippet: Optional[str] = None
 
 class PostBase(BaseModel):
     content: str
@@ -40,6 +53,9 @@ class PostResponse(PostBase):
     disliked_by_me: Optional[bool] = None
     comments: List['PostResponse'] = []  # Recursive for nested comments
     parent_post_id: Optional[str] = None  # For comments, reference to parent post/comment
+    has_more_comments: bool = False  # Replies were left out by max_depth/max_children
+    comments_cursor: Optional[str] = None  # Continue with GET /posts/{id}?cursor=...
+    comment_count: Optional[int] = None  # Comments at any depth below the post
     
     class Config:
         from_attributes = True
@@ -47,11 +63,59 @@ class PostResponse(PostBase):
 # Create a reference to handle the recursive nature of PostResponse
 PostResponse.model_rebuild()
 
+class PostSummaryResponse(BaseModel):
+    """Feed card returned with view=summary: no comment tree, attachments or reaction flags."""
+    id: str
+    author_id: str
+    author_username: str
+    author_profile: dict
+    content: str  # At most SUMMARY_CONTENT_CHARS characters
+    content_truncated: bool = False
+    created_at: datetime
+    likes_count: int = 0
+    dislikes_count: int = 0
+    comment_count: int = 0
+    parent_post_id: Optional[str] = None
+
+class PostView(str, Enum):
+    SUMMARY = "summary"
+    FULL = "full"
+
 class ReactionType(str, Enum):
     LIKE = "like"
     DISLIKE = "dislike"
     NONE = "none"
 
+class FeedScope(str, Enum):
+    GLOBAL = "global"
+    UNIVERSITY = "university"
+    MAJOR = "major"
+
+class FeedOrder(str, Enum):
+    RECENT = "recent"
+    TRENDING = "trending"
+
 class PostReaction(BaseModel):
     post_id: str
     reaction_type: ReactionType
+
+class CommentCreate(PostCreate):
+    parent_post_id: str
+
+class BatchItemStatus(str, Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    ERROR = "error"
+    SKIPPED = "skipped"  # Not attempted after an earlier error of an ordered batch
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: BatchItemStatus
+    id: Optional[str] = None
+    error: Optional[Union[str, List[dict]]] = None
+
+class BatchResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult]
+    posts: Optional[List[PostResponse]] = None  # Only with hydrate=true
@@ -0,0 +1,13 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+
+class ChatMessageCreate(BaseModel):
+    content: str = Field(..., min_length=1, max_length=4000)
+
+class ChatMessageResponse(BaseModel):
+    id: str
+    group_id: str
+    author_id: str
+    author_username: str
+    content: str
+    created_at: datetime
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, Query
+from typing import List, Optional
+
+from models.Activity import ActivityResponse
+from config.database import db
+from utils.auth import get_current_user
+from models.User import UserResponse
+from utils.serializers import encode_response
+from utils.pagination import FEED_SORT, NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, keyset_filter
+
+router = APIRouter(prefix="/activity", tags=["activity"])
+
+@router.get("", response_model=List[ActivityResponse])
+async def get_activity(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Recent activity of the current user, newest first."""
+    query = {"user_id": current_user["id"]}
+    if cursor:
+        query.update(keyset_filter(*decode_cursor(cursor)))
+    events = await db.activity.find(query).sort(FEED_SORT).limit(limit).to_list(length=None)
+
+    headers = None
+    if len(events) == limit:
+        headers = {NEXT_CURSOR_HEADER: encode_cursor(events[-1]["created_at"], events[-1]["_id"])}
+    return encode_response(ActivityResponse, events, many=True, headers=headers)
@@ -4,13 +4,15 @@ from datetime import timedelta, datetime
 from models.User import UserCreate, UserResponse
 from config.database import db
 from utils.auth import (
-    verify_password,
-    get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
     create_access_token,
+    invalidate_user,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from models.UserProfile import UserProfilePublicResponse
-from utils.serializers import serialize_mongo_doc
+from utils.serializers import serialize_mongo_doc, encode_response
+from utils.activity import activity_log
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -25,24 +27,36 @@ async def register(user: UserCreate):
     
     # Create new user
     user_dict = user.dict()
-    user_dict["hashed_password"] = get_password_hash(user_dict["password"])
+    user_dict["hashed_password"] = await get_password_hash_async(user_dict["password"])
     del user_dict["password"]
     
     result = await db.users.insert_one(user_dict)
     created_user = await db.users.find_one({"_id": result.inserted_id})
+    activity_log.record(str(result.inserted_id), "registered")
     
-    return serialize_mongo_doc(created_user)
+    return encode_response(UserResponse, created_user)
 
 @router.post("/login")
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     user = await db.users.find_one({"username": form_data.username})
-    if not user or not verify_password(form_data.password, user["hashed_password"]):
+    verified, new_hash = (
+        await verify_password_async(form_data.password, user["hashed_password"])
+        if user else (False, None)
+    )
+    if not verified:
         raise HTTPException(
             status_code=401,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Transparently upgrade hashes made with an outdated cost factor
+    if new_hash:
+        await db.users.update_one({"_id": user["_id"]}, {"$set": {"hashed_password": new_hash}})
+        invalidate_user(user["username"])
+    
+    activity_log.record(str(user["_id"]), "logged_in")
+    
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user["username"]}, expires_delta=access_token_expires
@@ -0,0 +1,94 @@
+from urllib.parse import quote
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from models.Post import AttachedFile
+from config.database import db
+from utils.auth import get_current_user
+from models.User import UserResponse
+from utils.serializers import encode_response
+from utils.storage import (
+    LocalFileStore,
+    attachment_to_file,
+    file_store,
+    parse_range,
+    save_attachment
+)
+
+router = APIRouter(prefix="/files", tags=["files"])
+
+# Content types a browser may render in place. The content type is the one the
+# uploader declared, so anything that can run script (SVG, HTML, XML...) is
+# always downloaded instead
+INLINE_CONTENT_TYPES = frozenset({
+    "image/png",
+    "image/jpeg",
+    "image/gif",
+    "image/webp",
+    "application/pdf",
+})
+
+@router.post("", response_model=AttachedFile)
+async def upload_file(
+    file: UploadFile = File(...),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    attachment = await save_attachment(file, current_user["id"])
+    return encode_response(AttachedFile, attachment_to_file(attachment))
+
+@router.get("/{file_id}")
+async def download_file(file_id: str, request: Request):
+    try:
+        attachment = await db.attachments.find_one({"_id": ObjectId(file_id)})
+    except InvalidId:
+        attachment = None
+    if not attachment:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    # Blobs are content-addressed, so the hash is a strong validator
+    etag = f'"{attachment["sha256"]}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=31536000, immutable",
+        # Browsers must not guess a more dangerous type than the declared one
+        "X-Content-Type-Options": "nosniff",
+    }
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    if not await file_store.exists(attachment["sha256"]):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    size = attachment["size"]
+    media_type = attachment["content_type"]
+    inline = media_type in INLINE_CONTENT_TYPES
+
+    if isinstance(file_store, LocalFileStore):
+        # FileResponse serves Range requests itself and hands the path to the
+        # server for zero-copy sending when it supports the pathsend extension
+        return FileResponse(
+            file_store.path(attachment["sha256"]),
+            media_type=media_type,
+            filename=attachment["filename"],
+            content_disposition_type="inline" if inline else "attachment",
+            headers=headers,
+        )
+
+    byte_range = None
+    if request.headers.get("if-range", etag) == etag:
+        byte_range = parse_range(request.headers.get("range"), size)
+    start, end = byte_range or (0, size - 1)
+    headers["Content-Length"] = str(end - start + 1)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Disposition"] = (
+        f"{'inline' if inline else 'attachment'}; filename*=utf-8''{quote(attachment['filename'])}"
+    )
+    return StreamingResponse(
+        file_store.iter_range(attachment["sha256"], start, end),
+        status_code=206 if byte_range else 200,
+        media_type=media_type,
+        headers=headers,
+    )
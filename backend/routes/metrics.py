@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from config.database import ping
+from utils.metrics import render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return render_metrics()
+
+@router.get("/health")
+async def health():
+    try:
+        latency = await ping()
+    except Exception as error:
+        return JSONResponse({"status": "unavailable", "detail": str(error)}, status_code=503)
+    return {"status": "ok", "mongo_ping_ms": round(latency * 1000, 2)}
@@ -1,66 +1,163 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
-from typing import List, Optional
+import asyncio
+import os
+from fastapi import APIRouter, Body, Depends, HTTPException, UploadFile, File, Query, Request
+from typing import Any, Dict, List, Optional, Set, Tuple, Type, Union
 from datetime import datetime
 from bson import ObjectId
+from pydantic import BaseModel, ValidationError
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 
 from models.Post import (
     PostCreate,
     PostUpdate,
     PostResponse,
+    PostSummaryResponse,
+    PostView,
     PostReaction,
     ReactionType,
     AttachedFile,
-    FileType
+    FileType,
+    FeedScope,
+    FeedOrder,
+    CommentCreate,
+    BatchItemStatus,
+    BatchResponse
 )
-from config.database import db
+from config.database import db, feed_db
 from utils.auth import get_current_user
 from models.User import UserResponse
-from utils.serializers import serialize_mongo_doc
+from utils.serializers import serialize_mongo_doc, encode_response, get_encoder
+from utils.hydration import SUMMARY_CONTENT_CHARS, hydrate_posts, post_projection
+from utils.pagination import (
+    FEED_SORT,
+    NEXT_CURSOR_HEADER,
+    decode_cursor,
+    encode_cursor,
+    keyset_filter
+)
+from utils.threads import NOT_DELETED, add_comment_counts, thread_fields, thread_root_id, bump_thread_revision
+from utils.reactions import swap_reaction, reaction_deltas
+from utils.search import search_index
+from utils.feeds import feed_query
+from utils.deletions import enqueue_deletion, hide_post, pending_deletions
+from utils.realtime import FEED_CHANNEL, hub, post_channel
+from utils.etags import make_etag, etag_matches, not_modified
+from utils.activity import activity_log
+from utils.previews import enqueue_previews, prepare_attachments
+from utils.storage import resolve_attachments
+from utils.trending import (
+    COMMENT_WEIGHT,
+    LIKE_WEIGHT,
+    POST_WEIGHT,
+    event_score,
+    read_trending,
+    record_engagement
+)
 
 router = APIRouter(prefix="/posts", tags=["posts"])
 
+# Largest batch accepted by the bulk endpoints
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+# Reaction swaps of an unordered batch run at most this many at a time
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+
 async def get_post_with_reactions(post: dict, current_user_id: str) -> dict:
-    # First serialize the post to handle ObjectId
-    post = serialize_mongo_doc(post)
-    
-    # Add reaction info
-    user_reaction = await db.post_reactions.find_one({
-        "post_id": post["id"],  # Now using the serialized id
-        "user_id": current_user_id
-    })
-    post["liked_by_me"] = user_reaction["reaction_type"] == ReactionType.LIKE if user_reaction else False
-    post["disliked_by_me"] = user_reaction["reaction_type"] == ReactionType.DISLIKE if user_reaction else False
-    
-    # Get author profile
-    author = await db.users.find_one({"_id": ObjectId(post["author_id"])})
-    author_profile = await db.user_profiles.find_one({"user_id": post["author_id"]})
-    post["author_username"] = author["username"]
-    post["author_profile"] = serialize_mongo_doc({
-        "first_name": author_profile.get("first_name"),
-        "last_name": author_profile.get("last_name"),
-        "profile_picture_url": author_profile.get("profile_picture_url")
-    } if author_profile else {})
-    
-    # Get comments
-    comments = await db.posts.find({"parent_post_id": post["id"]}).to_list(length=None)
-    post["comments"] = [await get_post_with_reactions(comment, current_user_id) for comment in comments]
-    
-    return post
+    return (await hydrate_posts([post], current_user_id))[0]
+
+def select_fields(
+    view: PostView, fields: Optional[str]
+) -> Tuple[Type[BaseModel], Optional[Set[str]], Optional[dict]]:
+    """
+    Response model, sparse fieldset and Mongo projection for the view= and
+    fields= parameters. fields is a comma-separated list of the view's model
+    fields; the full view without fields loads and returns whole posts.
+    """
+    model = PostSummaryResponse if view == PostView.SUMMARY else PostResponse
+    if fields is None:
+        if view == PostView.FULL:
+            return model, None, None
+        selected = set(model.model_fields)
+    else:
+        selected = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = selected - set(model.model_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        selected.add("id")
+    content_chars = SUMMARY_CONTENT_CHARS if view == PostView.SUMMARY else None
+    return model, selected, post_projection(selected, content_chars)
+
+async def find_feed_page(
+    query: dict,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    projection: Optional[dict] = None
+) -> Tuple[List[dict], Optional[Dict[str, str]]]:
+    """
+    Fetch one page of posts, newest first.
+    With a cursor the page starts right after it (keyset pagination) and skip
+    is ignored; otherwise skip/limit is used as before. When the page is full,
+    also returns the X-Next-Cursor header pointing at the next page.
+    """
+    if cursor:
+        query = {**query, **keyset_filter(*decode_cursor(cursor))}
+        skip = 0
+
+    posts = await feed_db.posts.find(query, projection).sort(FEED_SORT).skip(skip).limit(limit).to_list(length=None)
+    if len(posts) < limit:
+        return posts, None
+    return posts, {NEXT_CURSOR_HEADER: encode_cursor(posts[-1]["created_at"], posts[-1]["_id"])}
+
+def new_post_document(post: PostCreate, author_id: str, author_profile: dict) -> dict:
+    post_dict = post.model_dump()
+    post_dict["author_id"] = author_id
+    post_dict["created_at"] = datetime.utcnow()
+    post_dict["ancestor_ids"] = []
+    post_dict["depth"] = 0
+    post_dict["likes_count"] = 0
+    post_dict["dislikes_count"] = 0
+    post_dict["comment_count"] = 0
+    post_dict["revision"] = 0
+    post_dict["hot_score"] = event_score(POST_WEIGHT, post_dict["created_at"])
+    # Scope of the author at publish time, used by the scoped feeds
+    post_dict["author_university"] = author_profile.get("university")
+    post_dict["author_major"] = author_profile.get("major")
+    return post_dict
+
+def new_comment_document(comment: PostCreate, author_id: str, parent_post: dict) -> dict:
+    comment_dict = comment.model_dump(exclude={"parent_post_id"})
+    comment_dict["author_id"] = author_id
+    comment_dict["created_at"] = datetime.utcnow()
+    comment_dict.update(thread_fields(parent_post))
+    comment_dict["likes_count"] = 0
+    comment_dict["dislikes_count"] = 0
+    comment_dict["comment_count"] = 0
+    return comment_dict
 
 @router.post("", response_model=PostResponse)
 async def create_post(
     post: PostCreate,
     current_user: UserResponse = Depends(get_current_user)
 ):
-    post_dict = post.model_dump()
-    post_dict["author_id"] = current_user["id"]
-    post_dict["created_at"] = datetime.utcnow()
-    post_dict["likes_count"] = 0
-    post_dict["dislikes_count"] = 0
+    author_profile = await db.user_profiles.find_one(
+        {"user_id": current_user["id"]}, {"university": 1, "major": 1}
+    ) or {}
     
+    post_dict = new_post_document(post, current_user["id"], author_profile)
+    (error,) = await resolve_attachments([post_dict], current_user["id"])
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    await prepare_attachments([post_dict])
     result = await db.posts.insert_one(post_dict)
     created_post = await db.posts.find_one({"_id": result.inserted_id})
-    return await get_post_with_reactions(created_post, current_user["id"])
+    await enqueue_previews([created_post])
+    
+    await search_index.index_post(created_post, author_profile)
+    activity_log.record(current_user["id"], "post_created", str(created_post["_id"]))
+    hydrated = await get_post_with_reactions(created_post, current_user["id"])
+    await hub.publish(FEED_CHANNEL, {"type": "post_created", "post": get_encoder(PostResponse)(hydrated)})
+    return encode_response(PostResponse, hydrated)
 
 @router.post("/{post_id}/comments", response_model=PostResponse)
 async def create_comment(
@@ -68,148 +165,464 @@ async def create_comment(
     comment: PostCreate,
     current_user: UserResponse = Depends(get_current_user)
 ):
-    # Verify parent post exists
-    parent_post = await db.posts.find_one({"_id": ObjectId(post_id)})
-    if not parent_post:
+    # Verify parent post exists and its thread is not being deleted
+    parent_post = await db.posts.find_one({"_id": ObjectId(post_id), **NOT_DELETED})
+    if not parent_post or await pending_deletions([post_id, *parent_post.get("ancestor_ids", [])]):
         raise HTTPException(status_code=404, detail="Post not found")
     
-    comment_dict = comment.model_dump()
-    comment_dict["author_id"] = current_user["id"]
-    comment_dict["created_at"] = datetime.utcnow()
-    comment_dict["parent_post_id"] = post_id
-    comment_dict["likes_count"] = 0
-    comment_dict["dislikes_count"] = 0
-    
+    comment_dict = new_comment_document(comment, current_user["id"], parent_post)
+    (error,) = await resolve_attachments([comment_dict], current_user["id"])
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    await prepare_attachments([comment_dict])
     result = await db.posts.insert_one(comment_dict)
+    await add_comment_counts([comment_dict])
     created_comment = await db.posts.find_one({"_id": result.inserted_id})
-    return await get_post_with_reactions(created_comment, current_user["id"])
+    await enqueue_previews([created_comment])
+    await bump_thread_revision(thread_root_id(created_comment))
+    await record_engagement({thread_root_id(created_comment): COMMENT_WEIGHT})
+    activity_log.record(current_user["id"], "comment_created", str(created_comment["_id"]), parent_post_id=post_id)
+    hydrated = await get_post_with_reactions(created_comment, current_user["id"])
+    await hub.publish(
+        post_channel(thread_root_id(created_comment)),
+        {"type": "comment_created", "comment": get_encoder(PostResponse)(hydrated)}
+    )
+    return encode_response(PostResponse, hydrated)
 
-@router.post("/{post_id}/reaction")
+@router.post("/{post_id}/reaction", response_model=PostResponse)
 async def react_to_post(
     post_id: str,
     reaction: PostReaction,
     current_user: UserResponse = Depends(get_current_user)
 ):
     # Verify post exists
-    post = await db.posts.find_one({"_id": ObjectId(post_id)})
+    post = await db.posts.find_one({"_id": ObjectId(post_id), **NOT_DELETED})
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
-    # Get current reaction
-    current_reaction = await db.post_reactions.find_one({
-        "post_id": post_id,
-        "user_id": current_user["id"]
-    })
-    
-    update_dict = {}
-    if current_reaction:
-        old_reaction = current_reaction["reaction_type"]
-        # Remove old reaction count
-        if old_reaction == ReactionType.LIKE:
-            update_dict["likes_count"] = post["likes_count"] - 1
-        elif old_reaction == ReactionType.DISLIKE:
-            update_dict["dislikes_count"] = post["dislikes_count"] - 1
-    
-    # Add new reaction count
-    if reaction.reaction_type == ReactionType.LIKE:
-        update_dict["likes_count"] = post.get("likes_count", 0) + 1
-    elif reaction.reaction_type == ReactionType.DISLIKE:
-        update_dict["dislikes_count"] = post.get("dislikes_count", 0) + 1
-    
-    # Update post reaction counts
-    if update_dict:
-        await db.posts.update_one(
+    # Swap the user's reaction atomically, then apply the resulting deltas server-side
+    old_reaction, first_like = await swap_reaction(post_id, current_user["id"], reaction.reaction_type)
+    deltas = reaction_deltas(old_reaction, reaction.reaction_type)
+    activity_log.record(current_user["id"], "reacted", post_id, reaction_type=reaction.reaction_type.value)
+    if deltas:
+        post = await db.posts.find_one_and_update(
             {"_id": ObjectId(post_id)},
-            {"$set": update_dict}
+            {"$inc": deltas},
+            return_document=ReturnDocument.AFTER
         )
-    
-    # Update user reaction
-    if reaction.reaction_type == ReactionType.NONE:
-        await db.post_reactions.delete_one({
+        await bump_thread_revision(thread_root_id(post))
+        # Liking the same post again after unliking it earns nothing more
+        if first_like:
+            await record_engagement({thread_root_id(post): LIKE_WEIGHT})
+        await hub.publish(post_channel(thread_root_id(post)), {
+            "type": "reaction_updated",
             "post_id": post_id,
-            "user_id": current_user["id"]
+            "likes_count": post["likes_count"],
+            "dislikes_count": post["dislikes_count"],
         })
-    else:
-        await db.post_reactions.update_one(
-            {
-                "post_id": post_id,
-                "user_id": current_user["id"]
-            },
-            {
-                "$set": {
-                    "reaction_type": reaction.reaction_type,
-                    "updated_at": datetime.utcnow()
-                }
-            },
-            upsert=True
+    
+    return encode_response(PostResponse, await get_post_with_reactions(post, current_user["id"]))
+
+def _validate_items(model, items: List[Any], results: List[dict], ordered: bool) -> List[Tuple[int, Any]]:
+    """
+    Validate batch items one by one, recording an error result for every
+    invalid item. An ordered batch stops at the first invalid item.
+    """
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, model.model_validate(item)))
+        except ValidationError as error:
+            results[index] = {
+                "index": index, "status": BatchItemStatus.ERROR, "error": error.errors(include_url=False)
+            }
+            if ordered:
+                break
+    return valid
+
+async def _insert_batch(documents: List[dict], positions: List[int], results: List[dict], ordered: bool) -> List[dict]:
+    """
+    insert_many the documents of a batch and record their per-item results.
+    Returns the documents that were inserted.
+    """
+    if not documents:
+        return []
+    failed = {}
+    try:
+        await db.posts.insert_many(documents, ordered=ordered)
+    except BulkWriteError as error:
+        failed = {write_error["index"]: write_error["errmsg"] for write_error in error.details["writeErrors"]}
+
+    created = []
+    first_failure = min(failed, default=len(documents))
+    for offset, (document, index) in enumerate(zip(documents, positions)):
+        if offset in failed:
+            results[index] = {"index": index, "status": BatchItemStatus.ERROR, "error": failed[offset]}
+        elif not ordered or offset < first_failure:
+            results[index] = {"index": index, "status": BatchItemStatus.CREATED, "id": str(document["_id"])}
+            created.append(document)
+    return created
+
+def _batch_response(results: List[dict], hydrated: Optional[List[dict]]):
+    failed = sum(result["status"] == BatchItemStatus.ERROR for result in results)
+    succeeded = sum(result["status"] in (BatchItemStatus.CREATED, BatchItemStatus.UPDATED) for result in results)
+    return encode_response(
+        BatchResponse,
+        {"succeeded": succeeded, "failed": failed, "results": results, "posts": hydrated}
+    )
+
+def _pending_results(items: List[Any]) -> List[dict]:
+    return [{"index": index, "status": BatchItemStatus.SKIPPED} for index in range(len(items))]
+
+@router.post("/batch", response_model=BatchResponse)
+async def create_posts_batch(
+    items: List[Any] = Body(..., min_length=1, max_length=BATCH_MAX_ITEMS),
+    ordered: bool = True,
+    hydrate: bool = False,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Create many posts at once. Items are validated as PostCreate one by one
+    and inserted with a single insert_many. An ordered batch stops at the
+    first failing item and reports the rest as skipped.
+    Returns per-item results with the new ids; hydrate=true also returns the posts.
+    """
+    author_profile = await db.user_profiles.find_one(
+        {"user_id": current_user["id"]}, {"university": 1, "major": 1}
+    ) or {}
+    results = _pending_results(items)
+    valid = _validate_items(PostCreate, items, results, ordered)
+    drafts = [new_post_document(post, current_user["id"], author_profile) for _, post in valid]
+    errors = await resolve_attachments(drafts, current_user["id"])
+    documents, positions = [], []
+    for (index, _), document, error in zip(valid, drafts, errors):
+        if error:
+            results[index] = {"index": index, "status": BatchItemStatus.ERROR, "error": error}
+            if ordered:
+                break
+            continue
+        documents.append(document)
+        positions.append(index)
+    await prepare_attachments(documents)
+    created = await _insert_batch(documents, positions, results, ordered)
+    
+    hydrated = None
+    if created:
+        await enqueue_previews(created)
+        await search_index.index_posts(created, author_profile)
+        for post in created:
+            activity_log.record(current_user["id"], "post_created", str(post["_id"]))
+        hydrated = await hydrate_posts(created, current_user["id"])
+        encode = get_encoder(PostResponse)
+        for post in hydrated:
+            await hub.publish(FEED_CHANNEL, {"type": "post_created", "post": encode(post)})
+    return _batch_response(results, hydrated if hydrate else None)
+
+@router.post("/comments/batch", response_model=BatchResponse)
+async def create_comments_batch(
+    items: List[Any] = Body(..., min_length=1, max_length=BATCH_MAX_ITEMS),
+    ordered: bool = True,
+    hydrate: bool = False,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Create many comments at once, validated as CommentCreate. A comment may
+    reply to an earlier item of the same batch, so whole threads can be
+    imported in one request. Parents are loaded with one query and the
+    comments written with one insert_many.
+    """
+    results = _pending_results(items)
+    valid = _validate_items(CommentCreate, items, results, ordered)
+    
+    parent_ids = {comment.parent_post_id for _, comment in valid if ObjectId.is_valid(comment.parent_post_id)}
+    parents = {
+        str(parent["_id"]): parent
+        async for parent in db.posts.find(
+            {"_id": {"$in": [ObjectId(parent_id) for parent_id in parent_ids]}, **NOT_DELETED}, {"ancestor_ids": 1}
         )
+    }
+    # Replies into a thread whose deletion is under way are refused like missing parents
+    deleting = await pending_deletions({
+        post_id for parent_id, parent in parents.items() for post_id in [parent_id, *parent.get("ancestor_ids", [])]
+    })
+    parents = {
+        parent_id: parent for parent_id, parent in parents.items()
+        if deleting.isdisjoint([parent_id, *parent.get("ancestor_ids", [])])
+    }
+    # Resolved before the thread is built, so replies to a rejected item fail too
+    drafts = [
+        {"attached_files": [attached_file.model_dump() for attached_file in comment.attached_files or []]}
+        for _, comment in valid
+    ]
+    errors = await resolve_attachments(drafts, current_user["id"])
+    documents, positions = [], []
+    for (index, comment), draft, error in zip(valid, drafts, errors):
+        parent = parents.get(comment.parent_post_id)
+        if error is None and parent is None:
+            error = "Post not found"
+        if error:
+            results[index] = {"index": index, "status": BatchItemStatus.ERROR, "error": error}
+            if ordered:
+                break
+            continue
+        comment_dict = new_comment_document(comment, current_user["id"], parent)
+        comment_dict["attached_files"] = draft["attached_files"]
+        comment_dict["_id"] = ObjectId()
+        parents[str(comment_dict["_id"])] = comment_dict
+        documents.append(comment_dict)
+        positions.append(index)
+    await prepare_attachments(documents)
+    created = await _insert_batch(documents, positions, results, ordered)
     
-    updated_post = await db.posts.find_one({"_id": ObjectId(post_id)})
-    return await get_post_with_reactions(updated_post, current_user["id"])
+    hydrated = None
+    if created:
+        await add_comment_counts(created)
+        await enqueue_previews(created)
+        await bump_thread_revision(*{thread_root_id(comment) for comment in created})
+        engagement: Dict[str, float] = {}
+        for comment in created:
+            root_id = thread_root_id(comment)
+            engagement[root_id] = engagement.get(root_id, 0) + COMMENT_WEIGHT
+        await record_engagement(engagement)
+        for comment in created:
+            activity_log.record(
+                current_user["id"], "comment_created", str(comment["_id"]), parent_post_id=comment["parent_post_id"]
+            )
+        hydrated = await hydrate_posts(created, current_user["id"])
+        encode = get_encoder(PostResponse)
+        for comment in hydrated:
+            await hub.publish(
+                post_channel(thread_root_id(comment)), {"type": "comment_created", "comment": encode(comment)}
+            )
+    return _batch_response(results, hydrated if hydrate else None)
 
-@router.get("", response_model=List[PostResponse])
+@router.post("/reactions/batch", response_model=BatchResponse)
+async def react_to_posts_batch(
+    items: List[Any] = Body(..., min_length=1, max_length=BATCH_MAX_ITEMS),
+    ordered: bool = True,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Apply many reactions at once, validated as PostReaction. Each reaction
+    is still swapped atomically, since the previous value decides the
+    counter deltas; the swaps of an unordered batch run concurrently. The
+    counters of every touched post are then updated with one bulk_write.
+    """
+    results = _pending_results(items)
+    valid = _validate_items(PostReaction, items, results, ordered)
+    
+    post_ids = {reaction.post_id for _, reaction in valid if ObjectId.is_valid(reaction.post_id)}
+    posts = {
+        str(post["_id"]): post
+        async for post in db.posts.find(
+            {"_id": {"$in": [ObjectId(post_id) for post_id in post_ids]}, **NOT_DELETED}, {"ancestor_ids": 1}
+        )
+    }
+    deltas: Dict[str, Dict[str, int]] = {}
+    first_likes: Dict[str, int] = {}
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def apply(index: int, reaction: PostReaction) -> bool:
+        if reaction.post_id not in posts:
+            results[index] = {"index": index, "status": BatchItemStatus.ERROR, "error": "Post not found"}
+            return False
+        try:
+            async with semaphore:
+                old_reaction, first_like = await swap_reaction(
+                    reaction.post_id, current_user["id"], reaction.reaction_type
+                )
+        except PyMongoError as error:
+            results[index] = {"index": index, "status": BatchItemStatus.ERROR, "error": str(error)}
+            return False
+        post_deltas = deltas.setdefault(reaction.post_id, {})
+        for counter, delta in reaction_deltas(old_reaction, reaction.reaction_type).items():
+            post_deltas[counter] = post_deltas.get(counter, 0) + delta
+        if first_like:
+            first_likes[reaction.post_id] = first_likes.get(reaction.post_id, 0) + 1
+        results[index] = {"index": index, "status": BatchItemStatus.UPDATED, "id": reaction.post_id}
+        activity_log.record(
+            current_user["id"], "reacted", reaction.post_id, reaction_type=reaction.reaction_type.value
+        )
+        return True
+    
+    if ordered:
+        for index, reaction in valid:
+            if not await apply(index, reaction):
+                break
+    else:
+        await asyncio.gather(*(apply(index, reaction) for index, reaction in valid))
+    
+    # Credited even when withdrawn later in the batch, as it would be one request at a time
+    engagement: Dict[str, float] = {}
+    for post_id, count in first_likes.items():
+        root_id = thread_root_id(posts[post_id])
+        engagement[root_id] = engagement.get(root_id, 0) + LIKE_WEIGHT * count
+    await record_engagement(engagement)
+
+    # Reactions that cancel each other out inside the batch leave no delta
+    changed = {}
+    for post_id, post_deltas in deltas.items():
+        post_deltas = {counter: delta for counter, delta in post_deltas.items() if delta}
+        if post_deltas:
+            changed[post_id] = post_deltas
+    if changed:
+        await db.posts.bulk_write([
+            UpdateOne({"_id": ObjectId(post_id)}, {"$inc": post_deltas})
+            for post_id, post_deltas in changed.items()
+        ], ordered=False)
+        await bump_thread_revision(*{thread_root_id(posts[post_id]) for post_id in changed})
+        async for post in db.posts.find(
+            {"_id": {"$in": [ObjectId(post_id) for post_id in changed]}},
+            {"ancestor_ids": 1, "likes_count": 1, "dislikes_count": 1}
+        ):
+            await hub.publish(post_channel(thread_root_id(post)), {
+                "type": "reaction_updated",
+                "post_id": str(post["_id"]),
+                "likes_count": post["likes_count"],
+                "dislikes_count": post["dislikes_count"],
+            })
+    return _batch_response(results, None)
+
+@router.get("", response_model=List[Union[PostResponse, PostSummaryResponse]])
 async def get_posts(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    scope: FeedScope = FeedScope.GLOBAL,
+    order: FeedOrder = FeedOrder.RECENT,
+    view: PostView = PostView.FULL,
+    fields: Optional[str] = None,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    model, selected, projection = select_fields(view, fields)
+    scope_value = None
+    if scope != FeedScope.GLOBAL:
+        profile = await db.user_profiles.find_one({"user_id": current_user["id"]}, {scope.value: 1})
+        if not profile or not profile.get(scope.value):
+            raise HTTPException(status_code=400, detail=f"Set a {scope.value} in your profile first")
+        scope_value = profile[scope.value]
+    
+    if order == FeedOrder.TRENDING:
+        # Hot scores change between requests, so trending pages use skip/limit
+        posts = await read_trending(scope, scope_value, skip, limit, projection)
+        headers = None
+    else:
+        # Top-level posts only (no comments), of the whole site or the user's scope
+        posts, headers = await find_feed_page(feed_query(scope, scope_value), skip, limit, cursor, projection)
+    
+    hydrated = await hydrate_posts(posts, current_user["id"], fields=selected)
+    return encode_response(model, hydrated, many=True, headers=headers, fields=selected)
+
+@router.get("/search", response_model=List[PostResponse])
+async def search_posts(
+    q: str = Query(..., min_length=1),
+    university: Optional[str] = None,
+    major: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
     current_user: UserResponse = Depends(get_current_user)
 ):
-    # Get only top-level posts (no comments)
+    ranked = await search_index.search(q, university, major, limit)
+    if not ranked:
+        return encode_response(PostResponse, [], many=True)
+    
     posts = await db.posts.find(
-        {"parent_post_id": None}
-    ).sort("created_at", -1).skip(skip).limit(limit).to_list(length=None)
+        {"_id": {"$in": [ObjectId(post_id) for post_id, _ in ranked]}, **NOT_DELETED}
+    ).to_list(length=None)
+    rank = {post_id: position for position, (post_id, _) in enumerate(ranked)}
+    posts.sort(key=lambda post: rank[str(post["_id"])])
     
-    return [await get_post_with_reactions(post, current_user["id"]) for post in posts]
+    return encode_response(PostResponse, await hydrate_posts(posts, current_user["id"]), many=True)
 
-@router.get("/{post_id}", response_model=PostResponse)
+@router.get("/{post_id}", response_model=Union[PostResponse, PostSummaryResponse])
 async def get_post(
     post_id: str,
+    request: Request,
+    max_depth: Optional[int] = Query(None, ge=0),
+    max_children: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    view: PostView = PostView.FULL,
+    fields: Optional[str] = None,
     current_user: UserResponse = Depends(get_current_user)
 ):
-    post = await db.posts.find_one({"_id": ObjectId(post_id)})
+    model, selected, projection = select_fields(view, fields)
+    if projection is not None:
+        projection.update({"ancestor_ids": 1, "revision": 1})
+    after = decode_cursor(cursor) if cursor else None
+    post = await db.posts.find_one({"_id": ObjectId(post_id), **NOT_DELETED}, projection)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
-    return await get_post_with_reactions(post, current_user["id"])
+    # Every write that changes how a thread renders bumps its root's revision
+    root = post
+    if post.get("ancestor_ids"):
+        root = await db.posts.find_one({"_id": ObjectId(thread_root_id(post))}, {"revision": 1}) or {}
+    etag = make_etag(
+        post_id, root.get("revision", 0), current_user["id"], max_depth, max_children, cursor,
+        view.value, ",".join(sorted(selected)) if fields is not None else ""
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag, "private, no-cache")
+    
+    hydrated = await hydrate_posts([post], current_user["id"], max_depth, max_children, after, selected)
+    return encode_response(
+        model, hydrated[0], headers={"ETag": etag, "Cache-Control": "private, no-cache"}, fields=selected
+    )
 
-@router.get("/user/{author_id}", response_model=List[PostResponse])
+@router.get("/user/{author_id}", response_model=List[Union[PostResponse, PostSummaryResponse]])
 async def get_user_posts(
     author_id: str,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    view: PostView = PostView.FULL,
+    fields: Optional[str] = None,
     current_user: UserResponse = Depends(get_current_user)
 ):
-    posts = await db.posts.find(
-        {"author_id": author_id, "parent_post_id": None}
-    ).sort("created_at", -1).skip(skip).limit(limit).to_list(length=None)
+    model, selected, projection = select_fields(view, fields)
+    posts, headers = await find_feed_page(
+        {"author_id": author_id, "parent_post_id": None, **NOT_DELETED}, skip, limit, cursor, projection
+    )
     
-    return [await get_post_with_reactions(post, current_user["id"]) for post in posts]
+    hydrated = await hydrate_posts(posts, current_user["id"], fields=selected)
+    return encode_response(model, hydrated, many=True, headers=headers, fields=selected)
 
-@router.delete("/{post_id}")
+@router.delete("/{post_id}", status_code=202)
 async def delete_post(
     post_id: str,
     current_user: UserResponse = Depends(get_current_user)
 ):
-    # Verify post exists and belongs to user
-    post = await db.posts.find_one({
-        "_id": ObjectId(post_id),
-        "author_id": current_user["id"]
-    })
+    post = await db.posts.find_one(
+        {"_id": ObjectId(post_id), "author_id": current_user["id"], **NOT_DELETED}, {"_id": 1, "ancestor_ids": 1}
+    )
     if not post:
         raise HTTPException(status_code=404, detail="Post not found or unauthorized")
     
-    # Delete all comments recursively
-    async def delete_comments(post_id: str):
-        comments = await db.posts.find({"parent_post_id": post_id}).to_list(length=None)
-        for comment in comments:
-            await delete_comments(str(comment["_id"]))
-        await db.posts.delete_many({"parent_post_id": post_id})
+    # The tombstone is written first, so that a crash past this point leaves
+    # a job for the worker, which removes the comments, the reactions and
+    # finally the post itself
+    await enqueue_deletion(post_id, current_user["id"])
+    # Hidden right away (unless the worker got there first), the post and
+    # its replies leave the counts above it
+    await hide_post(post_id)
+    activity_log.record(current_user["id"], "post_deleted", post_id)
     
-    await delete_comments(post_id)
+    if post.get("ancestor_ids"):
+        await bump_thread_revision(thread_root_id(post))
     
-    # Delete post reactions
-    await db.post_reactions.delete_many({"post_id": post_id})
+    event = {"type": "post_deleted", "post_id": post_id}
+    if not post.get("ancestor_ids"):
+        await hub.publish(FEED_CHANNEL, event)
+    await hub.publish(post_channel(thread_root_id(post)), event)
     
-    # Delete the post itself
-    await db.posts.delete_one({"_id": ObjectId(post_id)})
+    return {"message": "Post deleted, its comments are being removed", "deletion_id": post_id}
+
+@router.get("/{post_id}/deletion")
+async def get_deletion_status(
+    post_id: str,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    job = await db.deletion_jobs.find_one({"_id": post_id, "requested_by": current_user["id"]})
+    if not job:
+        raise HTTPException(status_code=404, detail="Deletion not found")
     
-    return {"message": "Post and all its comments deleted successfully"} 
\ No newline at end of file
+    return serialize_mongo_doc(job)
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+import os
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Response
 from typing import Optional
 from bson import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime, date
 
 from models.UserProfile import (
@@ -12,10 +14,40 @@ from models.UserProfile import (
 from config.database import db
 from utils.auth import get_current_user
 from models.User import UserResponse
-from utils.serializers import serialize_mongo_doc
+from utils.serializers import encode_response
+from utils.authors import author_summaries, AUTHOR_PROFILE_FIELDS
+from utils.cache import Generations, TTLCache
+from utils.etags import make_etag, etag_matches, not_modified
+from utils.threads import bump_author_threads
+from utils.activity import activity_log
+from utils.feeds import restamp_author_scopes
+from utils.search import search_index
+from utils.storage import attachment_to_file, guess_file_type, save_attachment
+from models.Post import FileType
 
 router = APIRouter(prefix="/profile", tags=["profile"])
 
+# Rendered public profiles, shared by every reader of this worker
+PUBLIC_PROFILE_CACHE_SIZE = int(os.getenv("PUBLIC_PROFILE_CACHE_SIZE", "10000"))
+PUBLIC_PROFILE_CACHE_TTL_SECONDS = float(os.getenv("PUBLIC_PROFILE_CACHE_TTL_SECONDS", "60"))
+PUBLIC_PROFILE_CACHE_CONTROL = "public, no-cache"
+
+public_profiles = TTLCache("public_profiles", PUBLIC_PROFILE_CACHE_SIZE, PUBLIC_PROFILE_CACHE_TTL_SECONDS)
+# Bumped by every profile write, so a reader that loaded the profile before
+# the write does not cache it after the write dropped the cached copy
+public_profile_generations = Generations(PUBLIC_PROFILE_CACHE_SIZE)
+
+async def profile_changed(current_user: dict, fields):
+    """
+    Invalidate everything rendered from a user's profile after a write
+    touching the given fields.
+    """
+    public_profile_generations.bump(current_user["username"])
+    public_profiles.pop(current_user["username"])
+    if any(field in AUTHOR_PROFILE_FIELDS for field in fields):
+        await author_summaries.invalidate(current_user["id"])
+        await bump_author_threads(current_user["id"])
+
 @router.post("", response_model=UserProfileResponse)
 async def create_profile(
     profile: UserProfileCreate,
@@ -29,11 +61,14 @@ async def create_profile(
     profile_dict = profile.model_dump()
     profile_dict["user_id"] = current_user["id"]
     profile_dict["created_at"] = datetime.utcnow()
+    profile_dict["revision"] = 0
     
     result = await db.user_profiles.insert_one(profile_dict)
+    await profile_changed(current_user, AUTHOR_PROFILE_FIELDS)
+    activity_log.record(current_user["id"], "profile_created")
     created_profile = await db.user_profiles.find_one({"_id": result.inserted_id})
     
-    return serialize_mongo_doc(created_profile)
+    return encode_response(UserProfileResponse, created_profile)
 
 @router.get("/me", response_model=UserProfileResponse)
 async def get_my_profile(current_user: UserResponse = Depends(get_current_user)):
@@ -41,19 +76,34 @@ async def get_my_profile(current_user: UserResponse = Depends(get_current_user))
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
     
-    return serialize_mongo_doc(profile)
+    return encode_response(UserProfileResponse, profile)
 
 @router.get("/{username}", response_model=UserProfilePublicResponse)
-async def get_public_profile(username: str):
-    user = await db.users.find_one({"username": username})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+async def get_public_profile(username: str, request: Request):
+    cached = public_profiles.get(username)
+    if cached is None:
+        generation = public_profile_generations.get(username)
+        user = await db.users.find_one({"username": username}, {"_id": 1})
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+            
+        profile = await db.user_profiles.find_one({"user_id": str(user["_id"])})
+        if not profile:
+            raise HTTPException(status_code=404, detail="Profile not found")
         
-    profile = await db.user_profiles.find_one({"user_id": str(user["_id"])})
-    if not profile:
-        raise HTTPException(status_code=404, detail="Profile not found")
+        etag = make_etag(profile["_id"], profile.get("revision", 0))
+        cached = (etag, encode_response(UserProfilePublicResponse, profile).body)
+        if public_profile_generations.get(username) == generation:
+            public_profiles.set(username, cached)
     
-    return serialize_mongo_doc(profile)
+    etag, body = cached
+    if etag_matches(request, etag):
+        return not_modified(etag, PUBLIC_PROFILE_CACHE_CONTROL)
+    return Response(
+        body,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": PUBLIC_PROFILE_CACHE_CONTROL}
+    )
 
 @router.put("/me", response_model=UserProfileResponse)
 async def update_profile(
@@ -73,24 +123,42 @@ async def update_profile(
         update_data["updated_at"] = datetime.utcnow()
         await db.user_profiles.update_one(
             {"user_id": current_user["id"]},
-            {"$set": update_data}
+            {"$set": update_data, "$inc": {"revision": 1}}
+        )
+        await profile_changed(current_user, update_data)
+        activity_log.record(
+            current_user["id"], "profile_updated", fields=sorted(set(update_data) - {"updated_at"})
         )
     
     updated_profile = await db.user_profiles.find_one({"user_id": current_user["id"]})
-    return serialize_mongo_doc(updated_profile)
+    if "university" in update_data or "major" in update_data:
+        # Search and the scoped feeds both follow the author's current scopes
+        university, major = updated_profile.get("university"), updated_profile.get("major")
+        await search_index.update_author_facets(current_user["id"], university, major)
+        await restamp_author_scopes(current_user["id"], university, major)
+    return encode_response(UserProfileResponse, updated_profile)
 
-@router.post("/me/picture")
+@router.post("/me/picture", response_model=UserProfileResponse)
 async def upload_profile_picture(
     file: UploadFile = File(...),
     current_user: UserResponse = Depends(get_current_user)
 ):
-    # Here you would implement the logic to:
-    # 1. Validate the file is an image
-    # 2. Upload it to a cloud storage service (like AWS S3)
-    # 3. Update the profile with the new picture URL
-    
-    # For now, we'll return a placeholder response
-    raise HTTPException(
-        status_code=501,
-        detail="Profile picture upload not implemented. Implement cloud storage first."
-    ) 
\ No newline at end of file
+    if guess_file_type(file.content_type, file.filename) != FileType.IMAGE:
+        raise HTTPException(status_code=400, detail="Profile picture must be an image")
+
+    profile = await db.user_profiles.find_one({"user_id": current_user["id"]}, {"_id": 1})
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    attachment = await save_attachment(file, current_user["id"])
+    updated_profile = await db.user_profiles.find_one_and_update(
+        {"user_id": current_user["id"]},
+        {"$set": {
+            "profile_picture_url": attachment_to_file(attachment)["url"],
+            "updated_at": datetime.utcnow()
+        }, "$inc": {"revision": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+    await profile_changed(current_user, ["profile_picture_url"])
+    activity_log.record(current_user["id"], "profile_updated", fields=["profile_picture_url"])
+    return encode_response(UserProfileResponse, updated_profile)
@@ -0,0 +1,50 @@
+import re
+
+from fastapi import APIRouter, WebSocket, status
+
+from utils.auth import get_websocket_user
+from utils.realtime import FEED_CHANNEL, Connection, hub
+
+router = APIRouter(tags=["realtime"])
+
+# Channels a client may follow: the feed and any single thread
+_PUBLIC_CHANNEL = re.compile(rf"^(?:{FEED_CHANNEL}|post:[0-9a-f]{{24}})$")
+MAX_CHANNELS_PER_CONNECTION = 100
+
+async def _handle(connection: Connection, message: dict):
+    action = message.get("action")
+    channel = message.get("channel")
+    if action not in ("subscribe", "unsubscribe") or not isinstance(channel, str):
+        await connection.send({"type": "error", "detail": "Expected a subscribe or unsubscribe action"})
+        return
+    if not _PUBLIC_CHANNEL.match(channel):
+        await connection.send({"type": "error", "detail": f"Unknown channel {channel}"})
+        return
+
+    if action == "subscribe":
+        if len(connection.channels) >= MAX_CHANNELS_PER_CONNECTION:
+            await connection.send({"type": "error", "detail": "Too many subscriptions"})
+            return
+        await hub.join(connection, channel)
+    else:
+        await hub.leave(connection, channel)
+    await connection.send({"type": f"{action}d", "channel": channel})
+
+@router.websocket("/ws")
+async def live_updates(websocket: WebSocket):
+    """
+    Live post events. Clients send {"action": "subscribe", "channel": ...}
+    with "posts" for new and deleted posts, or "post:<id>" for the comments
+    and reaction counts of one thread.
+    """
+    user = await get_websocket_user(websocket)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    connection = Connection(websocket, user)
+    await hub.connect(connection)
+    try:
+        await connection.serve(_handle)
+    finally:
+        await hub.disconnect(connection)
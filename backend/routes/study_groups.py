@@ -0,0 +1,91 @@
+import math
+from datetime import datetime
+from typing import List, Optional
+from bson import ObjectId
+
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, status
+from pydantic import ValidationError
+
+from models.StudyGroup import ChatMessageCreate, ChatMessageResponse
+from config.database import db
+from utils.auth import get_current_user, get_websocket_user
+from models.User import UserResponse
+from utils.serializers import encode_response, get_encoder
+from utils.pagination import FEED_SORT, NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, keyset_filter
+from utils.ratelimit import take_chat_token
+from utils.realtime import Connection, group_channel, hub
+
+router = APIRouter(prefix="/study-groups", tags=["study-groups"])
+
+def valid_group_id(group_id: str) -> bool:
+    # There is no study group collection to check against yet, so only the
+    # id format is enforced: rooms cannot be named freely by clients
+    return ObjectId.is_valid(group_id)
+
+@router.get("/{group_id}/messages", response_model=List[ChatMessageResponse])
+async def get_messages(
+    group_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    if not valid_group_id(group_id):
+        raise HTTPException(status_code=404, detail="Study group not found")
+
+    query = {"group_id": group_id}
+    if cursor:
+        query.update(keyset_filter(*decode_cursor(cursor)))
+    messages = await db.group_messages.find(query).sort(FEED_SORT).limit(limit).to_list(length=None)
+
+    headers = None
+    if len(messages) == limit:
+        headers = {NEXT_CURSOR_HEADER: encode_cursor(messages[-1]["created_at"], messages[-1]["_id"])}
+    return encode_response(ChatMessageResponse, messages, many=True, headers=headers)
+
+@router.websocket("/ws/{group_id}")
+async def group_chat(websocket: WebSocket, group_id: str):
+    """
+    Chat room of a study group. Clients send {"content": ...}; every message
+    is stored, then broadcast to the room in every worker.
+    """
+    user = await get_websocket_user(websocket)
+    if user is None or not valid_group_id(group_id):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    async def handle(connection: Connection, message: dict):
+        try:
+            chat_message = ChatMessageCreate.model_validate(message)
+        except ValidationError as error:
+            await connection.send({"type": "error", "detail": error.errors(include_url=False)})
+            return
+
+        # Checked before the message is stored, so a flood costs no writes
+        wait = await take_chat_token(user["username"])
+        if wait:
+            await connection.send({
+                "type": "error", "detail": "Too many messages, slow down", "retry_after": math.ceil(wait)
+            })
+            return
+
+        message_dict = {
+            "group_id": group_id,
+            "author_id": user["id"],
+            "author_username": user["username"],
+            "content": chat_message.content,
+            "created_at": datetime.utcnow(),
+        }
+        result = await db.group_messages.insert_one(message_dict)
+        message_dict["_id"] = result.inserted_id
+        await hub.publish(
+            group_channel(group_id),
+            {"type": "message", "message": get_encoder(ChatMessageResponse)(message_dict)}
+        )
+
+    connection = Connection(websocket, user)
+    await hub.connect(connection)
+    try:
+        await hub.join(connection, group_channel(group_id))
+        await connection.serve(handle)
+    finally:
+        await hub.disconnect(connection)
@@ -0,0 +1,98 @@
+"""
+Tests run against the MongoDB at MONGO_TEST_URL, in the MONGO_TEST_DB_NAME
+database, which they empty before every test. Without MONGO_TEST_URL the
+tests that use the database are skipped. MONGO_TEST_URL=mongomock:// runs them against mongomock-motor
+instead, which must be installed with a pymongo release it supports; tests
+marked mongo depend on the real server (its command events or timings) and
+are skipped there.
+
+Run from the backend directory:
+
+    MONGO_TEST_URL=mongodb://localhost:27017 python -m pytest -q
+"""
+import os
+import tempfile
+
+# Every request comes from the same test client, which the rate limits would throttle
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("REACTION_RECONCILE_INTERVAL_SECONDS", "0")
+os.environ.setdefault("STORAGE_DIR", tempfile.mkdtemp(prefix="learnify-test-files-"))
+
+import pytest
+
+import config.database as database
+
+MONGO_TEST_URL = os.getenv("MONGO_TEST_URL")
+MONGO_TEST_DB_NAME = os.getenv("MONGO_TEST_DB_NAME", "learnify_test")
+MOCKED = MONGO_TEST_URL == "mongomock://"
+
+# Every module binds db at import time, so the test database is selected
+# before anything from the app is imported
+if MOCKED:
+    from mongomock_motor import AsyncMongoMockClient
+
+    database.client = AsyncMongoMockClient()
+    database.feed_db = database.client[MONGO_TEST_DB_NAME]
+elif MONGO_TEST_URL:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    database.client = AsyncIOMotorClient(MONGO_TEST_URL, **database._client_options())
+    database.feed_db = database.client.get_database(
+        MONGO_TEST_DB_NAME, read_preference=database.feed_db.read_preference
+    )
+database.db = database.client[MONGO_TEST_DB_NAME]
+
+def pytest_collection_modifyitems(config, items):
+    if not MONGO_TEST_URL:
+        skip = pytest.mark.skip(reason="needs a MongoDB server, set MONGO_TEST_URL")
+    elif MOCKED:
+        skip = pytest.mark.skip(reason="needs a real MongoDB server, not mongomock")
+    else:
+        return
+    for item in items:
+        if "mongo" in item.keywords or (not MONGO_TEST_URL and "app" in item.fixturenames):
+            item.add_marker(skip)
+
+@pytest.fixture(scope="session")
+async def app():
+    """The app with its lifespan running, shared by the whole session."""
+    from asgi_lifespan import LifespanManager
+    from main import app
+
+    async with LifespanManager(app) as manager:
+        yield manager.app
+
+@pytest.fixture
+async def db(app):
+    """The test database, emptied before every test."""
+    for name in await database.db.list_collection_names():
+        if not name.startswith("system."):
+            await database.db[name].delete_many({})
+    from routes.profile import public_profile_generations, public_profiles
+    from utils.auth import user_cache
+    from utils.authors import AUTHOR_CACHE_SIZE, MemoryAuthorCacheBackend, author_summaries, memory_cache_ttl
+
+    user_cache.clear()
+    public_profiles.clear()
+    public_profile_generations.clear()
+    author_summaries.backend = MemoryAuthorCacheBackend(AUTHOR_CACHE_SIZE, memory_cache_ttl())
+    yield database.db
+
+@pytest.fixture
+async def client(app, db):
+    import httpx
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+@pytest.fixture
+async def seeded(db):
+    """A small deterministic dataset, see benchmarks.seed."""
+    from benchmarks.seed import seed
+
+    return await seed(db, users=30, posts=60, max_comments=40, max_depth=4)
+
+def auth_headers(username: str) -> dict:
+    from utils.auth import create_access_token
+
+    return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
@@ -0,0 +1,49 @@
+import os
+import random
+
+import bcrypt
+import pytest
+from bson import ObjectId
+
+import utils.auth as auth
+from benchmarks.load_test import _scenarios, find_login_interference, run_mix, run_scenario
+from benchmarks.seed import BENCH_PASSWORD
+from utils.auth import PASSWORD_HASH_MAX_PENDING, PasswordHasher, create_access_token, user_cache
+
+from .conftest import auth_headers
+
+CPUS = os.cpu_count() or 1
+
+@pytest.mark.mongo
+@pytest.mark.skipif(CPUS < 2, reason="hashing shares the only CPU with the event loop")
+async def test_logins_do_not_slow_down_the_feed(client, seeded, monkeypatch):
+    # Leave a core to the event loop, as PASSWORD_HASH_WORKERS should in production
+    hasher = PasswordHasher("thread", CPUS - 1, PASSWORD_HASH_MAX_PENDING)
+    monkeypatch.setattr(auth, "password_hasher", hasher)
+    tokens = {username: create_access_token({"sub": username}) for username in seeded.usernames}
+    scenarios = _scenarios(seeded, tokens, random.Random(3))
+
+    alone = await run_scenario(client, scenarios["feed"], requests=200, concurrency=8, warmup=10)
+    # Enough logins to keep every hashing worker busy for the whole feed run
+    mixed = await run_mix(
+        client, {"login": scenarios["login"], "feed": scenarios["feed"]}, {"login": 60, "feed": 200}, concurrency=8
+    )
+    hasher.shutdown()
+
+    assert alone["errors"] == mixed["feed"]["errors"] == mixed["login"]["errors"] == 0
+    results = {"scenarios": {"feed": alone}, "mixes": {"login_feed": mixed}}
+    assert find_login_interference(results, max_slowdown=2.0) == []
+
+async def test_login_rehash_drops_the_cached_user(client, db, seeded):
+    username, user_id = seeded.usernames[0], seeded.user_ids[0]
+    # A hash made with a cost factor below BCRYPT_ROUNDS
+    outdated = bcrypt.hashpw(BENCH_PASSWORD.encode(), bcrypt.gensalt(4)).decode()
+    await db.users.update_one({"_id": ObjectId(user_id)}, {"$set": {"hashed_password": outdated}})
+    assert (await client.get("/posts", params={"limit": 1}, headers=auth_headers(username))).status_code == 200
+    assert user_cache.get(username) is not None
+
+    response = await client.post("/auth/login", data={"username": username, "password": BENCH_PASSWORD})
+    assert response.status_code == 200
+
+    assert (await db.users.find_one({"_id": ObjectId(user_id)}))["hashed_password"] != outdated
+    assert user_cache.get(username) is None
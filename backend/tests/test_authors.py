@@ -0,0 +1,56 @@
+import types
+
+import utils.authors as authors
+import utils.cache as cache
+from utils.authors import AuthorSummaryCache, MemoryAuthorCacheBackend
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+async def test_other_workers_serve_a_renamed_author_for_at_most_the_stale_bound(db, seeded, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(authors, "WEB_CONCURRENCY", 4)
+    ttl = authors.memory_cache_ttl()
+    assert ttl == min(authors.AUTHOR_CACHE_TTL_SECONDS, authors.AUTHOR_CACHE_MAX_STALE_SECONDS)
+
+    # Two workers, each with its own memory backend
+    writer, reader = (AuthorSummaryCache(MemoryAuthorCacheBackend(100, ttl)) for _ in range(2))
+    author_id = seeded.user_ids[0]
+    old_name = (await reader.get(author_id))["profile"]["first_name"]
+
+    await db.user_profiles.update_one({"user_id": author_id}, {"$set": {"first_name": "Renamed"}})
+    await writer.invalidate(author_id)
+    assert (await writer.get(author_id))["profile"]["first_name"] == "Renamed"
+
+    # The reader never saw the invalidation, its copy is stale until the capped TTL runs out
+    clock.now += ttl - 0.5
+    assert (await reader.get(author_id))["profile"]["first_name"] == old_name
+    clock.now += 1
+    assert (await reader.get(author_id))["profile"]["first_name"] == "Renamed"
+
+async def test_single_worker_keeps_the_configured_ttl(monkeypatch):
+    monkeypatch.setattr(authors, "WEB_CONCURRENCY", 1)
+    assert authors.memory_cache_ttl() == authors.AUTHOR_CACHE_TTL_SECONDS
+
+async def test_generations_are_bounded_and_eviction_never_revives_a_load():
+    backend = MemoryAuthorCacheBackend(maxsize=3, ttl=60)
+    # A load of "a" starts before it is invalidated
+    generations = await backend.generations(["a"])
+    await backend.invalidate("a")
+    # Enough other invalidations to evict the generation of "a"
+    for author_id in ["b", "c", "d", "e"]:
+        await backend.invalidate(author_id)
+    assert len(backend._generations) == 3
+
+    await backend.set_many({"a": {"username": "stale"}}, generations)
+    assert await backend.get_many(["a"]) == {}
+
+    # A load started after the eviction is stored as usual
+    generations = await backend.generations(["a"])
+    await backend.set_many({"a": {"username": "fresh"}}, generations)
+    assert await backend.get_many(["a"]) == {"a": {"username": "fresh"}}
@@ -0,0 +1,82 @@
+import hashlib
+import os
+import resource
+
+from utils.storage import file_store
+
+from .conftest import auth_headers
+
+UPLOAD_TEST_BYTES = 1024 ** 3
+# Peak resident memory the 1 GB upload and download may add
+RSS_BUDGET_BYTES = 256 * 1024 ** 2
+
+class ZeroFile:
+    """File-like object of size zero bytes, generated as it is read."""
+
+    def __init__(self, size: int):
+        self.remaining = size
+
+    def read(self, size: int = -1) -> bytes:
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        self.remaining -= size
+        return bytes(size)
+
+async def _upload(client, username: str, filename: str, content: bytes, content_type: str) -> dict:
+    response = await client.post(
+        "/files", files={"file": (filename, content, content_type)}, headers=auth_headers(username)
+    )
+    assert response.status_code == 200
+    return response.json()
+
+async def test_inline_only_for_raster_images_and_pdf(client, seeded):
+    username = seeded.usernames[0]
+    cases = {
+        ("photo.png", "image/png"): "inline",
+        ("notes.pdf", "application/pdf"): "inline",
+        ("logo.svg", "image/svg+xml"): "attachment",
+        ("page.html", "text/html"): "attachment",
+        ("notes.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"): "attachment",
+    }
+    for (filename, content_type), disposition in cases.items():
+        uploaded = await _upload(client, username, filename, f"<{filename}>".encode(), content_type)
+        response = await client.get(uploaded["url"])
+        assert response.status_code == 200
+        assert response.headers["x-content-type-options"] == "nosniff"
+        assert response.headers["content-disposition"].startswith(disposition), filename
+
+async def test_missing_blob_is_not_found(client, seeded):
+    uploaded = await _upload(client, seeded.usernames[0], "lost.txt", b"gone soon", "text/plain")
+    os.remove(file_store.path(uploaded["sha256"]))
+
+    response = await client.get(uploaded["url"])
+    assert response.status_code == 404
+
+def _zeros_sha256(size: int) -> str:
+    digest = hashlib.sha256()
+    chunk = bytes(1024 ** 2)
+    for _ in range(size // len(chunk)):
+        digest.update(chunk)
+    digest.update(bytes(size % len(chunk)))
+    return digest.hexdigest()
+
+async def test_upload_1gb_within_rss_budget(client, seeded):
+    expected_sha256 = _zeros_sha256(UPLOAD_TEST_BYTES)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    response = await client.post(
+        "/files",
+        files={"file": ("big.bin", ZeroFile(UPLOAD_TEST_BYTES), "application/octet-stream")},
+        headers=auth_headers(seeded.usernames[0]),
+    )
+    assert response.status_code == 200
+    uploaded = response.json()
+    assert uploaded["size"] == UPLOAD_TEST_BYTES
+    assert uploaded["sha256"] == expected_sha256
+
+    tail = await client.get(uploaded["url"], headers={"Range": "bytes=-16"})
+    assert tail.status_code == 206
+    assert tail.content == bytes(16)
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    assert peak - before < RSS_BUDGET_BYTES
+    os.remove(file_store.path(uploaded["sha256"]))
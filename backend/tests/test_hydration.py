@@ -0,0 +1,38 @@
+import pytest
+
+from config.monitoring import mongo_commands
+from utils.authors import AUTHOR_CACHE_SIZE, MemoryAuthorCacheBackend, author_summaries, memory_cache_ttl
+from utils.hydration import hydrate_posts
+
+COLLECTIONS = ("posts", "post_reactions", "users", "user_profiles")
+
+def _queries() -> dict:
+    """Queries issued so far per collection, as counted by CommandMetricsListener."""
+    return {
+        collection: sum(
+            mongo_commands.value(command=command, collection=collection, status="ok")
+            for command in ("find", "aggregate")
+        )
+        for collection in COLLECTIONS
+    }
+
+async def _hydration_queries(db, user_id: str, page_size: int, **bounds) -> dict:
+    posts = await db.posts.find({"parent_post_id": None}).sort("comment_count", -1).to_list(page_size)
+    # A cold author cache, so the author lookups are counted too
+    author_summaries.backend = MemoryAuthorCacheBackend(AUTHOR_CACHE_SIZE, memory_cache_ttl())
+    before = _queries()
+    hydrated = await hydrate_posts(posts, user_id, **bounds)
+    assert len(hydrated) == len(posts)
+    after = _queries()
+    return {collection: after[collection] - before[collection] for collection in COLLECTIONS}
+
+@pytest.mark.mongo
+@pytest.mark.parametrize("bounds", [{}, {"max_depth": 2}, {"max_depth": 3, "max_children": 2}])
+async def test_hydration_round_trips_do_not_grow_with_page_size_or_depth(db, seeded, bounds):
+    user_id = seeded.user_ids[0]
+    # getMore round trips depend on how many documents come back, not on how
+    # many posts or levels are hydrated, and are left out
+    expected = {"posts": 1, "post_reactions": 1, "users": 1, "user_profiles": 1}
+
+    assert await _hydration_queries(db, user_id, 1, **bounds) == expected
+    assert await _hydration_queries(db, user_id, 20, **bounds) == expected
@@ -0,0 +1,213 @@
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from bson import ObjectId
+
+import utils.deletions as deletions
+from utils.deletions import enqueue_deletion
+from utils.profiling import assert_max_queries
+from utils.threads import backfill_comment_counts
+
+from .conftest import auth_headers
+
+async def _comment(client, username: str, parent_id: str) -> str:
+    response = await client.post(
+        f"/posts/{parent_id}/comments", json={"content": "reply"}, headers=auth_headers(username)
+    )
+    assert response.status_code == 200
+    return response.json()["id"]
+
+async def _wait_for_deletion(client, username: str, post_id: str):
+    for _ in range(100):
+        response = await client.get(f"/posts/{post_id}/deletion", headers=auth_headers(username))
+        if response.json()["status"] == "done":
+            return
+        await asyncio.sleep(0.05)
+    raise AssertionError(f"Deletion of {post_id} did not finish")
+
+async def test_comment_counts_follow_comment_writes(client, db, seeded):
+    username = seeded.usernames[0]
+    root_id = seeded.hot_post_ids[0]
+    before = (await db.posts.find_one({"_id": ObjectId(root_id)}))["comment_count"]
+
+    child_id = await _comment(client, username, root_id)
+    grandchild_id = await _comment(client, username, child_id)
+    items = [{"parent_post_id": grandchild_id, "content": f"batch reply {number}"} for number in range(3)]
+    response = await client.post("/posts/comments/batch", json=items, headers=auth_headers(username))
+    assert response.status_code == 200
+
+    root = await db.posts.find_one({"_id": ObjectId(root_id)})
+    assert root["comment_count"] == before + 5
+    assert (await db.posts.find_one({"_id": ObjectId(child_id)}))["comment_count"] == 4
+
+    response = await client.delete(f"/posts/{grandchild_id}", headers=auth_headers(username))
+    assert response.status_code == 202
+    await _wait_for_deletion(client, username, grandchild_id)
+
+    assert (await db.posts.find_one({"_id": ObjectId(root_id)}))["comment_count"] == before + 1
+    assert (await db.posts.find_one({"_id": ObjectId(child_id)}))["comment_count"] == 0
+    # Nothing drifted from what the threads actually hold
+    assert await backfill_comment_counts() == 0
+
+async def test_deleted_post_is_hidden_at_once_and_removed_last(client, db, seeded, monkeypatch):
+    username = seeded.usernames[0]
+    root_id = seeded.hot_post_ids[0]
+    child_id = await _comment(client, username, root_id)
+    grandchild_id = await _comment(client, username, child_id)
+    # The worker stops right after hiding the post, as if the process died there
+    delete_descendants = deletions._delete_descendants
+
+    async def crash(root_id: str):
+        raise RuntimeError("worker stopped")
+
+    monkeypatch.setattr(deletions, "_delete_descendants", crash)
+    response = await client.delete(f"/posts/{child_id}", headers=auth_headers(username))
+    assert response.status_code == 202
+
+    # Hidden from reads and from the counts, but still there for the worker to resume from
+    assert (await client.get(f"/posts/{child_id}", headers=auth_headers(username))).status_code == 404
+    thread = (await client.get(f"/posts/{root_id}", headers=auth_headers(username))).json()
+    assert child_id not in [comment["id"] for comment in thread["comments"]]
+    assert await db.posts.find_one({"_id": ObjectId(child_id)}) is not None
+    assert (await db.deletion_jobs.find_one({"_id": child_id}))["status"] in ("pending", "running")
+
+    monkeypatch.setattr(deletions, "_delete_descendants", delete_descendants)
+    await deletions.process_job(await db.deletion_jobs.find_one({"_id": child_id}))
+    await _wait_for_deletion(client, username, child_id)
+    assert await db.posts.count_documents({"_id": {"$in": [ObjectId(child_id), ObjectId(grandchild_id)]}}) == 0
+    assert await backfill_comment_counts() == 0
+
+async def test_deletion_resumes_when_the_request_stopped_after_the_tombstone(client, db, seeded):
+    username = seeded.usernames[0]
+    child_id = await _comment(client, username, seeded.hot_post_ids[0])
+    await _comment(client, username, child_id)
+
+    # Only the job was written, the post was never hidden
+    await enqueue_deletion(child_id, seeded.user_ids[0])
+    await _wait_for_deletion(client, username, child_id)
+
+    assert await db.posts.count_documents({"$or": [{"_id": ObjectId(child_id)}, {"ancestor_ids": child_id}]}) == 0
+    assert await backfill_comment_counts() == 0
+
+async def test_replies_into_a_thread_being_deleted_are_refused(client, db, seeded):
+    username = seeded.usernames[0]
+    child_id = await _comment(client, username, seeded.hot_post_ids[0])
+    grandchild_id = await _comment(client, username, child_id)
+    # A deletion of child_id that a worker holds the lease of
+    await db.deletion_jobs.insert_one({
+        "_id": child_id, "status": "running", "requested_by": seeded.user_ids[0],
+        "created_at": datetime.utcnow(), "lease_until": datetime.utcnow() + timedelta(hours=1),
+    })
+
+    response = await client.post(
+        f"/posts/{grandchild_id}/comments", json={"content": "late"}, headers=auth_headers(username)
+    )
+    assert response.status_code == 404
+    items = [{"parent_post_id": grandchild_id, "content": "late"}]
+    response = await client.post(
+        "/posts/comments/batch", params={"ordered": "false"}, json=items, headers=auth_headers(username)
+    )
+    assert response.json()["results"][0]["error"] == "Post not found"
+    assert await db.posts.count_documents({"ancestor_ids": grandchild_id}) == 0
+
+async def test_feed_projects_stored_comment_counts(client, db, seeded):
+    response = await client.get(
+        "/posts", params={"fields": "comment_count", "limit": 50}, headers=auth_headers(seeded.usernames[0])
+    )
+    assert response.status_code == 200
+    counts = {post["id"]: post["comment_count"] for post in response.json()}
+    for post_id, count in counts.items():
+        assert count == await db.posts.count_documents({"ancestor_ids": post_id})
+
+async def _measure(client, params: dict, headers: dict, requests: int) -> dict:
+    latencies, sizes = [], []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = await client.get("/posts", params=params, headers=headers)
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200
+        sizes.append(len(response.content))
+    return {"bytes": statistics.median(sizes), "latency": statistics.median(latencies)}
+
+# mongomock cannot cut content with $substrCP, which the summary view relies on
+@pytest.mark.mongo
+async def test_summary_and_fields_shrink_feed_payload(client, seeded):
+    headers = {**auth_headers(seeded.usernames[0]), "Accept-Encoding": "identity"}
+    full = await _measure(client, {"limit": 20}, headers, 3)
+    summary = await _measure(client, {"limit": 20, "view": "summary"}, headers, 3)
+    fields = await _measure(client, {"limit": 20, "fields": "id,likes_count,comment_count"}, headers, 3)
+
+    assert summary["bytes"] < full["bytes"] / 2
+    assert fields["bytes"] < summary["bytes"]
+
+@pytest.mark.mongo
+async def test_summary_feed_is_faster_than_full(client, seeded):
+    headers = {**auth_headers(seeded.usernames[0]), "Accept-Encoding": "identity"}
+    await _measure(client, {"limit": 20}, headers, 5)
+    full = await _measure(client, {"limit": 20}, headers, 30)
+    summary = await _measure(client, {"limit": 20, "view": "summary"}, headers, 30)
+
+    # Summaries skip the comment trees and reaction lookups
+    assert summary["latency"] < full["latency"]
+
+async def test_scoped_feed_pages_through_every_post(client, db, seeded):
+    headers = auth_headers(seeded.usernames[0])
+    profile = await db.user_profiles.find_one({"user_id": seeded.user_ids[0]})
+    expected = [
+        str(post["_id"])
+        async for post in db.posts.find(
+            {"parent_post_id": None, "author_university": profile["university"]}
+        ).sort([("created_at", -1), ("_id", -1)])
+    ]
+    # A deleted post must not cut the feed short
+    deleted = expected.pop(3)
+    author_id = (await db.posts.find_one({"_id": ObjectId(deleted)}))["author_id"]
+    username = seeded.usernames[seeded.user_ids.index(author_id)]
+    assert (await client.delete(f"/posts/{deleted}", headers=auth_headers(username))).status_code == 202
+
+    seen, cursor = [], None
+    while True:
+        params = {"scope": "university", "limit": 4, "fields": "id"}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/posts", params=params, headers=headers)
+        assert response.status_code == 200
+        seen += [post["id"] for post in response.json()]
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+    assert seen == expected
+
+# Authentication, the page (and the scope's profile lookup), then one query
+# each for comment trees, reactions, authors and author profiles, plus one
+# getMore for long comment trees; none of it may grow with the page
+@pytest.mark.mongo
+@pytest.mark.parametrize("limit", [5, 20])
+@pytest.mark.parametrize("params, budget", [({}, 7), ({"scope": "university"}, 8), ({"view": "summary"}, 7)])
+async def test_feed_query_budget(client, seeded, limit, params, budget):
+    with assert_max_queries(budget):
+        response = await client.get("/posts", params={"limit": limit, **params}, headers=auth_headers(seeded.usernames[0]))
+    assert response.status_code == 200
+
+@pytest.mark.mongo
+@pytest.mark.parametrize("params", [{}, {"max_depth": 2}, {"max_depth": 3, "max_children": 2}])
+async def test_post_query_budget(client, db, seeded, params):
+    comment = await db.posts.find_one({"ancestor_ids": seeded.hot_post_ids[0]}, {"_id": 1})
+    # A root, then a comment whose thread root is read for the ETag
+    for post_id, budget in [(seeded.hot_post_ids[0], 7), (str(comment["_id"]), 8)]:
+        with assert_max_queries(budget):
+            response = await client.get(f"/posts/{post_id}", params=params, headers=auth_headers(seeded.usernames[0]))
+        assert response.status_code == 200
+
+@pytest.mark.mongo
+@pytest.mark.parametrize("limit", [5, 20])
+async def test_user_posts_query_budget(client, seeded, limit):
+    with assert_max_queries(7):
+        response = await client.get(
+            f"/posts/user/{seeded.user_ids[0]}", params={"limit": limit}, headers=auth_headers(seeded.usernames[0])
+        )
+    assert response.status_code == 200
@@ -0,0 +1,69 @@
+import routes.profile as profile
+from routes.profile import public_profiles
+
+from .conftest import auth_headers
+
+class RacingProfiles:
+    """user_profiles whose first read lets a profile update land before returning."""
+
+    def __init__(self, collection, write):
+        self._collection = collection
+        self._write = write
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    async def find_one(self, *args, **kwargs):
+        found = await self._collection.find_one(*args, **kwargs)
+        if self._write is not None:
+            write, self._write = self._write, None
+            await write()
+        return found
+
+class RacingDatabase:
+    def __init__(self, database, write):
+        self._database = database
+        self.user_profiles = RacingProfiles(database.user_profiles, write)
+
+    def __getattr__(self, name):
+        return getattr(self._database, name)
+
+async def test_reader_racing_a_profile_update_does_not_cache_the_old_profile(client, db, seeded, monkeypatch):
+    username = seeded.usernames[0]
+
+    async def update():
+        response = await client.put(
+            "/profile/me", json={"first_name": "Renamed"}, headers=auth_headers(username)
+        )
+        assert response.status_code == 200
+
+    monkeypatch.setattr(profile, "db", RacingDatabase(db, update))
+    # This reader loaded the profile before the update, it may answer with it but not cache it
+    response = await client.get(f"/profile/{username}")
+    assert response.status_code == 200
+    assert public_profiles.get(username) is None
+    monkeypatch.undo()
+
+    response = await client.get(f"/profile/{username}")
+    assert response.json()["first_name"] == "Renamed"
+    assert public_profiles.get(username) is not None
+    revalidated = await client.get(f"/profile/{username}", headers={"If-None-Match": response.headers["ETag"]})
+    assert revalidated.status_code == 304
+
+async def test_scoped_feed_and_search_follow_a_university_change(client, db, seeded):
+    username, user_id = seeded.usernames[0], seeded.user_ids[0]
+    headers = auth_headers(username)
+    response = await client.post("/posts", json={"content": "quantum flux notes"}, headers=headers)
+    post_id = response.json()["id"]
+
+    response = await client.put("/profile/me", json={"university": "Elsewhere"}, headers=headers)
+    assert response.status_code == 200
+
+    # Both search and the scoped feed now place the post under the new university
+    found = await client.get("/posts/search", params={"q": "quantum flux", "university": "Elsewhere"}, headers=headers)
+    assert post_id in [post["id"] for post in found.json()]
+    feed = await client.get("/posts", params={"scope": "university", "limit": 100, "fields": "id"}, headers=headers)
+    assert post_id in [post["id"] for post in feed.json()]
+    assert await db.posts.count_documents(
+        {"author_id": user_id, "parent_post_id": None, "author_university": {"$ne": "Elsewhere"}}
+    ) == 0
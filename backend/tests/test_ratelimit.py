@@ -0,0 +1,53 @@
+from starlette.responses import PlainTextResponse
+
+from utils.ratelimit import AdmissionMiddleware, ConcurrencyLimiter, MemoryBucketStore, RateLimit
+
+from .conftest import auth_headers
+
+def _scope(method: str, path: str, headers: dict = None, client: str = "10.0.0.1") -> dict:
+    return {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        "client": (client, 1234),
+    }
+
+def _middleware(store: MemoryBucketStore) -> AdmissionMiddleware:
+    return AdmissionMiddleware(PlainTextResponse("ok"), store=store, limiter=ConcurrencyLimiter(8, 8, 1))
+
+async def test_rejection_by_one_limit_spends_no_other_token():
+    store = MemoryBucketStore()
+    buckets = [("a", RateLimit(0.001, 5)), ("b", RateLimit(0.001, 1))]
+
+    assert await store.take(buckets) == [0, 0]
+    waits = await store.take(buckets)
+    assert waits[0] == 0 and waits[1] > 0
+    # Only the successful take spent a token from the first bucket
+    assert await store.take([buckets[0]]) == [0]
+    assert 3 <= store._buckets["a"][0] < 3.01
+
+async def test_route_limits_keep_buckets_of_their_own():
+    store = MemoryBucketStore()
+    middleware = _middleware(store)
+    # Anonymous reads key both limits of /profile/{username} by address
+    scope = _scope("GET", "/profile/someone")
+    assert await middleware._check_limits(scope) is None
+
+    keys = list(store._buckets)
+    assert len(keys) == 2
+    assert keys[0].startswith("GET /profile/{username} 0:user ")
+    assert keys[1].startswith("GET /profile/{username} 1:ip ")
+
+async def test_user_limit_does_not_drain_ip_limit():
+    store = MemoryBucketStore()
+    middleware = _middleware(store)
+    headers = auth_headers("reader")
+    # The per-user bucket of the route holds 50 tokens, the per-address one 200
+    for _ in range(50):
+        assert await middleware._check_limits(_scope("GET", "/profile/someone", headers)) is None
+    rejection = await middleware._check_limits(_scope("GET", "/profile/someone", headers))
+    assert rejection.status_code == 429
+
+    ip_tokens = next(tokens for key, (tokens, _) in store._buckets.items() if " 1:ip " in key)
+    assert 150 <= ip_tokens < 151
@@ -0,0 +1,126 @@
+import asyncio
+import random
+
+from bson import ObjectId
+
+import utils.reactions as reactions
+from utils.reactions import reconcile_reaction_counts
+
+from .conftest import auth_headers
+
+REACTION_TYPES = ["like", "dislike", "none"]
+
+async def _true_counts(db, post_id: str) -> dict:
+    return {
+        "likes_count": await db.post_reactions.count_documents({"post_id": post_id, "reaction_type": "like"}),
+        "dislikes_count": await db.post_reactions.count_documents({"post_id": post_id, "reaction_type": "dislike"}),
+    }
+
+async def _counters(db, post_id: str) -> dict:
+    post = await db.posts.find_one({"_id": ObjectId(post_id)})
+    return {"likes_count": post["likes_count"], "dislikes_count": post["dislikes_count"]}
+
+async def test_concurrent_reactions_keep_exact_counts(client, db, seeded):
+    post_id = seeded.hot_post_ids[0]
+    rng = random.Random(7)
+
+    async def react(username: str, reaction_type: str):
+        response = await client.post(
+            f"/posts/{post_id}/reaction", json={"post_id": post_id, "reaction_type": reaction_type},
+            headers=auth_headers(username)
+        )
+        assert response.status_code == 200
+
+    # Every user swaps its reaction many times, several swaps of the same user in flight at once
+    await asyncio.gather(*(
+        react(username, rng.choice(REACTION_TYPES))
+        for username in seeded.usernames
+        for _ in range(8)
+    ))
+
+    assert await _counters(db, post_id) == await _true_counts(db, post_id)
+    assert await reconcile_reaction_counts() == 0
+
+async def test_concurrent_batch_reactions_keep_exact_counts(client, db, seeded):
+    post_ids = seeded.hot_post_ids[:3]
+    rng = random.Random(11)
+
+    async def react_batch(username: str):
+        items = [
+            {"post_id": rng.choice(post_ids), "reaction_type": rng.choice(REACTION_TYPES)} for _ in range(10)
+        ]
+        response = await client.post(
+            "/posts/reactions/batch", params={"ordered": "false"}, json=items, headers=auth_headers(username)
+        )
+        assert response.status_code == 200
+
+    await asyncio.gather(*(react_batch(username) for username in seeded.usernames for _ in range(3)))
+
+    for post_id in post_ids:
+        assert await _counters(db, post_id) == await _true_counts(db, post_id)
+
+async def test_reconcile_fixes_drifted_counters(db, seeded):
+    post_id = seeded.hot_post_ids[0]
+    expected = await _true_counts(db, post_id)
+    await db.posts.update_one({"_id": ObjectId(post_id)}, {"$inc": {"likes_count": 5, "dislikes_count": -1}})
+
+    assert await reconcile_reaction_counts(batch_size=7) == 1
+    assert await _counters(db, post_id) == expected
+
+async def test_reconcile_keeps_reaction_landing_during_aggregation(client, db, seeded, monkeypatch):
+    post_id = seeded.hot_post_ids[0]
+    reacted = set(await db.post_reactions.distinct("user_id", {"post_id": post_id}))
+    user_id = next(user_id for user_id in seeded.user_ids if user_id not in reacted)
+    username = seeded.usernames[seeded.user_ids.index(user_id)]
+    await db.posts.update_one({"_id": ObjectId(post_id)}, {"$inc": {"dislikes_count": 3}})
+    count_reactions = reactions._reaction_totals
+
+    async def react_then_count(post_ids):
+        # A like lands after the posts were read and before their reactions are counted
+        if post_id in post_ids:
+            response = await client.post(
+                f"/posts/{post_id}/reaction", json={"post_id": post_id, "reaction_type": "like"},
+                headers=auth_headers(username)
+            )
+            assert response.status_code == 200
+        return await count_reactions(post_ids)
+
+    monkeypatch.setattr(reactions, "_reaction_totals", react_then_count)
+    await reconcile_reaction_counts()
+    monkeypatch.undo()
+
+    # The moved counter was left alone rather than overwritten, the next run fixes the drift
+    counters = await _counters(db, post_id)
+    assert counters["likes_count"] == (await _true_counts(db, post_id))["likes_count"]
+    assert await reconcile_reaction_counts() == 1
+    assert await _counters(db, post_id) == await _true_counts(db, post_id)
+
+async def test_like_toggling_credits_engagement_once(client, db, seeded):
+    post_id = seeded.hot_post_ids[-1]
+    reacted = set(await db.post_reactions.distinct("user_id", {"post_id": post_id}))
+    username = next(
+        username for username, user_id in zip(seeded.usernames, seeded.user_ids) if user_id not in reacted
+    )
+
+    async def hot_score() -> float:
+        return (await db.posts.find_one({"_id": ObjectId(post_id)})).get("hot_score", float("-inf"))
+
+    async def react(reaction_type: str):
+        response = await client.post(
+            f"/posts/{post_id}/reaction", json={"post_id": post_id, "reaction_type": reaction_type},
+            headers=auth_headers(username)
+        )
+        assert response.status_code == 200
+
+    before = await hot_score()
+    await react("like")
+    credited = await hot_score()
+    assert credited > before
+    for reaction_type in ["none", "like", "dislike", "like", "none", "like"]:
+        await react(reaction_type)
+    items = [{"post_id": post_id, "reaction_type": reaction_type} for reaction_type in ["none", "like"] * 5]
+    response = await client.post("/posts/reactions/batch", json=items, headers=auth_headers(username))
+    assert response.status_code == 200
+
+    assert await hot_score() == credited
+    assert await _counters(db, post_id) == await _true_counts(db, post_id)
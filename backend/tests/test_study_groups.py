@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+from bson import ObjectId
+
+import utils.ratelimit as ratelimit
+from utils.auth import create_access_token
+from utils.ratelimit import RateLimit
+
+from .conftest import auth_headers
+
+async def _chat(app, group_id: str, username: str, frames: list, replies: int) -> tuple:
+    """
+    Connect to a chat room over raw ASGI, send frames, wait for replies
+    messages back, then leave. Returns the close code (None when the
+    connection was accepted) and the messages received.
+    """
+    incoming: asyncio.Queue = asyncio.Queue()
+    received = []
+    close_code = None
+    await incoming.put({"type": "websocket.connect"})
+
+    async def receive():
+        return await incoming.get()
+
+    async def send(message):
+        nonlocal close_code
+        if message["type"] == "websocket.accept":
+            for frame in frames:
+                await incoming.put({"type": "websocket.receive", "text": json.dumps(frame)})
+        elif message["type"] == "websocket.send":
+            received.append(json.loads(message["text"]))
+            if len(received) >= replies:
+                await incoming.put({"type": "websocket.disconnect", "code": 1000})
+        elif message["type"] == "websocket.close":
+            close_code = message.get("code", 1000)
+
+    scope = {
+        "type": "websocket",
+        "path": f"/study-groups/ws/{group_id}",
+        "raw_path": f"/study-groups/ws/{group_id}".encode(),
+        "query_string": f"token={create_access_token({'sub': username})}".encode(),
+        "headers": [],
+        "scheme": "ws",
+        "server": ("test", 80),
+        "client": ("127.0.0.1", 1234),
+        "subprotocols": [],
+        "asgi": {"version": "3.0"},
+    }
+    await asyncio.wait_for(app(scope, receive, send), 10)
+    return close_code, received
+
+async def test_chat_messages_are_rate_limited_per_user(app, db, seeded, monkeypatch):
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(ratelimit, "bucket_store", ratelimit.MemoryBucketStore())
+    # Next to no refill, so the test's own speed cannot change the count
+    burst = 5
+    monkeypatch.setattr(ratelimit, "CHAT_MESSAGE_LIMIT", RateLimit(0.01, burst))
+    group_id = str(ObjectId())
+    frames = [{"content": f"message {number}"} for number in range(burst + 5)]
+
+    _, received = await _chat(app, group_id, seeded.usernames[0], frames, replies=len(frames))
+
+    assert [message["type"] for message in received].count("message") == burst
+    errors = [message for message in received if message["type"] == "error"]
+    assert len(errors) == 5 and all(error["retry_after"] >= 1 for error in errors)
+    assert await db.group_messages.count_documents({"group_id": group_id}) == burst
+
+async def test_chat_rejects_group_ids_that_are_not_ids(app, client, seeded):
+    close_code, received = await _chat(app, "any-room", seeded.usernames[0], [{"content": "hi"}], replies=1)
+    assert close_code == 1008 and received == []
+
+    response = await client.get("/study-groups/any-room/messages", headers=auth_headers(seeded.usernames[0]))
+    assert response.status_code == 404
+    response = await client.get(f"/study-groups/{ObjectId()}/messages", headers=auth_headers(seeded.usernames[0]))
+    assert response.status_code == 200
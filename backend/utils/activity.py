@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from config.database import db
+from .metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Activity log configuration
+ACTIVITY_BATCH_SIZE = int(os.getenv("ACTIVITY_BATCH_SIZE", "500"))
+# Longest an event waits in memory before it is written
+ACTIVITY_FLUSH_INTERVAL_SECONDS = float(os.getenv("ACTIVITY_FLUSH_INTERVAL_SECONDS", "1"))
+# Events buffered before new ones are dropped instead of slowing requests down
+ACTIVITY_QUEUE_SIZE = int(os.getenv("ACTIVITY_QUEUE_SIZE", "10000"))
+# Events expire through a TTL index on created_at
+ACTIVITY_TTL_DAYS = int(os.getenv("ACTIVITY_TTL_DAYS", "30"))
+
+activity_events = Counter(
+    "activity_events_total", "Activity events by outcome", labels=("result",)
+)
+activity_flush_seconds = Histogram(
+    "activity_flush_seconds", "Time spent writing one batch of activity events"
+)
+
+class ActivityLog:
+    """
+    Append-only log of recent user activity. Handlers call record(), which
+    only appends to an in-memory queue; a background task writes the queue
+    with insert_many in batches of at most ACTIVITY_BATCH_SIZE events, at
+    most ACTIVITY_FLUSH_INTERVAL_SECONDS after the oldest one was recorded.
+    """
+
+    def __init__(self, collection, queue_size: int = ACTIVITY_QUEUE_SIZE):
+        self.collection = collection
+        self._queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self._task: Optional[asyncio.Task] = None
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def record(self, user_id: str, event_type: str, target_id: Optional[str] = None, **data):
+        """Queue an event without blocking; drops it when the queue is full."""
+        event = {
+            "user_id": user_id,
+            "type": event_type,
+            "target_id": target_id,
+            "created_at": datetime.utcnow(),
+        }
+        if data:
+            event["data"] = data
+        try:
+            self._queue.put_nowait(event)
+            activity_events.inc(result="queued")
+        except asyncio.QueueFull:
+            activity_events.inc(result="dropped")
+
+    async def _write(self, batch: List[dict]):
+        started = time.perf_counter()
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+            activity_events.inc(len(batch), result="written")
+        except Exception:
+            activity_events.inc(len(batch), result="failed")
+            logger.exception("Could not write %d activity events", len(batch))
+        activity_flush_seconds.observe(time.perf_counter() - started)
+
+    def _take(self, batch: List[dict]):
+        while len(batch) < ACTIVITY_BATCH_SIZE and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def _run(self):
+        batch: List[dict] = []
+        try:
+            while True:
+                batch.append(await self._queue.get())
+                deadline = time.monotonic() + ACTIVITY_FLUSH_INTERVAL_SECONDS
+                while len(batch) < ACTIVITY_BATCH_SIZE:
+                    self._take(batch)
+                    remaining = deadline - time.monotonic()
+                    if len(batch) >= ACTIVITY_BATCH_SIZE or remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                # A write interrupted by shutdown is not repeated by the drain
+                ready, batch = batch, []
+                await self._write(ready)
+        except asyncio.CancelledError:
+            await self._drain(batch)
+            raise
+
+    async def _drain(self, batch: List[dict]):
+        """Write everything still buffered, batch by batch."""
+        self._take(batch)
+        while batch:
+            await self._write(batch)
+            batch = []
+            self._take(batch)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the writer once every queued event has been written."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+activity_log = ActivityLog(db.activity)
+activity_queue_depth = Gauge(
+    "activity_queue_depth", "Activity events waiting to be written", function=activity_log.pending
+)
@@ -1,27 +1,138 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import HTTPException, Depends
+from fastapi import HTTPException, Depends, WebSocket
 from fastapi.security import OAuth2PasswordBearer
 from config.database import db
 from models.User import UserResponse
 from .serializers import serialize_mongo_doc
+from .metrics import Counter, Gauge, Histogram
+from .cache import TTLCache
 
 # JWT Configuration
 SECRET_KEY = "your-secret-key-here"  # In production, use a secure secret key
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Authenticated users are cached by token subject, USER_CACHE_SIZE=0 disables it
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+# Password hashing configuration
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # "thread" or "process"
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+# Hashes with another cost factor are flagged for rehashing by verify_and_update
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+password_hash_pending = Gauge(
+    "password_hash_pending", "Password hash operations queued or running"
+)
+password_hash_rejected = Counter(
+    "password_hash_rejected_total", "Password hash operations rejected because the queue was full"
+)
+password_hash_wait = Histogram(
+    "password_hash_queue_wait_seconds", "Time spent waiting for a password hashing worker"
+)
+password_hash_duration = Histogram(
+    "password_hash_duration_seconds", "Time spent hashing or verifying a password", labels=("operation",)
+)
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def _timed(function, queued_at: float, *args):
+    # Runs in the worker, returns the wait and run durations along with the result
+    started = time.perf_counter()
+    result = function(*args)
+    return result, started - queued_at, time.perf_counter() - started
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a bounded worker pool so hashing never blocks the event loop.
+    At most max_pending operations may be queued or running; further calls are
+    rejected with a 503 instead of piling up.
+    """
+
+    def __init__(self, executor: str, workers: int, max_pending: int):
+        self.executor_kind = executor
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+    async def run(self, operation: str, function, *args):
+        if self.pending >= self.max_pending:
+            password_hash_rejected.inc()
+            raise HTTPException(
+                status_code=503,
+                detail="Too many authentication requests, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+
+        self.pending += 1
+        password_hash_pending.inc()
+        try:
+            loop = asyncio.get_running_loop()
+            result, waited, duration = await loop.run_in_executor(
+                self._get_executor(), _timed, function, time.perf_counter(), *args
+            )
+        finally:
+            self.pending -= 1
+            password_hash_pending.dec()
+
+        password_hash_wait.observe(waited)
+        password_hash_duration.observe(duration, operation=operation)
+        return result
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+password_hasher = PasswordHasher(PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
+
+def _verify_and_update(plain_password, hashed_password):
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+async def verify_password_async(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password off the event loop.
+    Returns whether it matched and, when the stored hash uses an outdated
+    cost factor, a new hash to store in its place.
+    """
+    return await password_hasher.run("verify", _verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password) -> str:
+    return await password_hasher.run("hash", get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -32,7 +143,16 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserResponse:
+user_cache = TTLCache("users", USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
+
+def invalidate_user(username: str):
+    """
+    Drop a user from the authentication cache.
+    Must be called whenever a user is deleted, renamed or otherwise modified.
+    """
+    user_cache.pop(username)
+
+async def authenticate_token(token: str) -> dict:
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
@@ -45,9 +165,40 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserResponse:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+    
+    cached_user = user_cache.get(username)
+    if cached_user is not None:
+        return dict(cached_user)
         
-    user = await db.users.find_one({"username": username})
+    user = await db.users.find_one({"username": username}, {"hashed_password": 0})
     if user is None:
         raise credentials_exception
-        
-    return serialize_mongo_doc(user) 
\ No newline at end of file
+    
+    user = serialize_mongo_doc(user)
+    # Never keep an entry past the expiry of the token that loaded it
+    ttl = min(USER_CACHE_TTL_SECONDS, payload.get("exp", 0) - time.time())
+    if ttl > 0:
+        user_cache.set(username, user, ttl)
+    return dict(user) 
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserResponse:
+    return await authenticate_token(token)
+
+async def get_websocket_user(websocket: WebSocket) -> Optional[dict]:
+    """
+    User of a WebSocket handshake, authenticated with the same bearer token
+    as the REST API. Browsers cannot set headers on a WebSocket, so the token
+    may also be passed as the token query parameter.
+    Returns None when the token is missing or invalid.
+    """
+    token = websocket.query_params.get("token")
+    if not token:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer":
+            token = credentials
+    if not token:
+        return None
+    try:
+        return await authenticate_token(token)
+    except HTTPException:
+        return None
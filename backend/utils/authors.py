@@ -0,0 +1,196 @@
+import asyncio
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from config.database import db
+from .cache import Generations, TTLCache
+from .metrics import Counter
+
+# Author summary cache configuration
+AUTHOR_CACHE_BACKEND = os.getenv("AUTHOR_CACHE_BACKEND", "memory")  # "memory" or "redis"
+AUTHOR_CACHE_URL = os.getenv("AUTHOR_CACHE_URL", "redis://localhost:6379/0")
+AUTHOR_CACHE_SIZE = int(os.getenv("AUTHOR_CACHE_SIZE", "5000"))
+AUTHOR_CACHE_TTL_SECONDS = int(os.getenv("AUTHOR_CACHE_TTL_SECONDS", "300"))
+# The memory backend only invalidates in the worker that handled the profile
+# write. With several workers (uvicorn and gunicorn read WEB_CONCURRENCY) its
+# TTL is capped to this, which bounds how long the others show an old name
+AUTHOR_CACHE_MAX_STALE_SECONDS = int(os.getenv("AUTHOR_CACHE_MAX_STALE_SECONDS", "10"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+AUTHOR_PROFILE_FIELDS = ("first_name", "last_name", "profile_picture_url")
+
+author_cache_requests = Counter(
+    "author_cache_requests_total", "Author summary lookups by result", labels=("result",)
+)
+author_cache_invalidations = Counter(
+    "author_cache_invalidations_total", "Author summaries invalidated by profile writes"
+)
+
+class MemoryAuthorCacheBackend:
+    """Per-process backend built on TTLCache."""
+
+    def __init__(self, maxsize: int, ttl: int):
+        self._cache = TTLCache("author_summaries", maxsize, ttl)
+        self._generations = Generations(maxsize)
+
+    async def get_many(self, author_ids: List[str]) -> Dict[str, dict]:
+        found = {}
+        for author_id in author_ids:
+            summary = self._cache.get(author_id)
+            if summary is not None:
+                found[author_id] = summary
+        return found
+
+    async def generations(self, author_ids: List[str]) -> Dict[str, int]:
+        return {author_id: self._generations.get(author_id) for author_id in author_ids}
+
+    async def set_many(self, summaries: Dict[str, dict], generations: Dict[str, int]):
+        for author_id, summary in summaries.items():
+            if self._generations.get(author_id) == generations[author_id]:
+                self._cache.set(author_id, summary)
+
+    async def invalidate(self, author_id: str):
+        self._generations.bump(author_id)
+        self._cache.pop(author_id)
+
+class RedisAuthorCacheBackend:
+    """
+    Backend shared by every worker, stored in Redis (requires the redis package).
+    Writes are compare-and-set on a per-author generation counter, so a loader
+    that read the database before an invalidation can never store its result.
+    """
+
+    # Set the summary only if the generation did not move since it was read
+    _SET_IF_GENERATION = """
+    local current = redis.call('GET', KEYS[2]) or '0'
+    if current == ARGV[1] then
+        redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    end
+    """
+
+    def __init__(self, url: str, ttl: int):
+        try:
+            import redis.asyncio as redis
+        except ImportError as error:
+            raise RuntimeError("AUTHOR_CACHE_BACKEND=redis requires the redis package") from error
+        self._redis = redis.from_url(url)
+        self._ttl = ttl
+        self._set_if_generation = self._redis.register_script(self._SET_IF_GENERATION)
+
+    @staticmethod
+    def _key(author_id: str) -> str:
+        return f"author:{author_id}"
+
+    @staticmethod
+    def _generation_key(author_id: str) -> str:
+        return f"author-generation:{author_id}"
+
+    async def get_many(self, author_ids: List[str]) -> Dict[str, dict]:
+        values = await self._redis.mget([self._key(author_id) for author_id in author_ids])
+        return {
+            author_id: json.loads(value)
+            for author_id, value in zip(author_ids, values)
+            if value is not None
+        }
+
+    async def generations(self, author_ids: List[str]) -> Dict[str, int]:
+        values = await self._redis.mget([self._generation_key(author_id) for author_id in author_ids])
+        return {author_id: int(value or 0) for author_id, value in zip(author_ids, values)}
+
+    async def set_many(self, summaries: Dict[str, dict], generations: Dict[str, int]):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for author_id, summary in summaries.items():
+                await self._set_if_generation(
+                    keys=[self._key(author_id), self._generation_key(author_id)],
+                    args=[generations[author_id], json.dumps(summary), self._ttl],
+                    client=pipe
+                )
+            await pipe.execute()
+
+    async def invalidate(self, author_id: str):
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.incr(self._generation_key(author_id))
+            pipe.delete(self._key(author_id))
+            await pipe.execute()
+
+class AuthorSummaryCache:
+    """
+    Read-through cache of the author info shown on posts and comments:
+    {"username": ..., "profile": {first_name, last_name, profile_picture_url}}.
+    Misses are batch-loaded with one query on users and one on user_profiles.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def _load(self, author_ids: List[str]) -> Dict[str, dict]:
+        object_ids = []
+        for author_id in author_ids:
+            try:
+                object_ids.append(ObjectId(author_id))
+            except (InvalidId, TypeError):
+                continue
+
+        users, profiles = await asyncio.gather(
+            db.users.find({"_id": {"$in": object_ids}}, {"username": 1}).to_list(length=None),
+            db.user_profiles.find(
+                {"user_id": {"$in": author_ids}},
+                {"user_id": 1, **{field: 1 for field in AUTHOR_PROFILE_FIELDS}}
+            ).to_list(length=None),
+        )
+        profiles_by_user = {profile["user_id"]: profile for profile in profiles}
+
+        summaries = {}
+        for user in users:
+            author_id = str(user["_id"])
+            profile = profiles_by_user.get(author_id)
+            summaries[author_id] = {
+                "username": user["username"],
+                "profile": {
+                    field: profile.get(field) for field in AUTHOR_PROFILE_FIELDS
+                } if profile else {},
+            }
+        return summaries
+
+    async def get_many(self, author_ids: Iterable[str]) -> Dict[str, dict]:
+        author_ids = list(set(author_ids))
+        if not author_ids:
+            return {}
+
+        summaries = await self.backend.get_many(author_ids)
+        missing = [author_id for author_id in author_ids if author_id not in summaries]
+        author_cache_requests.inc(len(summaries), result="hit")
+        if not missing:
+            return summaries
+
+        author_cache_requests.inc(len(missing), result="miss")
+        # Generations are read before the database so that a concurrent
+        # invalidation makes set_many drop what we loaded
+        generations = await self.backend.generations(missing)
+        loaded = await self._load(missing)
+        await self.backend.set_many(loaded, generations)
+        summaries.update(loaded)
+        return summaries
+
+    async def get(self, author_id: str) -> Optional[dict]:
+        return (await self.get_many([author_id])).get(author_id)
+
+    async def invalidate(self, author_id: str):
+        author_cache_invalidations.inc()
+        await self.backend.invalidate(author_id)
+
+def memory_cache_ttl() -> int:
+    """TTL of the memory backend, capped when other workers cannot see its invalidations."""
+    if WEB_CONCURRENCY > 1:
+        return min(AUTHOR_CACHE_TTL_SECONDS, AUTHOR_CACHE_MAX_STALE_SECONDS)
+    return AUTHOR_CACHE_TTL_SECONDS
+
+def _create_backend():
+    if AUTHOR_CACHE_BACKEND == "redis":
+        return RedisAuthorCacheBackend(AUTHOR_CACHE_URL, AUTHOR_CACHE_TTL_SECONDS)
+    return MemoryAuthorCacheBackend(AUTHOR_CACHE_SIZE, memory_cache_ttl())
+
+author_summaries = AuthorSummaryCache(_create_backend())
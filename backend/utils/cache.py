@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from .metrics import Counter, Gauge
+
+cache_requests = Counter(
+    "cache_requests_total", "Cache lookups by cache and result", labels=("cache", "result")
+)
+cache_evictions = Counter(
+    "cache_evictions_total", "Entries evicted to respect the cache size", labels=("cache",)
+)
+cache_entries = Gauge("cache_entries", "Entries currently held by each cache", labels=("cache",))
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Bounded in-process cache with least-recently-used eviction and a
+    per-entry time to live. Hits and misses are exported as metrics.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] <= time.monotonic():
+                del self._data[key]
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                size = len(self._data)
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+
+        if entry is _MISSING:
+            cache_requests.inc(cache=self.name, result="miss")
+            cache_entries.set(size, cache=self.name)
+            return default
+        cache_requests.inc(cache=self.name, result="hit")
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        evicted = 0
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                evicted += 1
+            size = len(self._data)
+
+        if evicted:
+            cache_evictions.inc(evicted, cache=self.name)
+        cache_entries.set(size, cache=self.name)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+            size = len(self._data)
+        cache_entries.set(size, cache=self.name)
+        return default if entry is _MISSING else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+        cache_entries.set(0, cache=self.name)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class Generations:
+    """
+    Per-key write stamps that let a read-through loader notice a write racing
+    with it: read the stamp before loading and store the result only if the
+    stamp did not move. Stamps come from one counter and only the maxsize most
+    recently bumped keys keep theirs; the others read the stamp of the last
+    evicted key, so an eviction can only make a load look stale, never current.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = max(maxsize, 1)
+        self._stamps: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._clock = 0
+        self._evicted = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> int:
+        with self._lock:
+            return self._stamps.get(key, self._evicted)
+
+    def bump(self, key: Hashable):
+        with self._lock:
+            self._clock += 1
+            self._stamps[key] = self._clock
+            self._stamps.move_to_end(key)
+            while len(self._stamps) > self.maxsize:
+                _, self._evicted = self._stamps.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._stamps.clear()
+            self._evicted = self._clock
+
+    def __len__(self) -> int:
+        return len(self._stamps)
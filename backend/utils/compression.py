@@ -0,0 +1,50 @@
+import os
+
+from starlette.middleware.gzip import GZipMiddleware
+
+# Response compression configuration
+COMPRESSION = os.getenv("COMPRESSION", "auto")  # "auto", "br", "gzip" or "off"
+# Smaller responses are sent as they are, compressing them costs more than it saves
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "500"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# 4 compresses JSON better than gzip at a similar speed; 11 is far too slow per request
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+# Already compressed or served with byte ranges, which compression would break
+UNCOMPRESSED_PREFIXES = ("/files/",)
+
+def _compressor(app):
+    """
+    brotli-asgi's middleware when it is installed (COMPRESSION=auto) or required
+    (COMPRESSION=br); it falls back to gzip for clients without br support.
+    """
+    if COMPRESSION in ("auto", "br"):
+        try:
+            from brotli_asgi import BrotliMiddleware
+        except ImportError:
+            if COMPRESSION == "br":
+                raise RuntimeError("COMPRESSION=br requires the brotli-asgi package")
+        else:
+            return BrotliMiddleware(
+                app, quality=BROTLI_QUALITY, minimum_size=COMPRESSION_MIN_BYTES, gzip_fallback=True
+            )
+    return GZipMiddleware(app, minimum_size=COMPRESSION_MIN_BYTES, compresslevel=GZIP_LEVEL)
+
+class CompressionMiddleware:
+    """Compresses responses for clients that accept it, except under UNCOMPRESSED_PREFIXES."""
+
+    def __init__(self, app):
+        self.app = app
+        self.compressed = _compressor(app)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not scope["path"].startswith(UNCOMPRESSED_PREFIXES):
+            await self.compressed(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+def install_compression(app):
+    """Compress the app's responses unless COMPRESSION is off."""
+    if COMPRESSION == "off":
+        return
+    app.add_middleware(CompressionMiddleware)
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Set
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from config.database import db
+from .metrics import Counter, Histogram
+from .search import search_index
+from .threads import NOT_DELETED, add_comment_counts
+
+logger = logging.getLogger(__name__)
+
+# Cascade deletion worker configuration
+DELETION_BATCH_SIZE = int(os.getenv("DELETION_BATCH_SIZE", "500"))
+DELETION_POLL_SECONDS = float(os.getenv("DELETION_POLL_SECONDS", "5"))
+# A job whose worker stopped renewing its lease for this long is picked up again
+DELETION_LEASE_SECONDS = int(os.getenv("DELETION_LEASE_SECONDS", "60"))
+
+deletion_jobs_total = Counter(
+    "deletion_jobs_total", "Cascade deletion jobs by final status", labels=("status",)
+)
+deleted_documents_total = Counter(
+    "deleted_documents_total", "Documents removed by cascade deletions", labels=("collection",)
+)
+deletion_batch_seconds = Histogram(
+    "deletion_batch_seconds", "Time spent deleting one batch of descendants"
+)
+
+_wake_up = asyncio.Event()
+
+async def enqueue_deletion(post_id: str, requested_by: str) -> dict:
+    """
+    Record the tombstone of a deleted post. It is written before the post is
+    touched, so a crash at any later point leaves a job for the worker. The
+    post, its comments and their reactions are removed by the deletion worker.
+    """
+    job = {
+        "_id": post_id,
+        "status": "pending",
+        "requested_by": requested_by,
+        "created_at": datetime.utcnow(),
+        "lease_until": None,
+        "deleted_posts": 0,
+        "deleted_reactions": 0,
+    }
+    try:
+        await db.deletion_jobs.insert_one(job)
+    except DuplicateKeyError:
+        job = await db.deletion_jobs.find_one({"_id": post_id})
+    _wake_up.set()
+    return job
+
+async def hide_post(post_id: str) -> Optional[dict]:
+    """
+    Flag a post as deleted and take it and its comments out of the comment
+    counts above it and out of the search index. Only the first call for a
+    post does so and gets the post back; later ones return None.
+    """
+    post = await db.posts.find_one_and_update(
+        {"_id": ObjectId(post_id), **NOT_DELETED},
+        {"$set": {"deleted": True}},
+        projection={"_id": 1, "ancestor_ids": 1, "comment_count": 1}
+    )
+    if post is None:
+        return None
+    await add_comment_counts([post], -(1 + post.get("comment_count", 0)))
+    await search_index.remove_post(post_id)
+    return post
+
+async def pending_deletions(post_ids: List[str]) -> Set[str]:
+    """The given posts whose deletion is not done yet."""
+    jobs = db.deletion_jobs.find(
+        {"_id": {"$in": list(post_ids)}, "status": {"$in": ["pending", "running"]}}, {"_id": 1}
+    )
+    return {job["_id"] async for job in jobs}
+
+async def _claim_job() -> Optional[dict]:
+    now = datetime.utcnow()
+    return await db.deletion_jobs.find_one_and_update(
+        {
+            "status": {"$in": ["pending", "running"]},
+            "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}],
+        },
+        {"$set": {
+            "status": "running",
+            "lease_until": now + timedelta(seconds=DELETION_LEASE_SECONDS),
+            "started_at": now,
+        }},
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+async def process_job(job: dict):
+    """
+    Delete every descendant of the job's post, reactions first, then the
+    post itself, so that a crash at any point only leaves work that the next
+    run finds again.
+    """
+    root_id = job["_id"]
+    started = time.perf_counter()
+    # Done by the request already, unless it stopped right after writing the job
+    await hide_post(root_id)
+    await _delete_descendants(root_id)
+    root = await db.posts.delete_one({"_id": ObjectId(root_id)})
+    reactions = await db.post_reactions.delete_many({"post_id": root_id})
+    deleted_documents_total.inc(root.deleted_count, collection="posts")
+    deleted_documents_total.inc(reactions.deleted_count, collection="post_reactions")
+
+    await db.deletion_jobs.update_one(
+        {"_id": root_id},
+        {
+            "$inc": {"deleted_posts": root.deleted_count, "deleted_reactions": reactions.deleted_count},
+            "$set": {
+                "status": "done",
+                "finished_at": datetime.utcnow(),
+                "duration_seconds": time.perf_counter() - started,
+                "lease_until": None,
+            },
+        }
+    )
+    deletion_jobs_total.inc(status="done")
+    # A reply that passed its pending_deletions check just before the job was
+    # done may have landed after the last batch
+    await _delete_descendants(root_id)
+
+async def _delete_descendants(root_id: str):
+    while True:
+        batch_started = time.perf_counter()
+        batch = await db.posts.find(
+            {"ancestor_ids": root_id}, {"_id": 1}
+        ).limit(DELETION_BATCH_SIZE).to_list(length=None)
+        if not batch:
+            break
+
+        ids = [post["_id"] for post in batch]
+        reactions = await db.post_reactions.delete_many({"post_id": {"$in": [str(post_id) for post_id in ids]}})
+        posts = await db.posts.delete_many({"_id": {"$in": ids}})
+
+        deleted_documents_total.inc(reactions.deleted_count, collection="post_reactions")
+        deleted_documents_total.inc(posts.deleted_count, collection="posts")
+        deletion_batch_seconds.observe(time.perf_counter() - batch_started)
+        await db.deletion_jobs.update_one(
+            {"_id": root_id},
+            {
+                "$inc": {"deleted_posts": posts.deleted_count, "deleted_reactions": reactions.deleted_count},
+                "$set": {"lease_until": datetime.utcnow() + timedelta(seconds=DELETION_LEASE_SECONDS)},
+            }
+        )
+
+async def run_deletion_worker():
+    """
+    Process deletion jobs until cancelled. Jobs left running by a crashed or
+    stopped worker are resumed once their lease expires.
+    """
+    while True:
+        try:
+            job = await _claim_job()
+        except Exception:
+            logger.exception("Could not claim a deletion job")
+            job = None
+
+        if job is None:
+            _wake_up.clear()
+            try:
+                await asyncio.wait_for(_wake_up.wait(), DELETION_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        try:
+            await process_job(job)
+        except Exception:
+            deletion_jobs_total.inc(status="failed")
+            logger.exception("Deletion of post %s failed, it will be retried", job["_id"])
+            await asyncio.sleep(DELETION_POLL_SECONDS)
@@ -0,0 +1,26 @@
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+
+def make_etag(*stamps) -> str:
+    """
+    Strong ETag built from the version stamps a representation depends on
+    (document ids, revisions, viewer, query parameters).
+    """
+    digest = hashlib.blake2b("|".join(map(str, stamps)).encode(), digest_size=12)
+    return f'"{digest.hexdigest()}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header lists the given ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+def not_modified(etag: str, cache_control: Optional[str] = None) -> Response:
+    headers = {"ETag": etag}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,48 @@
+import asyncio
+from typing import Optional
+
+from config.database import db
+from models.Post import FeedScope
+from utils.threads import NOT_DELETED
+
+# Scoped feeds, with the post field holding the author's current scope; like
+# the search facets, it follows profile changes (see restamp_author_scopes)
+SCOPE_FIELDS = {
+    FeedScope.UNIVERSITY: "author_university",
+    FeedScope.MAJOR: "author_major",
+}
+
+def feed_query(scope: FeedScope, value: Optional[str]) -> dict:
+    """
+    Filter of the top-level posts in a feed. Scoped feeds are one range read
+    on the university_feed or major_feed index, like the global feed on
+    created_at, so no per-scope copy of the posts is kept.
+    """
+    query = {"parent_post_id": None, **NOT_DELETED}
+    if scope != FeedScope.GLOBAL:
+        query[SCOPE_FIELDS[scope]] = value
+    return query
+
+async def restamp_author_scopes(author_id: str, university: Optional[str], major: Optional[str]):
+    """Move an author's posts to the scopes of their updated profile."""
+    await db.posts.update_many(
+        {"author_id": author_id, "parent_post_id": None},
+        {"$set": {"author_university": university, "author_major": major}}
+    )
+
+async def backfill_post_scopes() -> int:
+    """
+    Stamp author scopes on top-level posts created before scoped feeds
+    existed. Returns the number of updated posts.
+    """
+    updated = 0
+    async for profile in db.user_profiles.find({}, {"user_id": 1, "university": 1, "major": 1}):
+        result = await db.posts.update_many(
+            {"author_id": profile["user_id"], "parent_post_id": None, "author_university": {"$exists": False}},
+            {"$set": {"author_university": profile.get("university"), "author_major": profile.get("major")}}
+        )
+        updated += result.modified_count
+    return updated
+
+if __name__ == "__main__":
+    print(f"Stamped author scopes on {asyncio.run(backfill_post_scopes())} posts")
@@ -0,0 +1,146 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Collection, List, Optional, Tuple
+from bson import ObjectId
+
+from config.database import db
+from models.Post import ReactionType
+from .pagination import encode_cursor
+from .threads import fetch_comment_trees
+from .authors import author_summaries
+
+# Characters of content kept in view=summary responses
+SUMMARY_CONTENT_CHARS = int(os.getenv("SUMMARY_CONTENT_CHARS", "280"))
+
+# Response fields that are not stored on the post document as such
+_COMMENT_FIELDS = frozenset({"comments", "has_more_comments", "comments_cursor"})
+_REACTION_FIELDS = frozenset({"liked_by_me", "disliked_by_me"})
+_AUTHOR_FIELDS = frozenset({"author_username", "author_profile"})
+_COMPUTED_FIELDS = _COMMENT_FIELDS | _REACTION_FIELDS | _AUTHOR_FIELDS | {"id", "content_truncated"}
+
+def post_projection(fields: Collection[str], content_chars: Optional[int] = None) -> dict:
+    """
+    Mongo projection loading only what the given response fields are built
+    from; created_at is always kept for the pagination cursors. With
+    content_chars, content is cut to that many characters by the server.
+    """
+    fields = set(fields)
+    projection = {"created_at": 1}
+    projection.update({name: 1 for name in fields - _COMPUTED_FIELDS})
+    if fields & _AUTHOR_FIELDS:
+        projection["author_id"] = 1
+    if fields & _COMMENT_FIELDS:
+        projection["depth"] = 1
+    if content_chars is not None and "content" in fields:
+        projection["content"] = {"$substrCP": ["$content", 0, content_chars]}
+        if "content_truncated" in fields:
+            projection["content_truncated"] = {"$gt": [{"$strLenCP": "$content"}, content_chars]}
+    return projection
+
+def _as_node(doc: dict) -> dict:
+    # Only the id needs converting, the response encoder handles the other values
+    node = dict(doc)
+    node["id"] = str(node.pop("_id"))
+    return node
+
+def _attach_comments(
+    posts: List[dict],
+    comments: List[dict],
+    max_depth: Optional[int],
+    max_children: Optional[int]
+) -> List[dict]:
+    """
+    Link comments under their parents, pruning the tree to the requested
+    depth and width. Returns every node kept in the response.
+    """
+    children = {}
+    for comment in comments:
+        children.setdefault(comment.get("parent_post_id"), []).append(comment)
+
+    nodes = []
+    level = posts
+    depth = 0
+    while level:
+        next_level = []
+        for node in level:
+            replies = children.get(node["id"], [])
+            node["comments"] = []
+            node["has_more_comments"] = False
+            node["comments_cursor"] = None
+            nodes.append(node)
+            if not replies:
+                continue
+            if max_depth is not None and depth >= max_depth:
+                node["has_more_comments"] = True
+                continue
+            if max_children is not None and len(replies) > max_children:
+                replies = replies[:max_children]
+                node["has_more_comments"] = True
+                node["comments_cursor"] = encode_cursor(replies[-1]["created_at"], replies[-1]["id"])
+            node["comments"] = replies
+            next_level.extend(replies)
+        level = next_level
+        depth += 1
+    return nodes
+
+async def hydrate_posts(
+    posts: List[dict],
+    current_user_id: str,
+    max_depth: Optional[int] = None,
+    max_children: Optional[int] = None,
+    after: Optional[Tuple[datetime, ObjectId]] = None,
+    fields: Optional[Collection[str]] = None
+) -> List[dict]:
+    """
+    Turn raw post documents into PostResponse-shaped dicts, including their
+    comment trees, reaction flags for the current user and author info.
+    Comment trees come from one materialized-path query, reactions from one
+    bulk query, and authors from the author summary cache.
+
+    With fields, only the lookups those response fields need are made.
+
+    max_depth and max_children bound the returned trees; pruned nodes are
+    flagged with has_more_comments and, when some replies were returned,
+    a comments_cursor to continue from. after only applies to single-post
+    hydration and skips the root's replies up to that key.
+    """
+    if not posts:
+        return []
+
+    def wanted(group: frozenset) -> bool:
+        return fields is None or not group.isdisjoint(fields)
+
+    posts = [_as_node(post) for post in posts]
+    nodes = posts
+    if wanted(_COMMENT_FIELDS):
+        comments = [
+            _as_node(comment)
+            for comment in await fetch_comment_trees(posts, max_depth, max_children, after)
+        ]
+        nodes = _attach_comments(posts, comments, max_depth, max_children)
+
+    lookups = {}
+    if wanted(_REACTION_FIELDS):
+        lookups["reactions"] = db.post_reactions.find(
+            {"user_id": current_user_id, "post_id": {"$in": [node["id"] for node in nodes]}},
+            {"post_id": 1, "reaction_type": 1}
+        ).to_list(length=None)
+    if wanted(_AUTHOR_FIELDS):
+        lookups["authors"] = author_summaries.get_many({node["author_id"] for node in nodes})
+    found = dict(zip(lookups, await asyncio.gather(*lookups.values())))
+
+    if "reactions" in found:
+        reactions_by_post = {r["post_id"]: r["reaction_type"] for r in found["reactions"]}
+        for node in nodes:
+            reaction = reactions_by_post.get(node["id"])
+            node["liked_by_me"] = reaction == ReactionType.LIKE
+            node["disliked_by_me"] = reaction == ReactionType.DISLIKE
+
+    if "authors" in found:
+        for node in nodes:
+            author = found["authors"].get(node["author_id"], {})
+            node["author_username"] = author.get("username", "")
+            node["author_profile"] = author.get("profile", {})
+
+    return posts
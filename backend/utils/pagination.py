@@ -0,0 +1,45 @@
+import base64
+import json
+from datetime import datetime
+from typing import Tuple, Union
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+# Newest first, with _id as a tie-breaker so that keyset pages are stable
+FEED_SORT = [("created_at", -1), ("_id", -1)]
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(created_at: Union[datetime, str], doc_id: Union[ObjectId, str]) -> str:
+    """
+    Build an opaque keyset cursor from a document's (created_at, _id) pair.
+    """
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = json.dumps([created_at, str(doc_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """
+    Decode a cursor produced by encode_cursor.
+    Raises a 400 error for cursors that were not issued by this API.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), ObjectId(doc_id)
+    except (ValueError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_filter(created_at: datetime, doc_id: ObjectId, descending: bool = True) -> dict:
+    """
+    Mongo filter selecting the documents that come after the given key
+    in a (created_at, _id) ordering.
+    """
+    op = "$lt" if descending else "$gt"
+    return {
+        "$or": [
+            {"created_at": {op: created_at}},
+            {"created_at": created_at, "_id": {op: doc_id}},
+        ]
+    }
@@ -0,0 +1,370 @@
+import asyncio
+import html
+import io
+import logging
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import List, Optional
+from pymongo import ReturnDocument, UpdateOne
+
+from config.database import db
+from models.Post import FileType, PreviewStatus
+from .metrics import Counter, Gauge, Histogram
+from .storage import LocalFileStore, file_store, read_blob, save_generated_file
+from .threads import bump_thread_revision, thread_root_id
+
+logger = logging.getLogger(__name__)
+
+# Preview worker configuration
+PREVIEW_WORKERS = int(os.getenv("PREVIEW_WORKERS", str(min(os.cpu_count() or 1, 4))))
+PREVIEW_POLL_SECONDS = float(os.getenv("PREVIEW_POLL_SECONDS", "5"))
+# A job whose worker stopped for this long is picked up again
+PREVIEW_LEASE_SECONDS = int(os.getenv("PREVIEW_LEASE_SECONDS", "120"))
+# Failed jobs are retried after PREVIEW_RETRY_SECONDS, doubling on every attempt
+PREVIEW_MAX_ATTEMPTS = int(os.getenv("PREVIEW_MAX_ATTEMPTS", "5"))
+PREVIEW_RETRY_SECONDS = float(os.getenv("PREVIEW_RETRY_SECONDS", "30"))
+# Larger files are not processed at all
+PREVIEW_MAX_SOURCE_BYTES = int(os.getenv("PREVIEW_MAX_SOURCE_BYTES", str(100 * 1024 ** 2)))
+
+# Output settings
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", "320"))  # Longest side, in pixels
+PDF_PREVIEW_WIDTH = int(os.getenv("PDF_PREVIEW_WIDTH", "800"))
+PREVIEW_JPEG_QUALITY = int(os.getenv("PREVIEW_JPEG_QUALITY", "80"))
+TEXT_SNIPPET_CHARS = int(os.getenv("TEXT_SNIPPET_CHARS", "300"))
+
+PREVIEWABLE_TYPES = (FileType.IMAGE, FileType.PDF, FileType.DOCUMENT)
+PREVIEW_FIELDS = ("preview_status", "thumbnail_url", "preview_url", "text_snippet")
+
+# Parts holding the body text of OOXML and OpenDocument files
+_DOCUMENT_PARTS = ("word/document.xml", "content.xml", "ppt/slides/slide1.xml")
+_TAG_PATTERN = re.compile(r"<[^>]+>")
+
+preview_jobs_total = Counter(
+    "preview_jobs_total", "Preview jobs by outcome", labels=("status",)
+)
+preview_jobs_running = Gauge("preview_jobs_running", "Preview jobs being processed")
+preview_render_seconds = Histogram(
+    "preview_render_seconds", "Time spent rendering the previews of one file", labels=("file_type",)
+)
+preview_source_bytes = Counter(
+    "preview_source_bytes_total", "Bytes of attachments rendered into previews"
+)
+preview_pool_restarts = Counter(
+    "preview_pool_restarts_total", "Preview process pools replaced after a worker process died"
+)
+
+_wake_up = asyncio.Event()
+
+# Rendering, run in the worker processes
+
+def _snippet(text: str) -> Optional[str]:
+    text = " ".join(text.split())
+    if not text:
+        return None
+    if len(text) > TEXT_SNIPPET_CHARS:
+        text = text[:TEXT_SNIPPET_CHARS].rsplit(" ", 1)[0] + "…"
+    return text
+
+def _open_source(source):
+    return open(source, "rb") if isinstance(source, str) else io.BytesIO(source)
+
+def _jpeg(image) -> bytes:
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=PREVIEW_JPEG_QUALITY, optimize=True)
+    return output.getvalue()
+
+def _thumbnail(image) -> bytes:
+    image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+    return _jpeg(image)
+
+def _render_image(source) -> dict:
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        raise RuntimeError("Image thumbnails require the Pillow package")
+    with Image.open(source if isinstance(source, str) else io.BytesIO(source)) as image:
+        # Lets JPEG decoding downscale while decompressing
+        image.draft("RGB", (THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        return {"thumbnail": _thumbnail(ImageOps.exif_transpose(image))}
+
+def _render_pdf(source) -> dict:
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        raise RuntimeError("PDF previews require the pypdfium2 package")
+    pdf = pdfium.PdfDocument(source)
+    try:
+        page = pdf[0]
+        width, _ = page.get_size()
+        image = page.render(scale=PDF_PREVIEW_WIDTH / width).to_pil()
+        text = page.get_textpage().get_text_range()
+    finally:
+        pdf.close()
+    return {"preview": _jpeg(image), "thumbnail": _thumbnail(image), "text_snippet": _snippet(text)}
+
+def _render_document(source) -> dict:
+    # Only the start of the text is needed, so only the start is read
+    limit = TEXT_SNIPPET_CHARS * 16
+    with _open_source(source) as document:
+        if not zipfile.is_zipfile(document):
+            document.seek(0)
+            return {"text_snippet": _snippet(document.read(limit).decode("utf-8", errors="ignore"))}
+        with zipfile.ZipFile(document) as archive:
+            names = set(archive.namelist())
+            for part in _DOCUMENT_PARTS:
+                if part in names:
+                    with archive.open(part) as xml:
+                        markup = xml.read(limit * 8).decode("utf-8", errors="ignore")
+                    return {"text_snippet": _snippet(html.unescape(_TAG_PATTERN.sub(" ", markup)))}
+    return {}
+
+def render_previews(source, file_type: str) -> dict:
+    """
+    Render the previews of one file, given as a path or as bytes. Returns
+    a dict with any of thumbnail and preview (JPEG bytes) and text_snippet.
+    """
+    if file_type == FileType.IMAGE:
+        return _render_image(source)
+    if file_type == FileType.PDF:
+        return _render_pdf(source)
+    return _render_document(source)
+
+# Queue and cache
+
+def _previewable(attached_file: dict) -> bool:
+    return bool(attached_file.get("sha256")) and attached_file.get("file_type") in PREVIEWABLE_TYPES
+
+def _preview_fields(preview: dict) -> dict:
+    return {field: preview.get(field) for field in PREVIEW_FIELDS}
+
+async def prepare_attachments(documents: List[dict]):
+    """
+    Fill the preview fields of new posts' attachments before they are inserted:
+    from the cache when the same content was processed before, as pending otherwise.
+    """
+    attached_files = [
+        attached_file for document in documents for attached_file in document.get("attached_files") or []
+    ]
+    for attached_file in attached_files:
+        # Never trust preview fields sent by clients
+        attached_file.update(dict.fromkeys(PREVIEW_FIELDS))
+    hashes = {attached_file["sha256"] for attached_file in attached_files if _previewable(attached_file)}
+    if not hashes:
+        return
+
+    cached = {
+        preview["_id"]: preview
+        async for preview in db.previews.find({"_id": {"$in": list(hashes)}})
+    }
+    for attached_file in attached_files:
+        if not _previewable(attached_file):
+            continue
+        preview = cached.get(attached_file["sha256"])
+        if preview:
+            attached_file.update(_preview_fields(preview))
+        else:
+            attached_file["preview_status"] = PreviewStatus.PENDING.value
+
+async def enqueue_previews(documents: List[dict]):
+    """Queue one job per distinct content among the pending attachments of inserted posts."""
+    jobs = {}
+    for document in documents:
+        for attached_file in document.get("attached_files") or []:
+            if attached_file.get("preview_status") == PreviewStatus.PENDING:
+                jobs[attached_file["sha256"]] = attached_file
+    if not jobs:
+        return
+
+    now = datetime.utcnow()
+    await db.preview_jobs.bulk_write([
+        UpdateOne(
+            {"_id": sha256},
+            {"$setOnInsert": {
+                "status": "pending",
+                "file_type": FileType(attached_file["file_type"]).value,
+                "filename": attached_file.get("filename"),
+                "size": attached_file.get("size"),
+                "attempts": 0,
+                "created_at": now,
+                "available_at": now,
+            }},
+            upsert=True
+        )
+        for sha256, attached_file in jobs.items()
+    ], ordered=False)
+    _wake_up.set()
+
+async def _claim_job() -> Optional[dict]:
+    now = datetime.utcnow()
+    return await db.preview_jobs.find_one_and_update(
+        {"status": {"$in": ["pending", "running"]}, "available_at": {"$lte": now}},
+        {
+            "$set": {"status": "running", "available_at": now + timedelta(seconds=PREVIEW_LEASE_SECONDS)},
+            "$inc": {"attempts": 1},
+        },
+        sort=[("available_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+async def _apply_preview(sha256: str, preview: dict):
+    """Copy a cached preview into every post still waiting for it."""
+    waiting = {"attached_files": {"$elemMatch": {"sha256": sha256, "preview_status": PreviewStatus.PENDING.value}}}
+    posts = await db.posts.find(waiting, {"ancestor_ids": 1}).to_list(length=None)
+    if not posts:
+        return
+    await db.posts.update_many(
+        {"_id": {"$in": [post["_id"] for post in posts]}},
+        {"$set": {f"attached_files.$[file].{field}": value for field, value in _preview_fields(preview).items()}},
+        array_filters=[{"file.sha256": sha256, "file.preview_status": PreviewStatus.PENDING.value}]
+    )
+    await bump_thread_revision(*{thread_root_id(post) for post in posts})
+
+async def _store(sha256: str, preview: dict) -> dict:
+    """Cache the preview of a content hash; the first stored preview wins."""
+    preview["created_at"] = datetime.utcnow()
+    await db.previews.update_one({"_id": sha256}, {"$setOnInsert": preview}, upsert=True)
+    return await db.previews.find_one({"_id": sha256})
+
+async def _finish(job: dict, preview: dict):
+    sha256 = job["_id"]
+    await _apply_preview(sha256, preview)
+    await db.preview_jobs.delete_one({"_id": sha256})
+    # Posts enqueued while the job still existed did not get a job of their own
+    await _apply_preview(sha256, preview)
+
+class UnrenderableFile(Exception):
+    """The file itself cannot be rendered: retrying will not help, so the failure is cached."""
+
+class _PreviewPool:
+    """
+    Process pool running render_previews. A worker process that dies (a
+    crash in a native decoder, an OOM kill) breaks the whole executor, so
+    it is replaced and the jobs that were running on it are retried.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+
+    async def render(self, source, file_type: str) -> dict:
+        executor = self._executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, render_previews, source, file_type)
+        except BrokenProcessPool:
+            if executor is self._executor:
+                logger.error("A preview worker process died, replacing the pool")
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                preview_pool_restarts.inc()
+            raise
+        except RuntimeError:
+            # Missing optional packages: fixed by a deployment, not by the file
+            raise
+        except Exception as error:
+            raise UnrenderableFile(repr(error)) from error
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+async def _render(pool: _PreviewPool, job: dict) -> dict:
+    sha256 = job["_id"]
+    # Size and existence come from the stored upload, never from a post body
+    attachment = await db.attachments.find_one({"sha256": sha256}, {"size": 1})
+    if attachment is None or not await file_store.exists(sha256):
+        # Possibly not replicated or written yet: retried, and never cached
+        raise FileNotFoundError(f"No stored file with sha256 {sha256}")
+    if attachment["size"] > PREVIEW_MAX_SOURCE_BYTES:
+        raise UnrenderableFile("File too large")
+
+    # Local blobs are opened by the worker process, others are read here
+    source = file_store.path(sha256) if isinstance(file_store, LocalFileStore) else await read_blob(sha256)
+    started = time.perf_counter()
+    rendered = await pool.render(source, job["file_type"])
+    preview_render_seconds.observe(time.perf_counter() - started, file_type=job["file_type"])
+    preview_source_bytes.inc(attachment["size"])
+
+    stem = os.path.splitext(job.get("filename") or sha256)[0]
+    preview = {"preview_status": PreviewStatus.READY.value, "text_snippet": rendered.get("text_snippet")}
+    for kind in ("thumbnail", "preview"):
+        if rendered.get(kind):
+            generated = await save_generated_file(rendered[kind], f"{stem}-{kind}.jpg", "image/jpeg")
+            preview[f"{kind}_url"] = f"/files/{generated['_id']}"
+    return preview
+
+async def process_job(pool: _PreviewPool, job: dict):
+    preview = await db.previews.find_one({"_id": job["_id"]})
+    if preview is None:
+        try:
+            rendered = await _render(pool, job)
+        except UnrenderableFile as error:
+            rendered = {"preview_status": PreviewStatus.FAILED.value, "error": str(error)}
+        preview = await _store(job["_id"], rendered)
+    await _finish(job, preview)
+    preview_jobs_total.inc(status=preview["preview_status"])
+
+async def _fail(job: dict, error: Exception):
+    """
+    Retry a job that failed for a reason outside the file. Once out of
+    attempts its posts are marked failed, but nothing is cached, so the
+    same content is tried again when it is attached to a new post.
+    """
+    if job["attempts"] >= PREVIEW_MAX_ATTEMPTS:
+        logger.error("Previews of %s failed %d times, giving up", job["_id"], job["attempts"], exc_info=error)
+        await _finish(job, {"preview_status": PreviewStatus.FAILED.value})
+        preview_jobs_total.inc(status=PreviewStatus.FAILED.value)
+        return
+
+    delay = PREVIEW_RETRY_SECONDS * 2 ** (job["attempts"] - 1)
+    logger.warning("Previews of %s failed, retrying in %.0fs", job["_id"], delay, exc_info=error)
+    await db.preview_jobs.update_one({"_id": job["_id"]}, {"$set": {
+        "status": "pending",
+        "available_at": datetime.utcnow() + timedelta(seconds=delay),
+        "error": repr(error),
+    }})
+    preview_jobs_total.inc(status="retried")
+
+async def _work(pool: _PreviewPool):
+    while True:
+        try:
+            job = await _claim_job()
+        except Exception:
+            logger.exception("Could not claim a preview job")
+            job = None
+
+        if job is None:
+            _wake_up.clear()
+            try:
+                await asyncio.wait_for(_wake_up.wait(), PREVIEW_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        preview_jobs_running.inc()
+        try:
+            await process_job(pool, job)
+        except Exception as error:
+            try:
+                await _fail(job, error)
+            except Exception:
+                logger.exception("Could not record the failure of preview job %s", job["_id"])
+        finally:
+            preview_jobs_running.dec()
+
+async def run_preview_workers():
+    """
+    Render previews until cancelled, PREVIEW_WORKERS files at a time on a
+    process pool so the CPU-bound work never runs on the event loop. Jobs
+    left running by a stopped worker are resumed once their lease expires.
+    """
+    pool = _PreviewPool(PREVIEW_WORKERS)
+    try:
+        await asyncio.gather(*(_work(pool) for _ in range(PREVIEW_WORKERS)))
+    finally:
+        pool.shutdown()
@@ -0,0 +1,189 @@
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Tuple
+
+from starlette.datastructures import MutableHeaders
+
+from .metrics import Histogram
+
+# Opt-in request profiling
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "").lower() in ("1", "true", "yes")
+# Fraction of profiled requests also run under the sampling profiler (requires pyinstrument)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+request_duration = Histogram(
+    "request_duration_seconds", "Wall time of profiled requests", labels=("method", "route")
+)
+request_mongo_calls = Histogram(
+    "request_mongo_calls", "MongoDB commands issued per profiled request", labels=("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+request_mongo_seconds = Histogram(
+    "request_mongo_seconds", "Time spent in MongoDB commands per profiled request", labels=("method", "route")
+)
+request_serialize_seconds = Histogram(
+    "request_serialize_seconds", "Time spent serializing documents per profiled request", labels=("method", "route")
+)
+request_validation_seconds = Histogram(
+    "request_validation_seconds", "Time spent validating responses per profiled request", labels=("method", "route")
+)
+
+class RequestProfile:
+    """Counters accumulated while a request (or a block of test code) runs."""
+
+    __slots__ = ("mongo_calls", "mongo_seconds", "serialize_seconds", "validation_seconds", "_lock")
+
+    def __init__(self):
+        self.mongo_calls = 0
+        self.mongo_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.validation_seconds = 0.0
+        # Mongo commands are reported from Motor's executor threads
+        self._lock = threading.Lock()
+
+    def add_query(self, seconds: float):
+        with self._lock:
+            self.mongo_calls += 1
+            self.mongo_seconds += seconds
+
+    def server_timing(self, total: float) -> str:
+        return ", ".join([
+            f'db;dur={self.mongo_seconds * 1000:.2f};desc="{self.mongo_calls} calls"',
+            f"serialize;dur={self.serialize_seconds * 1000:.2f}",
+            f"validate;dur={self.validation_seconds * 1000:.2f}",
+            f"total;dur={total * 1000:.2f}",
+        ])
+
+# Profiles of the requests (or test blocks) the current task belongs to.
+# Motor copies the context into its executor, so command listeners see it too.
+_active: ContextVar[Tuple[RequestProfile, ...]] = ContextVar("request_profiles", default=())
+
+def record_query(seconds: float):
+    """Called by the Mongo command listener for every finished command."""
+    for profile in _active.get():
+        profile.add_query(seconds)
+
+class timed:
+    """Add the time spent in a block to a section of the active profiles."""
+
+    __slots__ = ("attribute", "profiles", "started")
+
+    def __init__(self, section: str):
+        self.attribute = f"{section}_seconds"
+
+    def __enter__(self):
+        self.profiles = _active.get()
+        if self.profiles:
+            self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        if self.profiles:
+            elapsed = time.perf_counter() - self.started
+            for profile in self.profiles:
+                setattr(profile, self.attribute, getattr(profile, self.attribute) + elapsed)
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """
+    Fail when the block issues more than limit MongoDB commands, e.g. to
+    catch N+1 regressions in a test:
+
+        with assert_max_queries(4):
+            response = await client.get("/posts")
+
+    Counts only code running in the caller's context: call handlers
+    directly or through httpx.AsyncClient(transport=ASGITransport(app)).
+    Requires MONGO_MONITORING (the default).
+    """
+    profile = RequestProfile()
+    token = _active.set(_active.get() + (profile,))
+    try:
+        yield profile
+    finally:
+        _active.reset(token)
+    if profile.mongo_calls > limit:
+        raise AssertionError(f"{profile.mongo_calls} MongoDB commands issued, at most {limit} expected")
+
+def _start_sampler():
+    try:
+        from pyinstrument import Profiler
+    except ImportError as error:
+        raise RuntimeError("PROFILE_SAMPLE_RATE requires the pyinstrument package") from error
+    sampler = Profiler(async_mode="enabled")
+    sampler.start()
+    return sampler
+
+def _dump_sample(sampler, method: str, route: str):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    path = os.path.join(PROFILE_DIR, f"{time.time_ns()}-{method}-{slug}.html")
+    with open(path, "w") as dump:
+        dump.write(sampler.output_html())
+
+class ProfilingMiddleware:
+    """
+    Records wall time, Mongo commands, serialization and response validation
+    time per route, as metrics and as a Server-Timing response header.
+    A PROFILE_SAMPLE_RATE fraction of requests also runs under pyinstrument,
+    with one HTML flame graph written to PROFILE_DIR per sampled request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _active.set(_active.get() + (profile,))
+        sampler = _start_sampler() if random.random() < PROFILE_SAMPLE_RATE else None
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", profile.server_timing(time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - started
+            _active.reset(token)
+            method = scope["method"]
+            route = getattr(scope.get("route"), "path", "unmatched")
+            request_duration.observe(elapsed, method=method, route=route)
+            request_mongo_calls.observe(profile.mongo_calls, method=method, route=route)
+            request_mongo_seconds.observe(profile.mongo_seconds, method=method, route=route)
+            request_serialize_seconds.observe(profile.serialize_seconds, method=method, route=route)
+            request_validation_seconds.observe(profile.validation_seconds, method=method, route=route)
+            if sampler is not None:
+                sampler.stop()
+                await asyncio.to_thread(_dump_sample, sampler, method, route)
+
+def _time_response_validation():
+    import fastapi.routing
+
+    serialize_response = fastapi.routing.serialize_response
+
+    async def timed_serialize_response(*args, **kwargs):
+        with timed("validation"):
+            return await serialize_response(*args, **kwargs)
+
+    fastapi.routing.serialize_response = timed_serialize_response
+
+def install_profiling(app):
+    """Enable request profiling on the app when PROFILE_REQUESTS is set."""
+    if not PROFILE_REQUESTS:
+        return
+    _time_response_validation()
+    app.add_middleware(ProfilingMiddleware)
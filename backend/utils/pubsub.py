@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import os
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Pub/sub broker configuration
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "memory")  # "memory" or "redis"
+PUBSUB_URL = os.getenv("PUBSUB_URL", "redis://localhost:6379/0")
+PUBSUB_CHANNEL_PREFIX = os.getenv("PUBSUB_CHANNEL_PREFIX", "learnify:")
+
+# Called with (channel, payload) for every message received on a subscribed channel
+MessageHandler = Callable[[str, bytes], None]
+
+class MemoryBroker:
+    """
+    In-process broker: a published message is handed straight to this
+    process's handler. Enough for a single worker and for tests.
+    """
+
+    def __init__(self):
+        self._handler: Optional[MessageHandler] = None
+
+    async def start(self, handler: MessageHandler):
+        self._handler = handler
+
+    async def subscribe(self, channel: str):
+        pass
+
+    async def unsubscribe(self, channel: str):
+        pass
+
+    async def publish(self, channel: str, payload: bytes):
+        if self._handler is not None:
+            self._handler(channel, payload)
+
+    async def close(self):
+        self._handler = None
+
+class RedisBroker:
+    """
+    Broker shared by every worker through Redis pub/sub (requires the redis
+    package). Each worker holds one subscription per channel that has local
+    listeners, whatever the number of connections listening to it.
+    """
+
+    def __init__(self, url: str, prefix: str = PUBSUB_CHANNEL_PREFIX):
+        try:
+            import redis.asyncio as redis
+        except ImportError as error:
+            raise RuntimeError("PUBSUB_BACKEND=redis requires the redis package") from error
+        self._redis = redis.from_url(url)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._prefix = prefix
+        self._handler: Optional[MessageHandler] = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def start(self, handler: MessageHandler):
+        self._handler = handler
+        self._reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Lost the pub/sub connection, retrying")
+                await asyncio.sleep(1)
+                continue
+            if message is None:
+                if not self._pubsub.subscribed:
+                    await asyncio.sleep(0.1)
+                continue
+            channel = message["channel"].decode()[len(self._prefix):]
+            self._handler(channel, message["data"])
+
+    async def subscribe(self, channel: str):
+        await self._pubsub.subscribe(self._prefix + channel)
+
+    async def unsubscribe(self, channel: str):
+        await self._pubsub.unsubscribe(self._prefix + channel)
+
+    async def publish(self, channel: str, payload: bytes):
+        await self._redis.publish(self._prefix + channel, payload)
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+        await self._pubsub.aclose()
+        await self._redis.aclose()
+
+def create_broker():
+    if PUBSUB_BACKEND == "redis":
+        return RedisBroker(PUBSUB_URL)
+    return MemoryBroker()
@@ -0,0 +1,342 @@
+import asyncio
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from jose import JWTError, jwt
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from .auth import ALGORITHM, SECRET_KEY
+from .metrics import Counter, Gauge, Histogram
+
+# Rate limiting configuration
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # "memory" or "redis"
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", "redis://localhost:6379/1")
+RATE_LIMIT_KEY_PREFIX = os.getenv("RATE_LIMIT_KEY_PREFIX", "learnify:ratelimit:")
+# Buckets kept by the memory backend; the least recently used are forgotten first
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Take the client address from X-Forwarded-For, only behind a trusted proxy
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "").lower() in ("1", "true", "yes")
+
+# Admission control: requests handled at once, and requests allowed to wait for a slot
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "256"))
+MAX_QUEUED_REQUESTS = int(os.getenv("MAX_QUEUED_REQUESTS", "512"))
+# A request still waiting after this long is rejected with a 503
+REQUEST_QUEUE_TIMEOUT_SECONDS = float(os.getenv("REQUEST_QUEUE_TIMEOUT_SECONDS", "2"))
+
+@dataclass(frozen=True)
+class RateLimit:
+    """
+    Token bucket refilled with rate tokens per second up to burst tokens.
+    per="user" keys the bucket by token subject, falling back to the client
+    address for anonymous requests; per="ip" always keys it by address.
+    """
+    rate: float
+    burst: int
+    per: str = "user"
+
+def per_minute(count: int, burst: Optional[int] = None, per: str = "user") -> RateLimit:
+    return RateLimit(count / 60, burst or count, per)
+
+# Limits per (method, route path), checked in order; the first matching route applies
+ROUTE_LIMITS: List[Tuple[str, str, List[RateLimit]]] = [
+    # bcrypt makes every attempt expensive, whoever sends it
+    ("POST", "/auth/login", [per_minute(10, per="ip")]),
+    ("POST", "/auth/register", [per_minute(5, per="ip")]),
+    ("POST", "/posts/batch", [per_minute(10)]),
+    ("POST", "/posts/comments/batch", [per_minute(10)]),
+    ("POST", "/posts/reactions/batch", [per_minute(10)]),
+    ("POST", "/posts", [per_minute(30, burst=10)]),
+    ("POST", "/posts/{post_id}/comments", [per_minute(60, burst=20)]),
+    ("POST", "/posts/{post_id}/reaction", [per_minute(120, burst=30)]),
+    ("POST", "/files", [per_minute(30, burst=10)]),
+    ("POST", "/profile/me/picture", [per_minute(10)]),
+    # Public profiles can be read without logging in
+    ("GET", "/profile/{username}", [RateLimit(5, 50), RateLimit(20, 200, per="ip")]),
+    ("GET", "/posts/search", [RateLimit(2, 20)]),
+]
+# Applies to every other route
+DEFAULT_LIMITS = [RateLimit(20, 100)]
+# Study group chat messages, per user across all their connections; the
+# middleware only sees the WebSocket handshake, so the chat takes these itself
+CHAT_ROUTE = "/study-groups/ws/{group_id}"
+CHAT_MESSAGE_LIMIT = RateLimit(1, 20)
+# Never limited, so that monitoring keeps working under load
+EXEMPT_PATHS = ("/metrics", "/health")
+
+rate_limit_rejections = Counter(
+    "rate_limit_rejections_total", "Requests rejected by a token bucket", labels=("route", "per")
+)
+admission_rejections = Counter(
+    "admission_rejections_total", "Requests shed by admission control", labels=("reason",)
+)
+admission_queue_wait = Histogram(
+    "admission_queue_wait_seconds", "Time requests spent waiting for a concurrency slot"
+)
+
+def _compile_route(path: str) -> re.Pattern:
+    return re.compile("^" + re.sub(r"\\\{\w+\\\}", "[^/]+", re.escape(path)) + "$")
+
+_ROUTES = [(method, path, _compile_route(path), limits) for method, path, limits in ROUTE_LIMITS]
+
+class MemoryBucketStore:
+    """
+    Token buckets in this process's memory. Every worker limits on its own,
+    so the effective limits are multiplied by the number of workers.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, buckets: List[Tuple[str, RateLimit]]) -> List[float]:
+        """
+        Take one token from every bucket, or from none of them when any is
+        empty. Returns, per bucket, 0 when it had a token, otherwise the
+        seconds until it has one.
+        """
+        now = time.monotonic()
+        tokens = []
+        for key, limit in buckets:
+            available, updated = self._buckets.pop(key, (limit.burst, now))
+            tokens.append(min(limit.burst, available + (now - updated) * limit.rate))
+        waits = [
+            0.0 if available >= 1 else (1 - available) / limit.rate
+            for available, (_, limit) in zip(tokens, buckets)
+        ]
+        allowed = not any(waits)
+        for available, (key, _) in zip(tokens, buckets):
+            self._buckets[key] = (available - 1 if allowed else available, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return waits
+
+    async def close(self):
+        pass
+
+# Same algorithm as MemoryBucketStore, run atomically on the Redis server clock.
+# ARGV holds the rate and burst of each bucket in KEYS, in order
+_TAKE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tokens = {}
+local waits = {}
+local allowed = true
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local burst = tonumber(ARGV[2 * i])
+    local bucket = redis.call('HMGET', key, 'tokens', 'updated')
+    local available = tonumber(bucket[1]) or burst
+    local updated = tonumber(bucket[2]) or now
+    tokens[i] = math.min(burst, available + (now - updated) * rate)
+    waits[i] = 0
+    if tokens[i] < 1 then
+        waits[i] = (1 - tokens[i]) / rate
+        allowed = false
+    end
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local burst = tonumber(ARGV[2 * i])
+    if allowed then
+        tokens[i] = tokens[i] - 1
+    end
+    redis.call('HSET', key, 'tokens', tokens[i], 'updated', now)
+    redis.call('EXPIRE', key, math.ceil(burst / rate) + 1)
+    waits[i] = tostring(waits[i])
+end
+return waits
+"""
+
+class RedisBucketStore:
+    """
+    Token buckets shared by every worker through Redis (requires the redis
+    package), so limits hold across the whole deployment.
+    """
+
+    def __init__(self, url: str, prefix: str = RATE_LIMIT_KEY_PREFIX):
+        try:
+            import redis.asyncio as redis
+        except ImportError as error:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the redis package") from error
+        self._redis = redis.from_url(url)
+        self._take = self._redis.register_script(_TAKE_SCRIPT)
+        self._prefix = prefix
+
+    async def take(self, buckets: List[Tuple[str, RateLimit]]) -> List[float]:
+        args = [value for _, limit in buckets for value in (limit.rate, limit.burst)]
+        waits = await self._take(keys=[self._prefix + key for key, _ in buckets], args=args)
+        return [float(wait) for wait in waits]
+
+    async def close(self):
+        await self._redis.close()
+
+def create_bucket_store():
+    if RATE_LIMIT_BACKEND == "redis":
+        return RedisBucketStore(RATE_LIMIT_URL)
+    return MemoryBucketStore()
+
+bucket_store = create_bucket_store()
+
+class ConcurrencyLimiter:
+    """
+    Lets at most limit requests run at once. Up to max_queued more wait for
+    a slot, each for at most timeout seconds; past that, requests are shed
+    at once instead of adding to everyone's latency.
+    """
+
+    def __init__(self, limit: int, max_queued: int, timeout: float):
+        self.limit = limit
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: "OrderedDict[asyncio.Future, None]" = OrderedDict()
+
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Optional[str]:
+        """Take a slot. Returns None once taken, or the reason the request was shed."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.max_queued:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[waiter] = None
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as error:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot just as the wait ended, pass it on
+                self.release()
+            if isinstance(error, asyncio.CancelledError):
+                raise
+            return "timeout"
+        finally:
+            self._waiters.pop(waiter, None)
+            admission_queue_wait.observe(time.perf_counter() - started)
+        return None
+
+    def release(self):
+        # Hand the slot straight to the oldest waiter, which keeps it counted as active
+        while self._waiters:
+            waiter, _ = self._waiters.popitem(last=False)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+admission = ConcurrencyLimiter(MAX_CONCURRENT_REQUESTS, MAX_QUEUED_REQUESTS, REQUEST_QUEUE_TIMEOUT_SECONDS)
+requests_in_flight = Gauge(
+    "requests_in_flight", "Requests holding a concurrency slot", function=lambda: admission.active
+)
+admission_queue_depth = Gauge(
+    "admission_queue_depth", "Requests waiting for a concurrency slot", function=admission.queued
+)
+
+def _client_address(scope, headers: Headers) -> str:
+    if RATE_LIMIT_TRUST_PROXY and "x-forwarded-for" in headers:
+        return headers["x-forwarded-for"].split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+def _token_subject(headers: Headers) -> Optional[str]:
+    # Signature check only: a valid token is enough to tell users apart
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+def _route_limits(method: str, path: str) -> Tuple[str, List[RateLimit]]:
+    for route_method, route_path, pattern, limits in _ROUTES:
+        if route_method == method and pattern.match(path):
+            return route_path, limits
+    return "default", DEFAULT_LIMITS
+
+def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail}, status_code=status_code, headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+class AdmissionMiddleware:
+    """
+    Checks each request against the token buckets of its route, answering
+    429 with Retry-After when one is empty, then holds a global concurrency
+    slot while the request runs, answering 503 when none frees up in time.
+    """
+
+    def __init__(self, app, store=None, limiter: Optional[ConcurrencyLimiter] = None):
+        self.app = app
+        self.store = store or bucket_store
+        self.limiter = limiter or admission
+
+    async def _check_limits(self, scope) -> Optional[JSONResponse]:
+        headers = Headers(scope=scope)
+        route, limits = _route_limits(scope["method"], scope["path"])
+        subject = None
+        buckets = []
+        for position, limit in enumerate(limits):
+            if limit.per == "user":
+                subject = subject or _token_subject(headers)
+            key = f"user:{subject}" if limit.per == "user" and subject else f"ip:{_client_address(scope, headers)}"
+            # Each limit of a route has buckets of its own, even when two limits share a key
+            buckets.append((f"{scope['method']} {route} {position}:{limit.per} {key}", limit))
+        # Every bucket must have a token before any is taken, so a request
+        # rejected by one limit does not spend the others
+        waits = await self.store.take(buckets)
+        if not any(waits):
+            return None
+        empty = next(limit for limit, wait in zip(limits, waits) if wait > 0)
+        rate_limit_rejections.inc(route=route, per=empty.per)
+        return _reject(429, "Too many requests, slow down", max(waits))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        rejection = await self._check_limits(scope)
+        if rejection is None:
+            reason = await self.limiter.acquire()
+            if reason is not None:
+                admission_rejections.inc(reason=reason)
+                rejection = _reject(503, "Server is busy, try again shortly", 1)
+        if rejection is not None:
+            await rejection(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release()
+
+async def take_chat_token(username: str, store=None) -> float:
+    """
+    Take a token from the user's chat message bucket. Returns 0 when the
+    message may be sent, otherwise the seconds until the bucket refills.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return 0.0
+    key = f"WS {CHAT_ROUTE} 0:{CHAT_MESSAGE_LIMIT.per} user:{username}"
+    (wait,) = await (store or bucket_store).take([(key, CHAT_MESSAGE_LIMIT)])
+    if wait:
+        rate_limit_rejections.inc(route=CHAT_ROUTE, per=CHAT_MESSAGE_LIMIT.per)
+    return wait
+
+def install_admission_control(app):
+    """Enable rate limiting and admission control on the app when RATE_LIMIT_ENABLED is set."""
+    if not RATE_LIMIT_ENABLED:
+        return
+    app.add_middleware(AdmissionMiddleware)
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from config.database import db
+from models.Post import ReactionType
+from .threads import thread_root_id
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two counter reconciliations, 0 disables the periodic job
+RECONCILE_INTERVAL_SECONDS = int(os.getenv("REACTION_RECONCILE_INTERVAL_SECONDS", "3600"))
+
+REACTION_COUNTERS = {
+    ReactionType.LIKE: "likes_count",
+    ReactionType.DISLIKE: "dislikes_count",
+}
+
+def reaction_deltas(old_reaction: Optional[str], new_reaction: str) -> Dict[str, int]:
+    """
+    Counter increments for a user switching from old_reaction to new_reaction.
+    """
+    deltas = {}
+    if old_reaction in REACTION_COUNTERS:
+        deltas[REACTION_COUNTERS[old_reaction]] = -1
+    if new_reaction in REACTION_COUNTERS:
+        counter = REACTION_COUNTERS[new_reaction]
+        deltas[counter] = deltas.get(counter, 0) + 1
+    return {counter: delta for counter, delta in deltas.items() if delta}
+
+async def swap_reaction(post_id: str, user_id: str, reaction_type: str) -> Tuple[Optional[str], bool]:
+    """
+    Atomically replace the user's reaction to a post. Returns the previous
+    reaction and whether this is the first time the user likes the post,
+    which is the only like that counts as engagement: the reaction document
+    is kept, marked scored, when the like is withdrawn.
+    Concurrent swaps for the same user and post are serialized by MongoDB, so
+    every previous value is observed exactly once.
+    """
+    query = {"post_id": post_id, "user_id": user_id}
+    update = {"$set": {"reaction_type": reaction_type, "updated_at": datetime.utcnow()}}
+    if reaction_type == ReactionType.LIKE:
+        update["$set"]["scored"] = True
+    for attempt in range(2):
+        try:
+            previous = await db.post_reactions.find_one_and_update(
+                query,
+                update,
+                projection={"reaction_type": 1, "scored": 1},
+                upsert=reaction_type != ReactionType.NONE,
+                return_document=ReturnDocument.BEFORE
+            )
+            break
+        except DuplicateKeyError:
+            # Two upserts raced to create the reaction, the retry updates the winner
+            if attempt:
+                raise
+    previous_reaction = previous["reaction_type"] if previous else None
+    first_like = reaction_type == ReactionType.LIKE and not (previous or {}).get("scored")
+    return (None if previous_reaction == ReactionType.NONE else previous_reaction), first_like
+
+async def _reaction_totals(post_ids: List[str]) -> Dict[str, Dict[str, int]]:
+    pipeline = [
+        {"$match": {"post_id": {"$in": post_ids}}},
+        {"$group": {
+            "_id": "$post_id",
+            "likes_count": {"$sum": {"$cond": [{"$eq": ["$reaction_type", ReactionType.LIKE.value]}, 1, 0]}},
+            "dislikes_count": {"$sum": {"$cond": [{"$eq": ["$reaction_type", ReactionType.DISLIKE.value]}, 1, 0]}},
+        }},
+    ]
+    return {
+        row["_id"]: {"likes_count": row["likes_count"], "dislikes_count": row["dislikes_count"]}
+        async for row in db.post_reactions.aggregate(pipeline)
+    }
+
+async def _reconcile_batch(posts: List[dict], roots: set) -> int:
+    # The counters in posts were read before the reactions are counted, so a
+    # reaction landing in between moves its counter and fails the compare-and-set
+    totals = await _reaction_totals([str(post["_id"]) for post in posts])
+    operations = []
+    for post in posts:
+        expected = totals.get(str(post["_id"]), {"likes_count": 0, "dislikes_count": 0})
+        current = {counter: post.get(counter, 0) for counter in expected}
+        if current == expected:
+            continue
+        # Only overwrite counters that did not move since they were read
+        operations.append(UpdateOne({"_id": post["_id"], **current}, {"$set": expected}))
+        roots.add(thread_root_id(post))
+    if not operations:
+        return 0
+    return (await db.posts.bulk_write(operations, ordered=False)).modified_count
+
+async def reconcile_reaction_counts(batch_size: int = 1000) -> int:
+    """
+    Rebuild likes_count/dislikes_count from post_reactions and fix the posts
+    whose counters drifted. Posts are read in batches and each batch's
+    reactions are counted afterwards, so a counter that moves meanwhile is
+    left for the next run instead of being overwritten with a stale total.
+    Returns the number of corrected posts.
+    """
+    fixed = 0
+    batch = []
+    # Threads whose rendering changed, so their ETags must change too
+    roots = set()
+    async for post in db.posts.find({}, {"likes_count": 1, "dislikes_count": 1, "ancestor_ids": 1}):
+        batch.append(post)
+        if len(batch) == batch_size:
+            fixed += await _reconcile_batch(batch, roots)
+            batch = []
+    if batch:
+        fixed += await _reconcile_batch(batch, roots)
+    if roots:
+        await db.posts.update_many(
+            {"_id": {"$in": [ObjectId(root_id) for root_id in roots]}}, {"$inc": {"revision": 1}}
+        )
+    return fixed
+
+async def run_reconciliation_periodically(interval: int = RECONCILE_INTERVAL_SECONDS):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            fixed = await reconcile_reaction_counts()
+            if fixed:
+                logger.warning("Reconciled reaction counters of %d posts", fixed)
+        except Exception:
+            logger.exception("Reaction counter reconciliation failed")
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Set
+
+import orjson
+from fastapi import WebSocket, WebSocketDisconnect, status
+
+from .metrics import Counter, Gauge, Histogram
+from .pubsub import create_broker
+from .serializers import dumps_json
+
+logger = logging.getLogger(__name__)
+
+# Messages buffered per connection before it is dropped as a slow consumer
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+# Longest a single send may block before the connection is dropped
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+
+# Channel carrying the creation and deletion of top-level posts
+FEED_CHANNEL = "posts"
+
+ws_connections = Gauge("ws_connections", "Open WebSocket connections")
+ws_messages_sent = Counter("ws_messages_sent_total", "Messages written to WebSocket connections")
+ws_slow_consumers = Counter(
+    "ws_slow_consumers_total", "Connections dropped because they could not keep up"
+)
+realtime_events = Counter("realtime_events_total", "Events published by type", labels=("type",))
+realtime_fanout_seconds = Histogram(
+    "realtime_fanout_seconds", "Time spent queueing one message to every local listener"
+)
+
+def post_channel(post_id: str) -> str:
+    """Channel of a thread: comments and reactions anywhere under the post."""
+    return f"post:{post_id}"
+
+def group_channel(group_id: str) -> str:
+    return f"group:{group_id}"
+
+class Connection:
+    """
+    One WebSocket client. Outgoing messages go through a bounded queue drained
+    by a writer task, so a slow client never blocks the fan-out: when its queue
+    is full (or a send times out) the connection is closed and the client is
+    expected to reconnect and catch up through the REST endpoints.
+    """
+
+    def __init__(self, websocket: WebSocket, user: dict):
+        self.websocket = websocket
+        self.user = user
+        self.channels: Set[str] = set()
+        self._queue: asyncio.Queue = asyncio.Queue(WS_SEND_QUEUE_SIZE)
+        self._writer: asyncio.Task = None
+
+    def offer(self, text: str):
+        try:
+            self._queue.put_nowait(text)
+        except asyncio.QueueFull:
+            self._drop()
+
+    def _drop(self):
+        if self._writer is not None and not self._writer.done():
+            ws_slow_consumers.inc()
+            self._writer.cancel()
+
+    async def send(self, content):
+        self.offer(dumps_json(content).decode())
+
+    async def _write(self):
+        while True:
+            text = await self._queue.get()
+            await asyncio.wait_for(self.websocket.send_text(text), WS_SEND_TIMEOUT_SECONDS)
+            ws_messages_sent.inc()
+
+    async def _read(self, on_message: Callable[["Connection", dict], Awaitable[None]]):
+        while True:
+            text = await self.websocket.receive_text()
+            try:
+                message = orjson.loads(text)
+            except orjson.JSONDecodeError:
+                await self.send({"type": "error", "detail": "Messages must be JSON objects"})
+                continue
+            if not isinstance(message, dict):
+                await self.send({"type": "error", "detail": "Messages must be JSON objects"})
+                continue
+            await on_message(self, message)
+
+    async def serve(self, on_message: Callable[["Connection", dict], Awaitable[None]]):
+        """Run the connection until the client leaves or is dropped."""
+        self._writer = asyncio.create_task(self._write())
+        reader = asyncio.create_task(self._read(on_message))
+        try:
+            await asyncio.wait([self._writer, reader], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (self._writer, reader):
+                task.cancel()
+            results = await asyncio.gather(self._writer, reader, return_exceptions=True)
+
+        if not any(isinstance(result, WebSocketDisconnect) for result in results):
+            # Dropped by the server: slow consumer, send timeout or handler error
+            for result in results:
+                if isinstance(result, Exception) and not isinstance(result, asyncio.TimeoutError):
+                    logger.error("WebSocket connection failed", exc_info=result)
+            try:
+                await self.websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            except Exception:
+                pass
+
+class Hub:
+    """
+    Routes broker messages to the WebSocket connections of this process.
+    Every message is encoded once and queued to each listener, and the
+    broker holds a single subscription per channel with local listeners.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._channels: Dict[str, Set[Connection]] = {}
+
+    async def start(self):
+        await self.broker.start(self._deliver)
+
+    async def close(self):
+        await self.broker.close()
+
+    def _deliver(self, channel: str, payload: bytes):
+        listeners = self._channels.get(channel)
+        if not listeners:
+            return
+        started = time.perf_counter()
+        text = payload.decode()
+        for connection in list(listeners):
+            connection.offer(text)
+        realtime_fanout_seconds.observe(time.perf_counter() - started)
+
+    async def join(self, connection: Connection, channel: str):
+        if channel in connection.channels:
+            return
+        connection.channels.add(channel)
+        listeners = self._channels.setdefault(channel, set())
+        listeners.add(connection)
+        if len(listeners) == 1:
+            await self.broker.subscribe(channel)
+
+    async def leave(self, connection: Connection, channel: str):
+        connection.channels.discard(channel)
+        listeners = self._channels.get(channel)
+        if listeners is None:
+            return
+        listeners.discard(connection)
+        if not listeners:
+            del self._channels[channel]
+            await self.broker.unsubscribe(channel)
+
+    async def connect(self, connection: Connection):
+        await connection.websocket.accept()
+        ws_connections.inc()
+
+    async def disconnect(self, connection: Connection):
+        ws_connections.dec()
+        for channel in list(connection.channels):
+            await self.leave(connection, channel)
+
+    async def publish(self, channel: str, event: dict):
+        """
+        Publish an event to every listener of a channel, in every worker.
+        Failures are logged and never propagate to the request that caused them.
+        """
+        realtime_events.inc(type=event.get("type", ""))
+        try:
+            await self.broker.publish(channel, dumps_json(event))
+        except Exception:
+            logger.exception("Could not publish to %s", channel)
+
+hub = Hub(create_broker())
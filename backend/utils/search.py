@@ -0,0 +1,224 @@
+import asyncio
+import heapq
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from pymongo import UpdateOne
+
+from config.database import db
+from .threads import NOT_DELETED
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Weight of index terms matched only through prefix expansion
+PREFIX_WEIGHT = 0.5
+MAX_PREFIX_EXPANSIONS = 20
+# Postings read per matched term, highest term frequency first; common terms
+# are scored on their best postings instead of their whole posting list
+SEARCH_POSTINGS_PER_TERM = int(os.getenv("SEARCH_POSTINGS_PER_TERM", "1000"))
+# Postings read per query across all matched terms, shared out between them
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "5000"))
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+STOP_WORDS = frozenset("""
+    de la el en y a los las del se por un una con para es al lo como su o
+    the of and to in is for on with an at by it or be
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, accent-insensitive word tokens without stop words."""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [
+        token for token in _TOKEN_PATTERN.findall(text)
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+def _post_terms(post: dict) -> Counter:
+    filenames = " ".join(
+        attachment.get("filename", "") for attachment in post.get("attached_files") or []
+    )
+    return Counter(tokenize(post.get("content", "")) + tokenize(filenames))
+
+class SearchIndex:
+    """
+    Inverted index over top-level post content and attachment filenames,
+    kept in MongoDB and updated incrementally as posts change.
+
+    postings holds one document per (term, post) with the term frequency,
+    the document length and the author's university/major as facets.
+    terms holds the document frequency of every term and serves prefix
+    expansion; stats holds the corpus size and total length used by BM25.
+    """
+
+    def __init__(self, database):
+        self.postings = database.search_postings
+        self.terms = database.search_terms
+        self.stats = database.search_stats
+
+    async def index_posts(self, posts: List[dict], profile: Optional[dict] = None):
+        """Index posts of the same author with one write per collection."""
+        profile = profile or {}
+        postings = []
+        document_frequency: Counter = Counter()
+        documents = total_length = 0
+        for post in posts:
+            terms = _post_terms(post)
+            if not terms:
+                continue
+            length = sum(terms.values())
+            documents += 1
+            total_length += length
+            document_frequency.update(terms.keys())
+            postings += [
+                {
+                    "term": term,
+                    "post_id": str(post["_id"]),
+                    "author_id": post["author_id"],
+                    "tf": frequency,
+                    "length": length,
+                    "university": profile.get("university"),
+                    "major": profile.get("major"),
+                }
+                for term, frequency in terms.items()
+            ]
+        if not postings:
+            return
+
+        await self.postings.insert_many(postings, ordered=False)
+        await asyncio.gather(
+            self.terms.bulk_write([
+                UpdateOne({"_id": term}, {"$inc": {"df": count}}, upsert=True)
+                for term, count in document_frequency.items()
+            ], ordered=False),
+            self.stats.update_one(
+                {"_id": "corpus"},
+                {"$inc": {"documents": documents, "total_length": total_length}},
+                upsert=True
+            ),
+        )
+
+    async def index_post(self, post: dict, profile: Optional[dict] = None):
+        await self.index_posts([post], profile)
+
+    async def remove_post(self, post_id: str):
+        postings = await self.postings.find(
+            {"post_id": post_id}, {"term": 1, "length": 1}
+        ).to_list(length=None)
+        if not postings:
+            return
+
+        await self.postings.delete_many({"post_id": post_id})
+        await asyncio.gather(
+            self.terms.bulk_write([
+                UpdateOne({"_id": posting["term"]}, {"$inc": {"df": -1}}) for posting in postings
+            ], ordered=False),
+            self.stats.update_one(
+                {"_id": "corpus"},
+                {"$inc": {"documents": -1, "total_length": -postings[0]["length"]}}
+            ),
+        )
+
+    async def reindex_post(self, post: dict, profile: Optional[dict] = None):
+        await self.remove_post(str(post["_id"]))
+        await self.index_post(post, profile)
+
+    async def update_author_facets(self, author_id: str, university: Optional[str], major: Optional[str]):
+        await self.postings.update_many(
+            {"author_id": author_id},
+            {"$set": {"university": university, "major": major}}
+        )
+
+    async def _expand(self, token: str) -> List[dict]:
+        return await self.terms.find(
+            {"_id": {"$regex": f"^{re.escape(token)}"}, "df": {"$gt": 0}}
+        ).sort("df", -1).limit(MAX_PREFIX_EXPANSIONS).to_list(length=None)
+
+    async def _top_postings(self, term: str, facets: dict, limit: int) -> List[dict]:
+        return await self.postings.find(
+            {"term": term, **facets}, {"_id": 0, "term": 1, "post_id": 1, "tf": 1, "length": 1}
+        ).sort([("tf", -1), ("length", 1)]).limit(limit).to_list(length=None)
+
+    async def search(
+        self,
+        query: str,
+        university: Optional[str] = None,
+        major: Optional[str] = None,
+        limit: int = 20
+    ) -> List[Tuple[str, float]]:
+        """
+        Rank posts for a free-text query with BM25. Every query token also
+        matches index terms it is a prefix of, at a lower weight.
+        Only the top postings of each term by frequency (shortest posts
+        first on ties) are read, at most SEARCH_MAX_CANDIDATES in all, so a
+        query costs the same however common its terms are.
+        Returns (post_id, score) pairs, best first.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        stats, *expansions = await asyncio.gather(
+            self.stats.find_one({"_id": "corpus"}),
+            *(self._expand(token) for token in tokens)
+        )
+        weights: Dict[str, float] = {}
+        document_frequency: Dict[str, int] = {}
+        for token, expansion in zip(tokens, expansions):
+            for term in expansion:
+                weight = 1.0 if term["_id"] == token else PREFIX_WEIGHT
+                weights[term["_id"]] = max(weights.get(term["_id"], 0), weight)
+                document_frequency[term["_id"]] = term["df"]
+        if not weights or not stats or stats.get("documents", 0) <= 0:
+            return []
+
+        facets = {}
+        if university:
+            facets["university"] = university
+        if major:
+            facets["major"] = major
+        per_term = max(limit, min(SEARCH_POSTINGS_PER_TERM, SEARCH_MAX_CANDIDATES // len(weights)))
+        postings = [
+            posting
+            for term_postings in await asyncio.gather(*(
+                self._top_postings(term, facets, per_term) for term in weights
+            ))
+            for posting in term_postings
+        ]
+
+        documents = stats["documents"]
+        average_length = max(stats["total_length"] / documents, 1)
+        scores: Dict[str, float] = {}
+        for posting in postings:
+            df = document_frequency[posting["term"]]
+            idf = math.log(1 + (documents - df + 0.5) / (df + 0.5))
+            tf = posting["tf"]
+            norm = K1 * (1 - B + B * posting["length"] / average_length)
+            scores[posting["post_id"]] = scores.get(posting["post_id"], 0) + (
+                weights[posting["term"]] * idf * tf * (K1 + 1) / (tf + norm)
+            )
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+    async def rebuild(self, database=db) -> int:
+        """Clear the index and rebuild it from every top-level post."""
+        await asyncio.gather(
+            self.postings.delete_many({}), self.terms.delete_many({}), self.stats.delete_many({})
+        )
+        profiles = {
+            profile["user_id"]: profile
+            async for profile in database.user_profiles.find({}, {"user_id": 1, "university": 1, "major": 1})
+        }
+        indexed = 0
+        async for post in database.posts.find({"parent_post_id": None, **NOT_DELETED}):
+            await self.index_post(post, profiles.get(post["author_id"]))
+            indexed += 1
+        return indexed
+
+search_index = SearchIndex(db)
+
+if __name__ == "__main__":
+    print(f"Indexed {asyncio.run(search_index.rebuild())} posts")
@@ -1,11 +1,24 @@
 from bson import ObjectId
 from datetime import datetime, date
+from enum import Enum
+from types import UnionType
+from typing import Any, Callable, Collection, Dict, List, Optional, Type, Union, get_args, get_origin
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, EmailStr, HttpUrl
+
+from .profiling import timed
 
 def serialize_mongo_doc(doc):
     """
     Recursively serialize a MongoDB document to make it JSON serializable.
     Handles ObjectId, datetime, and nested documents/lists.
+    The Mongo "_id" key is exposed as "id", as expected by the response models.
     """
+    with timed("serialize"):
+        return _serialize(doc)
+
+def _serialize(doc):
     if doc is None:
         return None
     
@@ -22,12 +35,137 @@ def serialize_mongo_doc(doc):
         return doc.isoformat()
     
     if isinstance(doc, list):
-        return [serialize_mongo_doc(item) for item in doc]
+        return [_serialize(item) for item in doc]
     
     if isinstance(doc, dict):
         return {
-            key: serialize_mongo_doc(value)
+            ("id" if key == "_id" else key): _serialize(value)
             for key, value in doc.items()
         }
     
-    return str(doc)  # Fallback for any other types 
\ No newline at end of file
+    return str(doc)  # Fallback for any other types 
+
+_MISSING = object()
+_encoders: Dict[Type[BaseModel], Callable[[dict], dict]] = {}
+
+def _to_str(value):
+    return value if type(value) is str else str(value)
+
+def _to_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+def _enum_value(value):
+    return value.value if isinstance(value, Enum) else value
+
+def _passthrough(value):
+    return value
+
+def _compile_value(annotation) -> Callable:
+    """
+    Converter for a single annotated field. Values that orjson already knows
+    how to write (numbers, booleans, datetimes) are passed through untouched.
+    """
+    origin = get_origin(annotation)
+    if origin in (Union, UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return _compile_value(args[0]) if len(args) == 1 else _serialize
+    if origin is list:
+        (item_annotation,) = get_args(annotation) or (Any,)
+        convert_item = _compile_value(item_annotation)
+        if convert_item is _passthrough:
+            return list
+        return lambda items: [
+            None if item is None else convert_item(item) for item in items
+        ]
+    if isinstance(annotation, type):
+        if issubclass(annotation, BaseModel):
+            # Resolved lazily so self-referencing models (comments) compile
+            return lambda value: get_encoder(annotation)(value)
+        if issubclass(annotation, Enum):
+            return _enum_value
+        if annotation is str:
+            return _to_str
+        if annotation in (int, float, bool, datetime):
+            return _passthrough
+        if annotation is date:
+            return _to_date
+    if annotation in (HttpUrl, EmailStr):
+        return _to_str
+    return _serialize
+
+def _build_encoder(model: Type[BaseModel]) -> Callable[[dict], dict]:
+    fields = []
+    for name, field in model.model_fields.items():
+        default = None if field.is_required() else field.get_default(call_default_factory=True)
+        fields.append((name, default, _compile_value(field.annotation)))
+
+    def encode(doc: dict) -> dict:
+        if isinstance(doc, BaseModel):
+            doc = doc.__dict__
+        encoded = {}
+        for name, default, convert in fields:
+            value = doc.get(name, _MISSING)
+            if value is _MISSING and name == "id":
+                value = doc.get("_id", _MISSING)
+            if value is _MISSING:
+                value = default
+            encoded[name] = None if value is None else convert(value)
+        return encoded
+
+    encode.__name__ = f"encode_{model.__name__}"
+    return encode
+
+def get_encoder(model: Type[BaseModel]) -> Callable[[dict], dict]:
+    """
+    Return the encoder compiled for a response model.
+
+    The encoder maps a raw or hydrated Mongo document to a dict holding exactly
+    the model's fields, converted to JSON-ready values. It replaces the
+    serialize_mongo_doc + response_model round trip on hot paths.
+    """
+    encoder = _encoders.get(model)
+    if encoder is None:
+        encoder = _encoders[model] = _build_encoder(model)
+    return encoder
+
+def _orjson_default(value):
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)  # ObjectId, URLs and any other leftover type
+
+def dumps_json(content: Any) -> bytes:
+    """JSON bytes for content that may still hold ObjectIds, enums and URLs."""
+    return orjson.dumps(
+        content,
+        default=_orjson_default,
+        option=orjson.OPT_NON_STR_KEYS
+    )
+
+class MongoJSONResponse(ORJSONResponse):
+    """ORJSON response that also knows how to write ObjectIds, enums and URLs."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+def encode_response(
+    model: Type[BaseModel],
+    content: Union[dict, List[dict]],
+    many: bool = False,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+    fields: Optional[Collection[str]] = None
+) -> MongoJSONResponse:
+    """
+    Encode one document (or a list of them with many=True) with the model's
+    compiled encoder and write it straight to JSON bytes. With fields, only
+    those fields of each document are written (sparse fieldsets).
+    FastAPI does not validate a returned Response again, so response_model
+    on the route only documents the shape.
+    """
+    with timed("serialize"):
+        encoder = get_encoder(model)
+        if fields is not None:
+            full_encoder = encoder
+            encoder = lambda item: {name: value for name, value in full_encoder(item).items() if name in fields}
+        data = [encoder(item) for item in content] if many else encoder(content)
+        return MongoJSONResponse(data, status_code=status_code, headers=headers)
@@ -0,0 +1,289 @@
+import asyncio
+import hashlib
+import os
+import re
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+from bson import ObjectId
+from fastapi import HTTPException, UploadFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+from config.database import db
+from models.Post import FileType
+
+# File storage configuration
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")  # "local" or "gridfs"
+STORAGE_DIR = os.getenv("STORAGE_DIR", "uploads")
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(2 * 1024 ** 3)))
+
+_RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+_SHA256_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+_DOCUMENT_TYPES = (
+    "text/",
+    "application/msword",
+    "application/vnd.openxmlformats-officedocument",
+    "application/vnd.oasis.opendocument",
+    "application/rtf",
+)
+
+async def _read_chunks(upload: UploadFile) -> AsyncIterator[bytes]:
+    size = 0
+    while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="File too large")
+        yield chunk
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=start-end" Range header into an inclusive
+    (start, end) pair. Returns None when the whole file should be sent.
+    """
+    if not header:
+        return None
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    start, end = match.groups()
+    if start == "":
+        # Suffix range: the last N bytes
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end) if end else size - 1, size - 1)
+    if start > end or start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+class LocalFileStore:
+    """
+    Content-addressed store on the local filesystem: blobs live under
+    STORAGE_DIR/<sha[:2]>/<sha>, so identical uploads are written once.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+
+    def path(self, sha256: str) -> str:
+        # Anything but a hex digest could point outside the store
+        if not _SHA256_PATTERN.fullmatch(sha256):
+            raise ValueError(f"Not a sha256 digest: {sha256!r}")
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    async def save(self, upload: UploadFile) -> Tuple[str, int]:
+        digest = hashlib.sha256()
+        size = 0
+        temp_path = os.path.join(self.root, "tmp", uuid.uuid4().hex)
+        try:
+            with open(temp_path, "wb") as temp_file:
+                async for chunk in _read_chunks(upload):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    await asyncio.to_thread(temp_file.write, chunk)
+
+            sha256 = digest.hexdigest()
+            final_path = self.path(sha256)
+            if os.path.exists(final_path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(temp_path, final_path)
+            return sha256, size
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    async def save_bytes(self, data: bytes) -> Tuple[str, int]:
+        sha256 = hashlib.sha256(data).hexdigest()
+        final_path = self.path(sha256)
+        if not os.path.exists(final_path):
+            temp_path = os.path.join(self.root, "tmp", uuid.uuid4().hex)
+            with open(temp_path, "wb") as temp_file:
+                await asyncio.to_thread(temp_file.write, data)
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(temp_path, final_path)
+        return sha256, len(data)
+
+    async def exists(self, sha256: str) -> bool:
+        return os.path.exists(self.path(sha256))
+
+    async def iter_range(self, sha256: str, start: int, end: int) -> AsyncIterator[bytes]:
+        with open(self.path(sha256), "rb") as blob:
+            blob.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await asyncio.to_thread(blob.read, min(UPLOAD_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+class GridFSFileStore:
+    """
+    Content-addressed store in a GridFS bucket; blobs carry their sha256 in
+    metadata and a duplicate upload is dropped once its hash is known.
+    """
+
+    def __init__(self, bucket_name: str = "blobs"):
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=bucket_name)
+        self.files = db[f"{bucket_name}.files"]
+
+    async def _find(self, sha256: str) -> Optional[dict]:
+        return await self.files.find_one({"metadata.sha256": sha256}, {"_id": 1})
+
+    async def save(self, upload: UploadFile) -> Tuple[str, int]:
+        digest = hashlib.sha256()
+        size = 0
+        stream = self.bucket.open_upload_stream(
+            upload.filename or "upload", chunk_size_bytes=255 * 1024
+        )
+        try:
+            async for chunk in _read_chunks(upload):
+                digest.update(chunk)
+                size += len(chunk)
+                await stream.write(chunk)
+            await stream.close()
+        except BaseException:
+            await stream.abort()
+            raise
+
+        sha256 = digest.hexdigest()
+        if await self._find(sha256):
+            await self.bucket.delete(stream._id)
+        else:
+            await self.files.update_one({"_id": stream._id}, {"$set": {"metadata.sha256": sha256}})
+        return sha256, size
+
+    async def save_bytes(self, data: bytes) -> Tuple[str, int]:
+        sha256 = hashlib.sha256(data).hexdigest()
+        if not await self._find(sha256):
+            await self.bucket.upload_from_stream(sha256, data, metadata={"sha256": sha256})
+        return sha256, len(data)
+
+    async def exists(self, sha256: str) -> bool:
+        return await self._find(sha256) is not None
+
+    async def iter_range(self, sha256: str, start: int, end: int) -> AsyncIterator[bytes]:
+        blob = await self._find(sha256)
+        stream = await self.bucket.open_download_stream(blob["_id"])
+        stream.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await stream.read(min(UPLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def _create_store():
+    if STORAGE_BACKEND == "gridfs":
+        return GridFSFileStore()
+    return LocalFileStore(STORAGE_DIR)
+
+file_store = _create_store()
+
+def guess_file_type(content_type: Optional[str], filename: Optional[str]) -> FileType:
+    content_type = content_type or ""
+    if content_type == "application/pdf" or (filename or "").lower().endswith(".pdf"):
+        return FileType.PDF
+    if content_type.startswith("image/"):
+        return FileType.IMAGE
+    if content_type.startswith(_DOCUMENT_TYPES):
+        return FileType.DOCUMENT
+    return FileType.OTHER
+
+async def _record_attachment(
+    sha256: str, size: int, filename: str, content_type: str, owner_id: Optional[str]
+) -> dict:
+    attachment = {
+        "sha256": sha256,
+        "size": size,
+        "filename": filename,
+        "content_type": content_type,
+        "owner_id": owner_id,
+        "created_at": datetime.utcnow(),
+    }
+    result = await db.attachments.insert_one(attachment)
+    attachment["_id"] = result.inserted_id
+    return attachment
+
+async def save_attachment(upload: UploadFile, owner_id: str) -> dict:
+    """
+    Stream an upload into the file store and record it in the attachments
+    collection. Returns the attachment document.
+    """
+    sha256, size = await file_store.save(upload)
+    return await _record_attachment(
+        sha256, size, upload.filename or sha256, upload.content_type or "application/octet-stream", owner_id
+    )
+
+async def save_generated_file(data: bytes, filename: str, content_type: str) -> dict:
+    """Store a file produced by the server, such as a thumbnail. Returns the attachment document."""
+    sha256, size = await file_store.save_bytes(data)
+    return await _record_attachment(sha256, size, filename, content_type, None)
+
+async def read_blob(sha256: str) -> bytes:
+    """Whole content of a stored blob, for processing that needs it in memory."""
+    chunks = []
+    async for chunk in file_store.iter_range(sha256, 0, MAX_UPLOAD_BYTES):
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+def attachment_to_file(attachment: dict) -> dict:
+    """AttachedFile-shaped dict for an attachment document."""
+    file_id = str(attachment["_id"])
+    return {
+        "url": f"/files/{file_id}",
+        "file_type": guess_file_type(attachment["content_type"], attachment["filename"]),
+        "filename": attachment["filename"],
+        "file_id": file_id,
+        "size": attachment["size"],
+        "sha256": attachment["sha256"],
+    }
+
+async def resolve_attachments(documents: List[dict], owner_id: str) -> List[Optional[str]]:
+    """
+    Replace the file metadata of new posts' attachments with the stored
+    records. Uploads are referenced by file_id and must belong to the poster;
+    url, sha256, size and file_type are never taken from the client. Other
+    attachments are kept as plain links. Returns one error per document,
+    None when all of its attachments resolved.
+    """
+    file_ids = {
+        attached_file["file_id"]
+        for document in documents
+        for attached_file in document.get("attached_files") or []
+        if attached_file.get("file_id") and ObjectId.is_valid(attached_file["file_id"])
+    }
+    stored = {}
+    if file_ids:
+        stored = {
+            str(attachment["_id"]): attachment
+            async for attachment in db.attachments.find(
+                {"_id": {"$in": [ObjectId(file_id) for file_id in file_ids]}, "owner_id": owner_id}
+            )
+        }
+
+    errors = []
+    for document in documents:
+        error = None
+        for attached_file in document.get("attached_files") or []:
+            file_id = attached_file.get("file_id")
+            if not file_id:
+                attached_file.update(sha256=None, size=None)
+                continue
+            attachment = stored.get(file_id)
+            if attachment is None:
+                error = f"Attachment {file_id} not found"
+                break
+            attached_file.update(attachment_to_file(attachment))
+        errors.append(error)
+    return errors
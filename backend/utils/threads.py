@@ -0,0 +1,197 @@
+import asyncio
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from config.database import db
+from .pagination import keyset_filter
+
+# Comments are returned oldest first inside a thread
+COMMENT_SORT = [("created_at", 1), ("_id", 1)]
+# A deleted post stays in place, flagged, until the deletion worker removes
+# it after its comments; reads of posts skip it
+NOT_DELETED = {"deleted": {"$ne": True}}
+
+def thread_fields(parent: dict) -> dict:
+    """
+    Materialized-path fields for a new comment of the given parent document.
+    ancestor_ids lists every post above the comment, starting at the root.
+    """
+    ancestor_ids = list(parent.get("ancestor_ids", [])) + [str(parent["_id"])]
+    return {
+        "parent_post_id": str(parent["_id"]),
+        "ancestor_ids": ancestor_ids,
+        "depth": len(ancestor_ids),
+    }
+
+def thread_root_id(post: dict) -> str:
+    ancestor_ids = post.get("ancestor_ids") or []
+    return ancestor_ids[0] if ancestor_ids else str(post["_id"])
+
+async def bump_thread_revision(*root_ids: str):
+    """
+    Advance the revision of threads' root posts. Every write that changes
+    how a thread renders (new comments, reactions, deleted comments) must
+    call it, since the revision is the version stamp behind the thread's ETag.
+    """
+    if len(root_ids) == 1:
+        await db.posts.update_one({"_id": ObjectId(root_ids[0])}, {"$inc": {"revision": 1}})
+    elif root_ids:
+        await db.posts.update_many(
+            {"_id": {"$in": [ObjectId(root_id) for root_id in set(root_ids)]}}, {"$inc": {"revision": 1}}
+        )
+
+async def bump_author_threads(author_id: str):
+    """Advance the revision of every thread the author's name or picture appears in."""
+    roots = await db.posts.aggregate([
+        {"$match": {"author_id": author_id}},
+        {"$group": {"_id": {"$ifNull": [{"$first": "$ancestor_ids"}, {"$toString": "$_id"}]}}},
+    ]).to_list(length=None)
+    if roots:
+        await db.posts.update_many(
+            {"_id": {"$in": [ObjectId(root["_id"]) for root in roots]}},
+            {"$inc": {"revision": 1}}
+        )
+
+async def add_comment_counts(comments: Iterable[dict], delta: int = 1):
+    """
+    Add delta to the comment_count of every post above each of the comments:
+    1 for new comments, while a deleted comment takes itself and its replies
+    away with -(1 + its comment_count). comment_count is kept on every post
+    as the number of comments at any depth below it, so feeds project it
+    instead of counting threads on every read.
+    """
+    deltas = Counter()
+    for comment in comments:
+        for ancestor_id in comment.get("ancestor_ids") or []:
+            deltas[ancestor_id] += delta
+    operations = [
+        UpdateOne({"_id": ObjectId(post_id)}, {"$inc": {"comment_count": change}})
+        for post_id, change in deltas.items()
+        if change
+    ]
+    if operations:
+        await db.posts.bulk_write(operations, ordered=False)
+
+async def backfill_comment_counts(batch_size: int = 1000) -> int:
+    """
+    Recount the comment_count of every post from the materialized paths,
+    for posts written before it was maintained. Returns the number of
+    updated posts.
+    """
+    counts = Counter()
+    async for row in db.posts.aggregate([
+        {"$match": {"depth": {"$gt": 0}}},
+        {"$project": {"_id": 0, "ancestor_ids": 1}},
+        {"$unwind": "$ancestor_ids"},
+        {"$group": {"_id": "$ancestor_ids", "count": {"$sum": 1}}},
+    ], allowDiskUse=True):
+        counts[row["_id"]] = row["count"]
+
+    updated = 0
+    operations = []
+    async for post in db.posts.find({}, {"comment_count": 1}):
+        count = counts[str(post["_id"])]
+        if post.get("comment_count") == count:
+            continue
+        operations.append(UpdateOne({"_id": post["_id"]}, {"$set": {"comment_count": count}}))
+        if len(operations) == batch_size:
+            updated += (await db.posts.bulk_write(operations, ordered=False)).modified_count
+            operations = []
+    if operations:
+        updated += (await db.posts.bulk_write(operations, ordered=False)).modified_count
+    return updated
+
+async def fetch_comment_trees(
+    roots: List[dict],
+    max_depth: Optional[int] = None,
+    max_children: Optional[int] = None,
+    after: Optional[Tuple[datetime, ObjectId]] = None
+) -> List[dict]:
+    """
+    Fetch the comments below the given (serialized) posts with a single query.
+
+    With max_depth, one extra level is fetched so callers can tell whether
+    the deepest returned comments have replies. With max_children, at most
+    max_children + 1 replies are returned per parent for the same reason.
+    after restricts the direct replies of a single root to those following
+    the given (created_at, _id) key.
+    """
+    if not roots:
+        return []
+
+    root_ids = [root["id"] for root in roots]
+    # Comments below a deleted one lose their parent and drop out of the tree
+    match = {"ancestor_ids": {"$in": root_ids}, **NOT_DELETED}
+    if max_depth is not None:
+        deepest_root = max(root.get("depth", 0) for root in roots)
+        match["depth"] = {"$lte": deepest_root + max_depth + 1}
+    if after is not None and len(roots) == 1:
+        match["$or"] = [
+            {"parent_post_id": {"$ne": root_ids[0]}},
+            {"$and": [{"parent_post_id": root_ids[0]}, keyset_filter(*after, descending=False)]},
+        ]
+
+    if max_children is None:
+        return await db.posts.find(match).sort(COMMENT_SORT).to_list(length=None)
+
+    pipeline = [
+        {"$match": match},
+        {"$sort": dict(COMMENT_SORT)},
+        {"$group": {
+            "_id": "$parent_post_id",
+            "children": {"$firstN": {"input": "$$ROOT", "n": max_children + 1}},
+        }},
+        {"$unwind": "$children"},
+        {"$replaceWith": "$children"},
+        {"$sort": dict(COMMENT_SORT)},
+    ]
+    return await db.posts.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+
+async def backfill_comment_paths(batch_size: int = 1000) -> int:
+    """
+    Add ancestor_ids/depth to comments created before materialized paths existed.
+    Walks the threads one level at a time and returns the number of updated comments.
+    """
+    updated = 0
+    parents = await db.posts.find(
+        {"parent_post_id": None}, {"_id": 1}
+    ).to_list(length=None)
+    paths = {str(parent["_id"]): [] for parent in parents}
+
+    while paths:
+        children = await db.posts.find(
+            {"parent_post_id": {"$in": list(paths)}},
+            {"_id": 1, "parent_post_id": 1}
+        ).to_list(length=None)
+
+        next_paths = {}
+        operations = []
+        for child in children:
+            ancestor_ids = paths[child["parent_post_id"]] + [child["parent_post_id"]]
+            next_paths[str(child["_id"])] = ancestor_ids
+            operations.append(UpdateOne(
+                {"_id": child["_id"]},
+                {"$set": {"ancestor_ids": ancestor_ids, "depth": len(ancestor_ids)}}
+            ))
+
+        for start in range(0, len(operations), batch_size):
+            result = await db.posts.bulk_write(operations[start:start + batch_size], ordered=False)
+            updated += result.modified_count
+        paths = next_paths
+
+    await db.posts.update_many(
+        {"parent_post_id": None, "ancestor_ids": {"$exists": False}},
+        {"$set": {"ancestor_ids": [], "depth": 0}}
+    )
+    return updated
+
+async def _backfill():
+    # Counts are recounted from the paths, so those are filled in first
+    print(f"Backfilled {await backfill_comment_paths()} comments")
+    print(f"Recounted comments of {await backfill_comment_counts()} posts")
+
+if __name__ == "__main__":
+    asyncio.run(_backfill())
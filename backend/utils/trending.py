@@ -0,0 +1,93 @@
+import asyncio
+import math
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+from bson import ObjectId
+from pymongo import DESCENDING, UpdateOne
+
+from config.database import db, feed_db
+from models.Post import FeedScope
+from .feeds import feed_query
+
+# Engagement loses half of its weight every TRENDING_HALF_LIFE_HOURS
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "24"))
+POST_WEIGHT = 1.0
+LIKE_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+
+TRENDING_SORT = [("hot_score", DESCENDING), ("_id", DESCENDING)]
+
+# Scores are measured from a fixed epoch so they can be compared across posts
+_EPOCH = datetime(2024, 1, 1)
+_RATE = math.log(2) / (TRENDING_HALF_LIFE_HOURS * 3600)
+
+def event_score(weight: float, at: Optional[datetime] = None) -> float:
+    """
+    Log of an event's forward-decayed weight, weight * exp(rate * (at - epoch)).
+    A post's hot_score is the log of the sum of its events' weights: newer
+    events weigh exponentially more, which ranks exactly like decaying every
+    older event, but never requires touching a score again as time passes.
+    """
+    at = at or datetime.utcnow()
+    return math.log(weight) + _RATE * (at - _EPOCH).total_seconds()
+
+def _add_score(score: float) -> list:
+    """Update pipeline setting hot_score to log(exp(hot_score) + exp(score))."""
+    current = {"$ifNull": ["$hot_score", float("-inf")]}
+    return [{"$set": {"hot_score": {"$add": [
+        {"$max": [current, score]},
+        {"$ln": {"$add": [1, {"$exp": {"$multiply": [-1, {"$abs": {"$subtract": [current, score]}}]}}]}},
+    ]}}}]
+
+async def record_engagement(weights: Dict[str, float]):
+    """
+    Add engagement, as {root post id: weight}, to the hot scores of threads.
+    Applied in place by MongoDB, so concurrent updates never overwrite each other.
+    """
+    operations = [
+        UpdateOne({"_id": ObjectId(root_id)}, _add_score(event_score(weight)))
+        for root_id, weight in weights.items()
+        if weight > 0
+    ]
+    if operations:
+        await db.posts.bulk_write(operations, ordered=False)
+
+async def read_trending(
+    scope: FeedScope, value: Optional[str], skip: int, limit: int, projection: Optional[dict] = None
+) -> List[dict]:
+    """Hottest top-level posts, globally or within a university or major."""
+    return await feed_db.posts.find(feed_query(scope, value), projection).sort(TRENDING_SORT).skip(skip).limit(limit).to_list(length=None)
+
+async def backfill_hot_scores(batch_size: int = 1000) -> int:
+    """
+    Score posts created before trending existed from their counters,
+    as if all their engagement happened when they were posted.
+    Returns the number of scored posts.
+    """
+    comments = Counter()
+    async for row in db.posts.aggregate([
+        {"$match": {"depth": {"$gt": 0}}},
+        {"$group": {"_id": {"$first": "$ancestor_ids"}, "count": {"$sum": 1}}},
+    ], allowDiskUse=True):
+        comments[row["_id"]] = row["count"]
+
+    scored = 0
+    operations = []
+    async for post in db.posts.find(
+        {"parent_post_id": None, "hot_score": {"$exists": False}}, {"created_at": 1, "likes_count": 1}
+    ):
+        weight = POST_WEIGHT + LIKE_WEIGHT * post.get("likes_count", 0) + COMMENT_WEIGHT * comments[str(post["_id"])]
+        operations.append(UpdateOne(
+            {"_id": post["_id"]}, {"$set": {"hot_score": event_score(weight, post["created_at"])}}
+        ))
+        if len(operations) == batch_size:
+            scored += (await db.posts.bulk_write(operations, ordered=False)).modified_count
+            operations = []
+    if operations:
+        scored += (await db.posts.bulk_write(operations, ordered=False)).modified_count
+    return scored
+
+if __name__ == "__main__":
+    print(f"Scored {asyncio.run(backfill_hot_scores())} posts")